@@ -0,0 +1,196 @@
+# backend/ai_batch.py
+import os
+import re
+import json
+import asyncio
+import logging
+from backend.llm_client import chat_completion
+from backend.cache import llm_cache, make_key
+from backend import gost_ai_formatter, apa_ai_formatter, mla_ai_formatter
+
+# Сколько ссылок упаковывается в один запрос к нейросети (1 — пакетный режим выключен)
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))
+LLM_BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT", "300"))
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Стиль → (шаблоны промптов, подпись раздела с исправленной записью, одиночный форматтер)
+BATCH_STYLES = {
+    "GOST": (gost_ai_formatter.PROMPT_TEMPLATES, "ГОСТ", gost_ai_formatter.format_gost),
+    "APA": (apa_ai_formatter.PROMPT_TEMPLATES, "APA", apa_ai_formatter.format_apa_ai),
+    "MLA": (mla_ai_formatter.PROMPT_TEMPLATES, "MLA", mla_ai_formatter.format_mla_ai),
+}
+
+REFERENCE_MARKER = "**Ссылка:**"
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def build_batch_prompt(template: str, references: list, label: str) -> str:
+    """
+    Пакетный промпт: инструкции шаблона (всё до «**Ссылка:**») один раз,
+    затем пронумерованные ссылки; ответ — JSON по номерам ссылок.
+    """
+    instructions = template.split(REFERENCE_MARKER)[0].strip()
+    numbered = "\n".join(f"{number}. {json.dumps(reference, ensure_ascii=False)}"
+                         for number, reference in enumerate(references, 1))
+    return f"""{instructions}
+
+**Пакетный режим:**
+Ниже {len(references)} пронумерованных ссылок. Выполни задачу для каждой ссылки отдельно.
+Верни только JSON-объект без пояснений и без markdown: ключ — номер ссылки (строкой),
+значение — ответ для этой ссылки строго в указанном формате вывода.
+Пример: {{"1": "ОШИБКИ:\\n- ...\\n{label}:\\n...", "2": "..."}}
+
+**Ссылки:**
+{numbered}
+"""
+
+
+def parse_batch_response(response: str, count: int, label: str) -> dict:
+    """
+    Разбирает JSON-ответ пакетного запроса. Возвращает {позиция (с 0): ответ}
+    только для ответов, содержащих раздел «{label}:»; остальные считаются неразобранными.
+    """
+    text = _CODE_FENCE_RE.sub("", response.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        payload = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+    parsed = {}
+    for key, value in payload.items():
+        try:
+            number = int(str(key).strip().rstrip("."))
+        except ValueError:
+            continue
+        if 1 <= number <= count and isinstance(value, str) and f"{label}:" in value:
+            parsed[number - 1] = value.strip()
+    return parsed
+
+
+async def _format_chunk(items: list, template: str, label: str, single, subformat: str) -> list:
+    """Один пакетный запрос для items [(ключ кэша, ссылка)]; неразобранные ответы — одиночными вызовами."""
+    references = [reference for _, reference in items]
+    parsed = {}
+    if len(items) > 1:
+        try:
+            response = await chat_completion(build_batch_prompt(template, references, label),
+                                             timeout=LLM_BATCH_TIMEOUT)
+            parsed = parse_batch_response(response, len(items), label)
+        except Exception as e:
+            logger.error("Ошибка пакетного запроса к нейросети (%s ссылок): %s", len(items), e)
+        if len(parsed) < len(items):
+            logger.warning("Пакетный ответ: разобрано %s из %s, остальные запрашиваются по одной",
+                           len(parsed), len(items))
+        # Ответы кэшируются под теми же ключами, что и у одиночных вызовов
+        await llm_cache.aset_many({items[position][0]: answer for position, answer in parsed.items()})
+
+    missing = [position for position in range(len(items)) if position not in parsed]
+    answers = await asyncio.gather(*(single(references[position], subformat) for position in missing))
+    parsed.update(zip(missing, answers))
+    return [parsed[position] for position in range(len(items))]
+
+
+async def format_references_batch(references: list, style: str, subformat: str,
+                                  batch_size: int = LLM_BATCH_SIZE) -> list:
+    """
+    Анализ и исправление списка ссылок нейросетью, по batch_size ссылок в одном запросе.
+    Возвращает ответы в порядке references, в том же формате, что format_gost/format_apa_ai/format_mla_ai.
+    Ссылки из кэша и повторы в пакет не попадают.
+    """
+    style = style.upper()
+    spec = BATCH_STYLES.get(style)
+    if spec is None:
+        return [f"Ошибка: неверный формат (допустимые: {', '.join(BATCH_STYLES)})."] * len(references)
+    templates, label, single = spec
+    template = templates.get(subformat)
+    if template is None or batch_size <= 1:
+        return list(await asyncio.gather(*(single(reference, subformat) for reference in references)))
+
+    results = [None] * len(references)
+    pending = {}  # ключ кэша → позиции ссылок с этим ключом
+    keys = [make_key(template, reference, style, subformat) for reference in references]
+    found = await llm_cache.aget_many(keys)
+    for position, key in enumerate(keys):
+        cached = found.get(key)
+        if cached is not None:
+            results[position] = cached
+        else:
+            pending.setdefault(key, []).append(position)
+
+    unique = [(key, references[positions[0]]) for key, positions in pending.items()]
+    chunks = [unique[start:start + batch_size] for start in range(0, len(unique), batch_size)]
+    chunk_answers = await asyncio.gather(*(
+        _format_chunk(chunk, template, label, single, subformat) for chunk in chunks
+    ))
+    for chunk, answers in zip(chunks, chunk_answers):
+        for (key, _), answer in zip(chunk, answers):
+            for position in pending[key]:
+                results[position] = answer
+    return results
+
+
+class BatchFormatter:
+    """
+    Ленивый пакетный форматтер для потоковой обработки: get(i) запускает
+    пакетный запрос для группы из batch_size ссылок, содержащей i-ю,
+    и остальные ссылки группы получают ответ из того же запроса.
+    Список может пополняться по ходу (streaming=True): add() добавляет ссылку,
+    close() сообщает, что новых не будет; запрос для группы уходит, когда она
+    заполнена или список закрыт.
+    """
+
+    def __init__(self, references: list, style: str, subformat: str, batch_size: int = LLM_BATCH_SIZE,
+                 streaming: bool = False):
+        self.references = references
+        self.style = style
+        self.subformat = subformat
+        self.batch_size = max(1, batch_size)
+        self._chunks = {}
+        self._closed = not streaming
+        self._grown = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Ожидающие групп просыпаются на старом событии и ждут дальше на новом
+        self._grown.set()
+        self._grown = asyncio.Event()
+
+    def add(self, reference: str) -> int:
+        """Добавляет ссылку в потоковый список, возвращает её позицию для get()."""
+        self.references.append(reference)
+        self._notify()
+        return len(self.references) - 1
+
+    def close(self) -> None:
+        self._closed = True
+        self._notify()
+
+    async def wait_group(self, position: int) -> None:
+        """Ждёт, пока группа с position-й ссылкой заполнится или список закроется (запрос не запускается)."""
+        start = position // self.batch_size * self.batch_size
+        while not self._closed and len(self.references) < start + self.batch_size:
+            await self._grown.wait()
+
+    async def get(self, position: int) -> str:
+        number = position // self.batch_size
+        start = number * self.batch_size
+        await self.wait_group(position)
+        task = self._chunks.get(number)
+        if task is None:
+            task = asyncio.ensure_future(format_references_batch(
+                self.references[start:start + self.batch_size], self.style, self.subformat, self.batch_size
+            ))
+            self._chunks[number] = task
+        # shield: отмена одного ожидающего не отменяет запрос для всей группы
+        answers = await asyncio.shield(task)
+        return answers[position - start]
+
+    def cancel(self) -> None:
+        for task in self._chunks.values():
+            task.cancel()
@@ -1,17 +1,7 @@
 # backend/apa_ai_converter.py
-import openai
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+from backend.llm_client import chat_completion
 
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
-
-def convert_to_apa(reference: str) -> str:
+async def convert_to_apa(reference: str) -> str:
     prompt = f"""
 Ты — эксперт по оформлению библиографических ссылок согласно стандарту APA.
 Преобразуй данную библиографическую ссылку в корректное оформление по APA в одном предложении, используя следующий точный шаблон:
@@ -20,14 +10,7 @@ def convert_to_apa(reference: str) -> str:
 Ссылка пользователя:
 "{reference}"
 """
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            timeout=150
-        )
-        return response.choices[0].message.content.strip()
+        return await chat_completion(prompt, timeout=150)
     except Exception as e:
         return f"Ошибка при вызове нейросетевого сервиса: {e}"
@@ -1,18 +1,9 @@
-import openai
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+from backend.llm_client import chat_completion
+from backend.cache import make_key
 
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
-
-def format_apa_ai(reference: str, subformat: str) -> str:
-    prompt_templates = {
-        "Журнальная статья": """
+# Шаблоны промптов по подтипам; общие для одиночного и пакетного режимов (backend.ai_batch)
+PROMPT_TEMPLATES = {
+    "Журнальная статья": """
 Ты — эксперт по стандарту APA (7-е издание). Проверь ссылку и исправь её, предполагая, что это журнальная статья.
 
 **Задача:**
@@ -34,7 +25,7 @@ APA:
 **Ссылка:**
 "{reference}"
 """,
-        "Онлайн-журнал": """
+    "Онлайн-журнал": """
 Ты — эксперт по стандарту APA (7-е издание). Проверь ссылку и исправь её, предполагая, что это онлайн-журнал.
 
 **Задача:**
@@ -56,7 +47,7 @@ APA:
 **Ссылка:**
 "{reference}"
 """,
-        "Сетевое издание": """
+    "Сетевое издание": """
 Ты — эксперт по стандарту APA (7-е издание). Проверь ссылку и исправь её, предполагая, что это сетевое издание.
 
 **Задача:**
@@ -78,7 +69,7 @@ APA:
 **Ссылка:**
 "{reference}"
 """,
-        "Книга": """
+    "Книга": """
 Ты — эксперт по стандарту APA (7-е издание). Проверь ссылку и исправь её, предполагая, что это книга.
 
 **Задача:**
@@ -100,21 +91,15 @@ APA:
 **Ссылка:**
 "{reference}"
 """
-    }
+}
 
-    prompt = prompt_templates.get(subformat)
+async def format_apa_ai(reference: str, subformat: str) -> str:
+    prompt = PROMPT_TEMPLATES.get(subformat)
     if not prompt:
         return f"Ошибка: неверный подтип для APA: {subformat}"
 
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
-    
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt.format(reference=reference)}],
-            temperature=0.1,
-            timeout=150
-        )
-        return response.choices[0].message.content.strip()
+        return await chat_completion(prompt.format(reference=reference), timeout=150,
+                                     cache_key=make_key(prompt, reference, "APA", subformat))
     except Exception as e:
         return f"Ошибка при вызове нейросетевого сервиса: {e}"
\ No newline at end of file
@@ -1,9 +1,13 @@
-def format_apa(reference: str) -> str:
+from backend.reference_renderer import parse_reference, guess_subformat, render_reference
+
+
+def format_apa(reference: str, subformat: str = None) -> str:
     """
-    Форматирует библиографическую ссылку в стиль APA.
+    Форматирует библиографическую ссылку в стиль APA по шаблону, без нейросети.
     
     Аргументы:
         reference (str): Исходная библиографическая запись.
+        subformat (str): Подтип APA; если не указан, определяется по найденным полям.
     
     Возвращает:
         str: Строка с оформленной ссылкой по стандарту APA или сообщение об ошибке.
@@ -11,23 +15,10 @@ def format_apa(reference: str) -> str:
     if not reference.strip():
         return "Ошибка: Пустая библиографическая запись."
 
-    # Простейшая логика разбора записи.
-    # Предполагается, что входная запись содержит основные элементы, разделённые запятыми:
-    # Автор, Год, Название, Остальные данные (журнал, том, номер, страницы, doi/ISSN и т.д.)
-    parts = [part.strip() for part in reference.split(',')]
-    if len(parts) < 4:
+    # Поля (авторы, год, заглавие, источник, том, номер, страницы, DOI/URL) разбираются
+    # backend.reference_renderer; оформление — по шаблону подтипа
+    record = parse_reference(reference)
+    formatted = render_reference(record, "APA", subformat or guess_subformat(record, "APA"))
+    if formatted is None:
         return "Ошибка: Недостаточно данных для формирования записи по APA. Проверьте входную запись."
-
-    # Извлекаем элементы (данные можно дорабатывать, добавляя более сложную обработку)
-    author = parts[0]
-    year = parts[1]
-    title = parts[2]
-    # Остальные элементы объединяем в один блок
-    rest = ', '.join(parts[3:])
-
-    # Простейший пример форматирования:
-    # В действительности оформление должно учитывать пунктуацию, скобки для года, курсив для названий журналов и т.д.
-    formatted = f"{author} ({year}). {title}. {rest}"
-    
-    # Добавляем пометку, что запись оформлена по стандарту APA
-    return f"APA: {formatted}"
+    return formatted
@@ -0,0 +1,145 @@
+# backend/browser_pool.py
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+# Параметры пула браузерных контекстов
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+BROWSER_CONTEXT_MAX_PAGES = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "25"))
+BROWSER_BLOCK_RESOURCES = os.getenv("BROWSER_BLOCK_RESOURCES", "1") != "0"
+
+# Ресурсы, не нужные для извлечения библиографических данных
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOST_MARKERS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "mc.yandex.ru", "top-fwz1.mail.ru", "connect.facebook.net",
+    "hotjar.com", "scorecardresearch.com", "newrelic.com", "nr-data.net",
+    "adservice.google", "criteo.", "cdn.segment.com", "quantserve.com"
+)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def _block_heavy_resources(route):
+    """Отклоняет картинки, шрифты, медиа и запросы аналитики, остальное пропускает."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+            marker in request.url for marker in BLOCKED_HOST_MARKERS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class _ContextSlot:
+    """Слот пула: браузерный контекст, число обслуженных страниц и поколение браузера."""
+
+    def __init__(self):
+        self.context = None
+        self.pages_served = 0
+        self.generation = -1
+
+
+class BrowserPool:
+    """
+    Один долгоживущий headless Chromium, страницы которого выдаются из пула
+    браузерных контекстов. Контекст пересоздаётся после max_pages страниц,
+    а при падении браузера он перезапускается при следующем запросе страницы.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_pages: int = BROWSER_CONTEXT_MAX_PAGES):
+        self.size = size
+        self.max_pages = max_pages
+        self._playwright = None
+        self._browser = None
+        self._generation = 0
+        self._slots = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self) -> None:
+        """Запускает браузер (повторный вызов ничего не делает, упавший браузер перезапускается)."""
+        async with self._lock:
+            if self.started:
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self._browser is not None:
+                logger.warning("Браузер недоступен, выполняется перезапуск")
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._generation += 1
+            if self._slots is None:
+                self._slots = asyncio.Queue()
+                for _ in range(self.size):
+                    self._slots.put_nowait(_ContextSlot())
+            logger.info("Браузер запущен: пул из %s контекстов, пересоздание после %s страниц",
+                        self.size, self.max_pages)
+
+    async def stop(self) -> None:
+        """Закрывает браузер и Playwright (при остановке приложения)."""
+        async with self._lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.error("Ошибка при закрытии браузера: %s", e)
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+            self._slots = None
+            logger.info("Браузер остановлен")
+
+    async def _prepare_context(self, slot: _ContextSlot) -> None:
+        """Создаёт контекст слота заново, если он устарел, исчерпал лимит страниц или отсутствует."""
+        if (slot.context is not None and slot.generation == self._generation
+                and slot.pages_served < self.max_pages):
+            return
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception:
+                pass  # контекст мог погибнуть вместе с прежним браузером
+        slot.context = await self._browser.new_context()
+        if BROWSER_BLOCK_RESOURCES:
+            await slot.context.route("**/*", _block_heavy_resources)
+        slot.pages_served = 0
+        slot.generation = self._generation
+
+    @asynccontextmanager
+    async def page(self):
+        """Выдаёт страницу из пула; страница закрывается, контекст возвращается в пул."""
+        if not self.started:
+            await self.start()
+        slot = await self._slots.get()
+        try:
+            if not self.started:
+                await self.start()
+            await self._prepare_context(slot)
+            try:
+                page = await slot.context.new_page()
+            except Exception:
+                # Контекст повреждён: при следующем запросе он будет создан заново
+                slot.pages_served = self.max_pages
+                raise
+            try:
+                yield page
+            finally:
+                slot.pages_served += 1
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        finally:
+            if self._slots is not None:
+                self._slots.put_nowait(slot)
+
+
+# Общий пул браузера для процесса
+browser_pool = BrowserPool()
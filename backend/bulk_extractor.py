@@ -0,0 +1,162 @@
+# backend/bulk_extractor.py
+import os
+import json
+import asyncio
+import logging
+from backend.llm_client import chat_completion
+from backend.cache import llm_cache, make_key
+
+# Сколько записей извлекается одним запросом к нейросети и таймаут такого запроса
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "25"))
+EXPORT_BATCH_TIMEOUT = float(os.getenv("EXPORT_BATCH_TIMEOUT", "300"))
+# Лимит токенов ответа на пакет: лимита провайдера по умолчанию может не хватить на JSON всех записей пакета
+EXPORT_BATCH_MAX_TOKENS = int(os.getenv("EXPORT_BATCH_MAX_TOKENS", "8192"))
+# Сколько записей неразобранных пакетов запрашиваются по одной одновременно (на весь процесс)
+EXPORT_FALLBACK_CONCURRENCY = int(os.getenv("EXPORT_FALLBACK_CONCURRENCY", "4"))
+fallback_semaphore = asyncio.Semaphore(EXPORT_FALLBACK_CONCURRENCY)
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Поля структурированной записи (порядок столбцов CSV)
+FIELDS = ["author", "editor", "title", "journal", "volume", "number",
+          "year", "pages", "publisher", "address", "url", "doi",
+          "month", "day", "note"]
+
+BULK_PROMPT = """Ты — эксперт по библиографии и BibTeX. Для каждой пронумерованной записи извлеки все доступные поля.
+
+**Схема ответа (JSON):**
+{{"items": [{{"index": <номер записи>, "author": "...", "editor": "...", "title": "...", "journal": "...",
+"volume": "...", "number": "...", "year": "...", "pages": "...", "publisher": "...", "address": "...",
+"url": "...", "doi": "...", "month": "...", "day": "...", "note": "..."}}]}}
+
+**Правила:**
+- Ровно один объект в items на каждую запись, index — номер записи.
+- Значения — строки; поля без значения не включай.
+- Если есть «под ред.» / «ed.», укажи редактора в editor, а не в author.
+- Для статьи: название журнала в journal, том в volume, номер выпуска в number.
+- Для книги: место издания в address, издательство в publisher, число страниц в pages.
+- Пометки вроде «в печати» или «дата обращения: ...» помещай в note.
+
+Пример:
+Записи:
+1. "Пакшина С.М. Передвижение солей в почве // Почвоведение. 1980. Т. 5. № 3. С. 45–50."
+Ответ:
+{{"items": [{{"index": 1, "author": "Пакшина С.М.", "title": "Передвижение солей в почве", "journal": "Почвоведение", "volume": "5", "number": "3", "year": "1980", "pages": "45–50"}}]}}
+
+Записи:
+{references}
+"""
+
+
+def _item_key(reference: str) -> str:
+    # Ключ записи не зависит от состава пакета: запись из кэша переиспользуется в любом пакете
+    return make_key(BULK_PROMPT, reference, "item")
+
+
+def clean_fields(raw) -> dict:
+    """Оставляет только известные поля с непустыми значениями (числа приводятся к строкам)."""
+    data = {}
+    if not isinstance(raw, dict):
+        return data
+    for field in FIELDS:
+        value = raw.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if isinstance(value, str) and value.strip():
+            data[field] = value.strip()
+    return data
+
+
+def parse_bulk_response(response: str, count: int) -> dict:
+    """Разбирает ответ {"items": [...]} → {позиция (с 0): поля}; некорректные элементы пропускаются."""
+    try:
+        payload = json.loads(response[response.find("{"):response.rfind("}") + 1])
+    except ValueError:
+        return {}
+    items = payload.get("items") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return {}
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            number = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        data = clean_fields(item)
+        if 1 <= number <= count and data:
+            parsed[number - 1] = data
+    return parsed
+
+
+async def _request_chunk(references: list) -> dict:
+    """Один запрос к нейросети для группы записей → {позиция (с 0): поля} для разобранных записей."""
+    numbered = "\n".join(f"{number}. {json.dumps(reference, ensure_ascii=False)}"
+                         for number, reference in enumerate(references, 1))
+    try:
+        response = await chat_completion(BULK_PROMPT.format(references=numbered),
+                                         timeout=EXPORT_BATCH_TIMEOUT,
+                                         response_format={"type": "json_object"},
+                                         max_tokens=EXPORT_BATCH_MAX_TOKENS)
+    except Exception as e:
+        logger.error("Ошибка пакетного извлечения полей (%s записей): %s", len(references), e)
+        return {}
+    parsed = parse_bulk_response(response, len(references))
+    await llm_cache.aset_many({_item_key(references[position]): data for position, data in parsed.items()})
+    return parsed
+
+
+async def _request_single(reference: str) -> dict:
+    """Запрос одной записи не разобранного пакета (не больше EXPORT_FALLBACK_CONCURRENCY одновременно)."""
+    async with fallback_semaphore:
+        return await _request_chunk([reference])
+
+
+async def _extract_chunk(references: list) -> list:
+    """Пакетный запрос; записи, не разобранные в пакете, запрашиваются по одной."""
+    parsed = await _request_chunk(references)
+    missing = [position for position in range(len(references)) if position not in parsed]
+    if missing and len(references) > 1:
+        logger.warning("Пакетное извлечение: разобрано %s из %s, остальные извлекаются по одной",
+                       len(parsed), len(references))
+        singles = await asyncio.gather(*(_request_single(references[position]) for position in missing))
+        for position, single in zip(missing, singles):
+            if 0 in single:
+                parsed[position] = single[0]
+    return [parsed.get(position, {}) for position in range(len(references))]
+
+
+async def extract_fields_bulk(references: list, chunk_size: int = EXPORT_BATCH_SIZE) -> list:
+    """
+    Структурированные поля (словарь по FIELDS) для каждой записи, в порядке references.
+    Записи извлекаются пакетами по chunk_size в одном запросе с JSON-ответом;
+    записи из кэша и повторы повторно не отправляются. Если поля извлечь
+    не удалось, для записи возвращается пустой словарь.
+    """
+    results = [None] * len(references)
+    pending = {}  # ключ кэша → позиции записей
+    keys = [_item_key(reference) for reference in references]
+    found = await llm_cache.aget_many(keys)
+    for position, key in enumerate(keys):
+        cached = found.get(key)
+        if cached is not None:
+            results[position] = cached
+        else:
+            pending.setdefault(key, []).append(position)
+
+    unique = [(key, references[positions[0]]) for key, positions in pending.items()]
+    chunk_size = max(1, chunk_size)
+    chunks = [unique[start:start + chunk_size] for start in range(0, len(unique), chunk_size)]
+    logger.info("Пакетное извлечение полей: %s записей, из кэша %s, запросов %s",
+                len(references), len(references) - sum(len(p) for p in pending.values()), len(chunks))
+    chunk_results = await asyncio.gather(*(
+        _extract_chunk([reference for _, reference in chunk]) for chunk in chunks
+    ))
+    for chunk, fields in zip(chunks, chunk_results):
+        for (key, _), data in zip(chunk, fields):
+            for position in pending[key]:
+                results[position] = data
+    return results
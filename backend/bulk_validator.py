@@ -0,0 +1,162 @@
+# backend/bulk_validator.py
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from backend import reference_validator
+from backend.executor import PROCESS_POOL_WORKERS, get_process_pool, run_blocking
+from backend.log_utils import log_summary
+
+# Ссылок в одном пакете, отправляемом в процесс пула
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+# Пакетов в работе на один процесс: ограничивает память на огромных входах, не давая процессам простаивать
+BULK_PREFETCH = int(os.getenv("BULK_PREFETCH", "2"))
+# Уровень логирования валидатора в процессах пула (трассировка запроса в процессы не передаётся)
+BULK_WORKER_LOG_LEVEL = os.getenv("BULK_WORKER_LOG_LEVEL", "WARNING")
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def split_bulk_text(text: str) -> list:
+    """Массовый ввод: одна ссылка на строку, пустые строки пропускаются."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def validate_chunk(references: list, style: str, subformat: str = None, offset: int = 0) -> list:
+    """Проверка пакета ссылок; index — позиция ссылки во всём входе (offset + номер в пакете)."""
+    results = []
+    for position, reference in enumerate(references):
+        is_valid, errors, ref_type = reference_validator.validate_reference_by_style(reference, style, subformat)
+        results.append({
+            "type": "valid" if is_valid else "invalid",
+            "index": offset + position,
+            "reference": reference,
+            "detected_type": ref_type,
+            "errors": errors,
+        })
+    return results
+
+
+def _validate_chunk_in_worker(references: list, style: str, subformat: str, offset: int) -> list:
+    # Выполняется в процессе пула (функция уровня модуля — передаётся через pickle)
+    reference_validator.logger.setLevel(BULK_WORKER_LOG_LEVEL)
+    return validate_chunk(references, style, subformat, offset)
+
+
+class BulkValidation:
+    """
+    Массовая проверка ссылок в пуле процессов. Вход делится на пакеты по chunk_size,
+    пакеты проверяются параллельно, результаты отдаются строго в исходном порядке —
+    синхронно (for result in bulk) или асинхронно (async for result in bulk.stream()).
+    После обхода summary() возвращает итоги и пропускную способность.
+    Небольшой вход (один пакет) проверяется без пула процессов.
+    """
+
+    def __init__(self, references: list, style: str, subformat: str = None,
+                 chunk_size: int = BULK_CHUNK_SIZE, executor=None, workers: int = None):
+        self.references = references
+        self.style = style.upper()
+        self.subformat = subformat
+        self.chunk_size = max(1, chunk_size)
+        self.executor = executor
+        self.workers = workers or PROCESS_POOL_WORKERS
+        self.valid = 0
+        self.invalid = 0
+        self.elapsed = 0.0
+
+    def _chunks(self):
+        for offset in range(0, len(self.references), self.chunk_size):
+            yield offset, self.references[offset:offset + self.chunk_size]
+
+    @property
+    def parallel(self) -> bool:
+        return len(self.references) > self.chunk_size
+
+    def _submit(self, offset: int, chunk: list):
+        executor = self.executor or get_process_pool()
+        return executor.submit(_validate_chunk_in_worker, chunk, self.style, self.subformat, offset)
+
+    def _count(self, results: list) -> list:
+        valid = sum(1 for result in results if result["type"] == "valid")
+        self.valid += valid
+        self.invalid += len(results) - valid
+        return results
+
+    def __iter__(self):
+        started = time.perf_counter()
+        try:
+            if not self.parallel:
+                yield from self._count(validate_chunk(self.references, self.style, self.subformat))
+                return
+            chunks = self._chunks()
+            pending = deque()
+            for offset, chunk in chunks:
+                pending.append(self._submit(offset, chunk))
+                if len(pending) >= self.workers * BULK_PREFETCH:
+                    break
+            while pending:
+                results = pending.popleft().result()
+                # Освободившееся место в окне сразу занимает следующий пакет
+                for offset, chunk in chunks:
+                    pending.append(self._submit(offset, chunk))
+                    break
+                yield from self._count(results)
+        finally:
+            self.elapsed = time.perf_counter() - started
+
+    async def stream(self):
+        """Асинхронный вариант обхода для эндпоинтов: цикл событий не блокируется."""
+        started = time.perf_counter()
+        pending = deque()
+        try:
+            if not self.parallel:
+                results = await run_blocking(validate_chunk, self.references, self.style, self.subformat)
+                for result in self._count(results):
+                    yield result
+                return
+            chunks = self._chunks()
+            for offset, chunk in chunks:
+                pending.append(asyncio.wrap_future(self._submit(offset, chunk)))
+                if len(pending) >= self.workers * BULK_PREFETCH:
+                    break
+            while pending:
+                results = await pending.popleft()
+                for offset, chunk in chunks:
+                    pending.append(asyncio.wrap_future(self._submit(offset, chunk)))
+                    break
+                for result in self._count(results):
+                    yield result
+        finally:
+            # Клиент отключился — неначатые пакеты снимаются с очереди пула
+            for future in pending:
+                future.cancel()
+            self.elapsed = time.perf_counter() - started
+
+    def summary(self) -> dict:
+        total = self.valid + self.invalid
+        return {
+            "type": "summary",
+            "total": total,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "elapsed_sec": round(self.elapsed, 3),
+            "refs_per_sec": round(total / self.elapsed) if self.elapsed else None,
+            "workers": self.workers if self.parallel else 1,
+            "chunk_size": self.chunk_size,
+        }
+
+
+def validate_references_bulk(references: list, style: str, subformat: str = None,
+                             chunk_size: int = BULK_CHUNK_SIZE, executor=None) -> tuple:
+    """
+    Синхронный Python API: (результаты в исходном порядке, итоги).
+    Результат — словарь type (valid/invalid), index, reference, detected_type, errors.
+    """
+    bulk = BulkValidation(references, style, subformat, chunk_size, executor)
+    results = list(bulk)
+    summary = bulk.summary()
+    log_summary(logger, "validate_bulk", **{key: value for key, value in summary.items() if key != "type"})
+    return results, summary
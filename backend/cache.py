@@ -0,0 +1,318 @@
+# backend/cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from backend.executor import run_blocking
+
+# Параметры кэша результатов нейросети
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "2048"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "200000"))
+
+# Параметры кэша разобранных документов (ключ — SHA-256 загруженного файла).
+# Дисковый уровень включается заданием DOCUMENT_CACHE_PATH
+DOCUMENT_CACHE_ENABLED = os.getenv("DOCUMENT_CACHE_ENABLED", "1") != "0"
+DOCUMENT_CACHE_PATH = os.getenv("DOCUMENT_CACHE_PATH", "")
+DOCUMENT_CACHE_TTL = float(os.getenv("DOCUMENT_CACHE_TTL", str(24 * 3600)))
+DOCUMENT_CACHE_MEMORY_SIZE = int(os.getenv("DOCUMENT_CACHE_MEMORY_SIZE", "256"))
+DOCUMENT_CACHE_MAX_ROWS = int(os.getenv("DOCUMENT_CACHE_MAX_ROWS", "20000"))
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_reference(text: str) -> str:
+    """Нормализует запись для ключа кэша: NFC, схлопывание пробелов, обрезка краёв."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def template_version(template: str) -> str:
+    """Версия шаблона промпта — хэш его текста. Любая правка шаблона меняет версию."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(template: str, reference: str, *parts: Any) -> str:
+    """
+    Строит ключ кэша из версии шаблона промпта, нормализованной записи
+    и дополнительных частей (стиль, подтип и т.п.).
+    """
+    digest = hashlib.sha256()
+    for part in (template_version(template), normalize_reference(reference), *parts):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш в памяти с ограничением размера и TTL."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Дисковый кэш на SQLite: значения хранятся в JSON, устаревшие записи
+    удаляются по TTL, при превышении max_rows вытесняются самые старые.
+    """
+
+    EVICT_EVERY = 500  # проверка размера раз в N записей
+
+    def __init__(self, path: str, ttl: float, max_rows: int, table: str = "cache"):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.table = table
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # В режиме WAL фиксация без fsync на каждую запись: при сбое питания теряются
+            # лишь последние записи кэша, целостность базы сохраняется
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created ON {table}(created_at)")
+            self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if created_at + self.ttl < time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Записывает несколько значений одной транзакцией."""
+        now = time.time()
+        rows = [(key, json.dumps(value, ensure_ascii=False), now) for key, value in items.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+            before = self._writes
+            self._writes += len(rows)
+            if self._writes // self.EVICT_EVERY != before // self.EVICT_EVERY:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Удаляет устаревшие записи и самые старые сверх лимита (вызывается под блокировкой)."""
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,))
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_rows:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY created_at LIMIT ?)",
+                (count - self.max_rows,)
+            )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: LRU в памяти поверх SQLite на диске.
+    Считает попадания по уровням и промахи. Из корутин используются aget/aget_many/aset_many:
+    память проверяется сразу, обращения к SQLite выполняются в пуле потоков (run_blocking).
+    """
+
+    def __init__(self, name: str, memory_size: int, ttl: float,
+                 path: Optional[str] = None, max_rows: int = 0, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.memory = LRUCache(memory_size, ttl)
+        self.disk = None
+        if enabled and path:
+            try:
+                self.disk = SQLiteCache(path, ttl, max_rows, table=name)
+            except sqlite3.Error as e:
+                logger.error("Дисковый кэш '%s' недоступен (%s), используется только память", name, e)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        if not self.enabled:
+            return None
+        value = self._memory_get(key)
+        if value is not None or self.disk is None:
+            return value
+        return self._disk_get_many([key]).get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        if not self.enabled or not items:
+            return
+        for key, value in items.items():
+            self.memory.set(key, value)
+        self._disk_set_many(items)
+
+    async def aget(self, key: str) -> Any:
+        """get() без блокировки цикла событий."""
+        return (await self.aget_many([key])).get(key)
+
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Найденные значения {ключ: значение}; промахи памяти читаются с диска одним вызовом в пуле потоков."""
+        if not self.enabled:
+            return {}
+        found, missing = {}, []
+        for key in keys:
+            value = self._memory_get(key)
+            if value is not None:
+                found[key] = value
+            elif self.disk is not None:
+                missing.append(key)
+        if missing:
+            found.update(await run_blocking(self._disk_get_many, missing))
+        return found
+
+    async def aset(self, key: str, value: Any) -> None:
+        """set() без блокировки цикла событий."""
+        await self.aset_many({key: value})
+
+    async def aset_many(self, items: Dict[str, Any]) -> None:
+        """Память обновляется сразу, на диск значения пишутся одной транзакцией в пуле потоков."""
+        if not self.enabled or not items:
+            return
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if self.disk is not None:
+            await run_blocking(self._disk_set_many, items)
+
+    def _memory_get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+        elif self.disk is None:
+            self.misses += 1
+        return value
+
+    def _disk_get_many(self, keys: list) -> Dict[str, Any]:
+        found = {}
+        for key in keys:
+            disk = self.disk
+            value = disk.get(key) if disk is not None else None
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                found[key] = value
+            else:
+                self.misses += 1
+        return found
+
+    def _disk_set_many(self, items: Dict[str, Any]) -> None:
+        disk = self.disk
+        if disk is None:
+            return
+        try:
+            disk.set_many(items)
+        except sqlite3.Error as e:
+            logger.error("Ошибка записи в дисковый кэш '%s': %s", self.name, e)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0
+        }
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+
+# Общий кэш ответов нейросети
+llm_cache = TieredCache(
+    "llm",
+    memory_size=LLM_CACHE_MEMORY_SIZE,
+    ttl=LLM_CACHE_TTL,
+    path=LLM_CACHE_PATH,
+    max_rows=LLM_CACHE_MAX_ROWS,
+    enabled=LLM_CACHE_ENABLED
+)
+
+# Общий кэш разобранных документов: document_id (SHA-256 файла) → имя файла и список ссылок
+document_cache = TieredCache(
+    "documents",
+    memory_size=DOCUMENT_CACHE_MEMORY_SIZE,
+    ttl=DOCUMENT_CACHE_TTL,
+    path=DOCUMENT_CACHE_PATH,
+    max_rows=DOCUMENT_CACHE_MAX_ROWS,
+    enabled=DOCUMENT_CACHE_ENABLED
+)
@@ -2,20 +2,13 @@
 # ────────────────────────────────────────────────────────────
 #  Никаких «пустых запятых»: выводятся только заполненные поля.
 # ────────────────────────────────────────────────────────────
-import openai
 import csv
 import io
 import logging
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
+from backend.llm_client import chat_completion
+from backend.cache import make_key
+from backend.bulk_extractor import extract_fields_bulk
+from backend.log_utils import trace, log_summary
 
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s  %(levelname)s  %(message)s")
@@ -38,18 +31,11 @@ CSV_FIELDS = ["author", "editor", "title", "journal", "volume", "number",
               "month", "day", "note"]
 
 
-def _llm_extract(reference: str) -> dict:
+async def _llm_extract(reference: str) -> dict:
     """Запрашиваем LLM → получаем словарь заполненных полей."""
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY,
-                           base_url="https://api.deepseek.com/v1")
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": PROMPT.format(reference=reference)}],
-        temperature=0.1,
-        timeout=180
-    )
-    raw = resp.choices[0].message.content.strip()
-    logger.info("LLM raw:\n%s", raw)
+    raw = await chat_completion(PROMPT.format(reference=reference), timeout=180,
+                                cache_key=make_key(PROMPT, reference))
+    trace(logger, "LLM raw:\n%s", raw)
 
     data = {}
     for line in raw.splitlines():
@@ -59,9 +45,9 @@ def _llm_extract(reference: str) -> dict:
     return data
 
 
-def format_reference_to_csv(reference: str) -> str:
+async def format_reference_to_csv(reference: str) -> str:
     """Возвращает CSV‑строку (UTF‑8, без пустых ячеек)."""
-    data = _llm_extract(reference)
+    data = await _llm_extract(reference)
     filled_fields = [f for f in CSV_FIELDS if data.get(f)]
 
     output = io.StringIO()
@@ -70,5 +56,24 @@ def format_reference_to_csv(reference: str) -> str:
     writer.writerow([data[f] for f in filled_fields])
 
     csv_str = output.getvalue()
-    logger.info("CSV ready:\n%s", csv_str)
+    trace(logger, "CSV ready:\n%s", csv_str)
+    return csv_str
+
+
+async def format_references_to_csv(references: list) -> str:
+    """
+    CSV со строкой на каждую ссылку (в исходном порядке). Поля извлекаются
+    пакетно; выводятся только столбцы, заполненные хотя бы в одной записи.
+    """
+    records = await extract_fields_bulk(references)
+    filled_fields = [f for f in CSV_FIELDS if any(data.get(f) for data in records)]
+
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(filled_fields)
+    for data in records:
+        writer.writerow([data.get(f, "") for f in filled_fields])
+
+    csv_str = output.getvalue()
+    log_summary(logger, "references_to_csv", rows=len(records), columns=len(filled_fields))
     return csv_str
@@ -1,54 +1,391 @@
 # backend/document_parser.py
 import pdfplumber
 import docx
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
 import re
 import os
 import io
+import shutil
+import tempfile
+import contextlib
+from backend.executor import PROCESS_POOL_WORKERS, get_process_pool
+from backend.uploads import UPLOAD_SPOOL_DIR
+from backend.text_parser import ReferenceTokenizer, clean_multiline_refs, iter_references
 
-def extract_text_from_pdf(file_obj):
-    text = ""
-    file_obj.seek(0)  # сбрасываем указатель!
-    with pdfplumber.open(file_obj) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text(x_tolerance=2, y_tolerance=2)
-            if page_text:
-                text += page_text + "\n"
-    return text.strip()
+# С какого числа страниц PDF разбирается параллельно в пуле процессов и по сколько страниц на задачу
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "10"))
+# Окно обратного просмотра (страниц за шаг), когда нужен только список литературы в конце документа.
+# При пуле процессов окно не меньше PDF_PARALLEL_MIN_PAGES — иначе окна разбирались бы последовательно
+PDF_REVERSE_WINDOW = int(os.getenv("PDF_REVERSE_WINDOW", "40"))
+
+# Синонимы заголовка списка литературы и заголовки разделов, которыми он заканчивается (через запятую)
+BIBLIOGRAPHY_HEADINGS = [heading.strip() for heading in os.getenv(
+    "BIBLIOGRAPHY_HEADINGS",
+    "Список литературы,Список использованных источников,Список использованной литературы,"
+    "Литература,Библиография,Библиографический список,References,Bibliography"
+).split(",") if heading.strip()]
+BIBLIOGRAPHY_END_HEADINGS = [heading.strip() for heading in os.getenv(
+    "BIBLIOGRAPHY_END_HEADINGS", "Приложение,Приложения,Appendix,Appendices"
+).split(",") if heading.strip()]
+
+
+def _heading_line_re(headings: list, suffix: str = "") -> re.Pattern:
+    # Заголовок — отдельная строка: необязательный номер раздела, сам заголовок, двоеточие/точка
+    names = "|".join(re.escape(heading).replace(r"\ ", r"\s+") for heading in sorted(headings, key=len, reverse=True))
+    return re.compile(rf"^[ \t]*(?:\d+(?:\.\d+)*\.?[ \t]+)?(?:{names}){suffix}[ \t]*[.:]?[ \t]*$",
+                      re.IGNORECASE | re.MULTILINE)
+
+
+BIBLIOGRAPHY_HEADING_RE = _heading_line_re(BIBLIOGRAPHY_HEADINGS)
+# «Приложение А», «Приложение 1», «Appendix B»
+BIBLIOGRAPHY_END_RE = _heading_line_re(BIBLIOGRAPHY_END_HEADINGS, r"(?:[ \t]+\w{1,3})?")
+# Запасной вариант для текста без отдельной строки заголовка: заголовок перед переводом строки
+BIBLIOGRAPHY_INLINE_RE = re.compile(
+    "(?:" + "|".join(re.escape(heading) for heading in BIBLIOGRAPHY_HEADINGS) + r")[ \t]*:?[ \t]*\n",
+    re.IGNORECASE
+)
+
+
+def _page_text(page) -> str:
+    text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+    # Символы страницы кэшируются pdfplumber до закрытия документа — освобождаем сразу
+    page.close()
+    return text
+
+
+def _open_pdf(source):
+    # source — путь к файлу на диске, байты PDF или файловый объект с произвольным доступом
+    if isinstance(source, str):
+        return pdfplumber.open(source)
+    if isinstance(source, bytes):
+        return pdfplumber.open(io.BytesIO(source))
+    source.seek(0)
+    return pdfplumber.open(source)
+
+
+def extract_pdf_pages(source, start: int, stop: int) -> list:
+    """Текст страниц [start, stop) PDF. Функция уровня модуля: выполняется и в процессах пула."""
+    with _open_pdf(source) as pdf:
+        return [_page_text(page) for page in pdf.pages[start:stop]]
+
+
+def _pdf_page_count(source) -> int:
+    with _open_pdf(source) as pdf:
+        return len(pdf.pages)
+
+
+def _pdf_source(file_obj):
+    """
+    Файл на диске передаётся дальше по пути: процессы пула открывают его сами,
+    без копирования содержимого в каждую задачу. Файловый объект без пути (загрузка
+    Starlette, BytesIO) читается pdfplumber на месте, без копии в байты.
+    """
+    if isinstance(file_obj, str):
+        return file_obj
+    name = getattr(file_obj, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return file_obj
+
+
+def _parallel_pages(count: int) -> bool:
+    return count >= PDF_PARALLEL_MIN_PAGES and PROCESS_POOL_WORKERS > 1
+
+
+@contextlib.contextmanager
+def _pool_source(source, page_count: int):
+    """
+    Источник PDF для задач пула процессов: путь передаётся как есть, а байты или файловый
+    объект без пути один раз сбрасываются во временный файл — каждая задача получает путь,
+    а не свою копию PDF через pickle. Без параллельного разбора источник не меняется.
+    """
+    if isinstance(source, str) or not _parallel_pages(page_count):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(prefix="cyberref-pdf-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR) as spool:
+        if isinstance(source, bytes):
+            spool.write(source)
+        else:
+            source.seek(0)
+            shutil.copyfileobj(source, spool)
+        spool.flush()
+        yield spool.name
+
+
+def _extract_page_range(source, start: int, stop: int) -> list:
+    """Текст страниц [start, stop): большие диапазоны — параллельно в пуле процессов по PDF_PAGES_PER_TASK."""
+    if not _parallel_pages(stop - start):
+        return extract_pdf_pages(source, start, stop)
+    step = max(1, PDF_PAGES_PER_TASK)
+    starts = list(range(start, stop, step))
+    parts = get_process_pool().map(extract_pdf_pages, [source] * len(starts), starts,
+                                   [min(first + step, stop) for first in starts])
+    return [text for part in parts for text in part]
+
+
+def _join_pages(pages: list) -> str:
+    return "\n".join(text for text in pages if text).strip()
+
+
+def extract_text_from_pdf(file_obj, bibliography_only: bool = False):
+    """
+    Текст PDF (файловый объект или путь). Страницы собираются списком и склеиваются
+    один раз; большие документы разбираются параллельно в пуле процессов.
+    bibliography_only=True — обратный просмотр: страницы читаются окнами по
+    PDF_REVERSE_WINDOW с конца, пока не встретится заголовок списка литературы;
+    возвращается текст начиная со страницы с заголовком (оглавление в начале не читается).
+    Если заголовка нет, читается весь документ.
+    """
+    source = _pdf_source(file_obj)
+    if not bibliography_only:
+        page_count = _pdf_page_count(source)
+        with _pool_source(source, page_count) as source:
+            return _join_pages(_extract_page_range(source, 0, page_count))
+    pages, _ = _pdf_bibliography_pages(source)
+    return _join_pages(pages)
+
+
+def _pdf_bibliography_pages(source):
+    """
+    Обратный просмотр PDF окнами по PDF_REVERSE_WINDOW страниц с конца до страницы
+    с последним заголовком списка литературы. Возвращает (тексты страниц начиная
+    со страницы заголовка, True) или (тексты всех страниц, False), если заголовка нет.
+    """
+    tail = []
+    stop = _pdf_page_count(source)
+    window_size = max(1, PDF_REVERSE_WINDOW)
+    if _parallel_pages(stop):
+        window_size = max(window_size, PDF_PARALLEL_MIN_PAGES)
+    with _pool_source(source, stop) as source:
+        while stop > 0:
+            start = max(0, stop - window_size)
+            window = _extract_page_range(source, start, stop)
+            tail = window + tail
+            # Последний заголовок документа — ближайший к концу, поэтому ищем с конца окна
+            for position in range(len(window) - 1, -1, -1):
+                if BIBLIOGRAPHY_HEADING_RE.search(window[position]):
+                    return tail[position:], True
+            stop = start
+    return tail, False
+
+
+def iter_pdf_references(file_obj):
+    """
+    Ссылки из списка литературы PDF по одной: страницы начиная с заголовка раздела
+    подаются в ReferenceTokenizer постранично, до заголовка приложения.
+    """
+    pages, found = _pdf_bibliography_pages(_pdf_source(file_obj))
+    if not found:
+        # Заголовка отдельной строкой нет — запасной поиск раздела по всему тексту
+        text = _join_pages(pages)
+        bounds = locate_bibliography_section(text)
+        if bounds is not None:
+            yield from iter_references([text[bounds[0]:bounds[1]]])
+        return
+    heading = _last_match(BIBLIOGRAPHY_HEADING_RE, pages[0])
+    chunks = [pages[0][heading.end():]] + pages[1:]
+    tokenizer = ReferenceTokenizer()
+    for text in chunks:
+        end_heading = BIBLIOGRAPHY_END_RE.search(text)
+        yield from tokenizer.feed((text[:end_heading.start()] if end_heading else text) + "\n")
+        if end_heading:
+            break
+    yield from tokenizer.finish()
 
 def extract_text_from_docx(file_obj):
     file_obj.seek(0)
     doc = docx.Document(file_obj)
     return "\n".join(para.text for para in doc.paragraphs if para.text.strip())
 
-def extract_text(file_obj, filename):
+# Ручная нумерация ссылки в начале абзаца: «12. », «12) »
+REFERENCE_NUMBER_RE = re.compile(r"^\d+[.)]\s+")
+HEADING_LEVEL_RE = re.compile(r"(\d+)$")
+
+
+def iter_docx_paragraphs(file_obj):
+    """Абзацы тела документа по одному, без построения списка doc.paragraphs и общего текста."""
+    file_obj.seek(0)
+    doc = docx.Document(file_obj)
+    for element in doc.element.body.iterchildren(qn("w:p")):
+        yield Paragraph(element, doc)
+
+
+def _docx_style_chain(paragraph):
+    style = paragraph.style
+    while style is not None:
+        yield style
+        style = style.base_style
+
+
+def _docx_style_info(paragraph, styles: dict) -> tuple:
+    """
+    (уровень заголовка, нумерованный список, оглавление) по стилю абзаца с учётом
+    базовых стилей. Поиск стиля в python-docx идёт через xpath по styles.xml,
+    поэтому результат кэшируется в styles по id стиля на время разбора документа.
+    """
+    style_id = paragraph._p.style
+    if style_id not in styles:
+        level, numbered, toc = None, False, False
+        for depth, style in enumerate(_docx_style_chain(paragraph)):
+            name = (style.name or "").lower()
+            if depth == 0:
+                toc = name.startswith(("toc", "оглавление"))
+            if level is None and name == "title":
+                level = 0
+            elif level is None and name.startswith(("heading", "заголовок")):
+                number = HEADING_LEVEL_RE.search(name)
+                level = int(number.group(1)) if number else 1
+            style_p_pr = style.element.pPr
+            if style_p_pr is not None and style_p_pr.numPr is not None:
+                numbered = True
+        styles[style_id] = (level, numbered, toc)
+    return styles[style_id]
+
+
+def _docx_heading_level(paragraph, styles: dict):
+    """Уровень заголовка по стилю («Heading 2», «Заголовок 2», «Title») или outlineLvl; None — не заголовок."""
+    p_pr = paragraph._p.pPr
+    outline = p_pr.find(qn("w:outlineLvl")) if p_pr is not None else None
+    if outline is not None:
+        return int(outline.get(qn("w:val"))) + 1
+    return _docx_style_info(paragraph, styles)[0]
+
+
+def _is_docx_toc(paragraph, styles: dict) -> bool:
+    return _docx_style_info(paragraph, styles)[2]
+
+
+def _is_docx_numbered(paragraph, styles: dict) -> bool:
+    """Элемент автоматического списка Word: numPr у абзаца или у его стиля («List Number»)."""
+    p_pr = paragraph._p.pPr
+    if p_pr is not None and p_pr.numPr is not None:
+        return True
+    return _docx_style_info(paragraph, styles)[1]
+
+
+def _append_docx_reference(section: list, parts: list) -> None:
+    """Добавляет в раздел ссылку из накопленных абзацев (слишком короткие отбрасываются)."""
+    if parts:
+        reference = clean_multiline_refs("\n".join(parts))
+        if len(reference) > 5:
+            section.append(reference)
+
+
+def iter_docx_references(file_obj):
+    """
+    Ссылки из списка литературы DOCX по одной. Раздел начинается с последнего в документе
+    абзаца-заголовка из BIBLIOGRAPHY_HEADINGS (стили оглавления пропускаются), как и в PDF:
+    более ранний заголовок с тем же текстом в основной части — не список литературы.
+    Раздел заканчивается на следующем заголовке того же или более высокого уровня либо
+    на заголовке приложения; подзаголовки внутри раздела пропускаются.
+    Каждый элемент нумерованного списка Word (или абзац с ручной нумерацией) — новая ссылка,
+    ненумерованные абзацы внутри нумерованного списка продолжают предыдущую; в списке
+    без нумерации каждый абзац — отдельная ссылка. Ссылки отдаются после чтения документа,
+    когда известно, что более позднего заголовка нет.
+    """
+    styles = {}
+    section = None  # ссылки раздела после последнего найденного заголовка
+    section_level = None
+    in_section = False
+    numbered_list = False
+    parts = []
+    for paragraph in iter_docx_paragraphs(file_obj):
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        # Стиль (медленный поиск по styles.xml) смотрим только у абзаца с текстом заголовка
+        if BIBLIOGRAPHY_HEADING_RE.fullmatch(text) and not _is_docx_toc(paragraph, styles):
+            # Более поздний заголовок заменяет раздел, найденный раньше
+            section, parts, numbered_list = [], [], False
+            in_section, section_level = True, _docx_heading_level(paragraph, styles)
+            continue
+        if not in_section:
+            continue
+        level = _docx_heading_level(paragraph, styles)
+        if (level is not None and (section_level is None or level <= section_level)) \
+                or BIBLIOGRAPHY_END_RE.fullmatch(text):
+            _append_docx_reference(section, parts)
+            in_section, parts = False, []
+            continue
+        if level is not None:
+            # Подзаголовок внутри списка («Иностранные источники») — не ссылка
+            continue
+        manual_number = REFERENCE_NUMBER_RE.match(text)
+        if manual_number or _is_docx_numbered(paragraph, styles):
+            numbered_list = True
+        elif numbered_list and parts:
+            parts.append(text)
+            continue
+        _append_docx_reference(section, parts)
+        parts = [text[manual_number.end():] if manual_number else text]
+    if in_section:
+        _append_docx_reference(section, parts)
+    yield from section or ()
+
+
+def extract_text(file_obj, filename, bibliography_only: bool = False):
+    """
+    Текст документа. bibliography_only=True — вызывающему нужен только список литературы:
+    для PDF страницы читаются с конца до заголовка раздела (см. extract_text_from_pdf).
+    """
     ext = os.path.splitext(filename)[-1].lower()
 
     if ext == ".pdf":
-        return extract_text_from_pdf(file_obj)
+        return extract_text_from_pdf(file_obj, bibliography_only)
     elif ext == ".docx":
         return extract_text_from_docx(file_obj)
     else:
         raise ValueError("Поддерживаются только .pdf и .docx файлы.")
 
+def _last_match(pattern: re.Pattern, text: str):
+    match = None
+    for match in pattern.finditer(text):
+        pass
+    return match
+
+
+def locate_bibliography_section(text: str):
+    """
+    Границы списка литературы в тексте: (start, end) или None.
+    Берётся последний заголовок из BIBLIOGRAPHY_HEADINGS (упоминание в оглавлении
+    идёт раньше самого раздела), раздел заканчивается на следующем заголовке
+    из BIBLIOGRAPHY_END_HEADINGS (приложения) или в конце текста.
+    Текст не копируется — возвращаются только смещения.
+    """
+    heading = _last_match(BIBLIOGRAPHY_HEADING_RE, text) or _last_match(BIBLIOGRAPHY_INLINE_RE, text)
+    if heading is None:
+        return None
+    start = heading.end()
+    end_heading = BIBLIOGRAPHY_END_RE.search(text, start)
+    return start, end_heading.start() if end_heading else len(text)
+
+
 def extract_bibliography_section(text):
-    patterns = [
-        r"(Список литературы|Литература|Библиография|References)\s*\n(.+)",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-        if match:
-            return match.group(2).strip()
-    return ""
-
-def clean_multiline_refs(ref):
-    ref = re.sub(r'-\n\s*', '', ref)
-    ref = re.sub(r'(?<=[a-zа-яё])(?=[A-ZА-ЯЁ])', ' ', ref)
-    ref = re.sub(r'\n+', ' ', ref)
-    ref = re.sub(r'\s+', ' ', ref)
-    return ref.strip()
+    bounds = locate_bibliography_section(text)
+    if bounds is None:
+        return ""
+    start, end = bounds
+    return text[start:end].strip()
 
 def split_references_to_list(bibliography_text):
-    references = re.split(r'\n\d+\.\s', bibliography_text)
-    references = [clean_multiline_refs(ref) for ref in references if len(ref.strip()) > 5]
-    return references
+    return list(iter_references([bibliography_text]))
+
+
+def iter_document_references(file_obj, filename):
+    """
+    Ссылки из загруженного документа по мере разбора: DOCX — по абзацам и нумерации
+    списков (iter_docx_references), PDF — постранично из хвоста документа (iter_pdf_references).
+    """
+    ext = os.path.splitext(filename)[-1].lower()
+    if ext == ".docx":
+        return iter_docx_references(file_obj)
+    if ext == ".pdf":
+        return iter_pdf_references(file_obj)
+    raise ValueError("Поддерживаются только .pdf и .docx файлы.")
+
 
+def extract_references(file_obj, filename):
+    """Список ссылок из загруженного документа или None, если список литературы не найден."""
+    return list(iter_document_references(file_obj, filename)) or None
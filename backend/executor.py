@@ -0,0 +1,124 @@
+# backend/executor.py
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Размер пула потоков для блокирующих операций (разбор файлов, синхронные HTTP-клиенты)
+BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", "8"))
+# Пул процессов для CPU-нагрузки на чистом Python (массовая проверка ссылок регулярными выражениями):
+# потоки упираются в GIL, процессы масштабируются по ядрам. По умолчанию — по числу ядер
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or os.cpu_count() or 1
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_thread_pool = None
+_process_pool = None
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Возвращает общий пул потоков для блокирующих вызовов (создаётся лениво)."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_WORKERS,
+                                          thread_name_prefix="cyberref-blocking")
+        logger.info("Создан пул потоков для блокирующих операций: %s", BLOCKING_POOL_WORKERS)
+    return _thread_pool
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию в общем пуле потоков, не блокируя цикл событий.
+    Количество одновременно выполняемых блокирующих вызовов ограничено размером пула.
+    """
+    loop = asyncio.get_running_loop()
+    # Контекст (в т.ч. флаг трассировки запроса) переносится в поток, как в asyncio.to_thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Возвращает общий пул процессов (создаётся лениво). Процессы запускаются через spawn:
+    fork процесса с работающим циклом событий, пулом потоков и открытой SQLite небезопасен.
+    Функции для пула должны быть объявлены на уровне модуля (передаются через pickle).
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        logger.info("Создан пул процессов для CPU-нагрузки: %s", PROCESS_POOL_WORKERS)
+    return _process_pool
+
+
+async def run_in_process(func, *args):
+    """Выполняет функцию уровня модуля в общем пуле процессов, не блокируя цикл событий."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(func, *args))
+
+
+async def iterate_blocking(iterable, maxsize: int):
+    """
+    Асинхронный обход блокирующего итератора (например, постраничного разбора документа)
+    в отдельном потоке. Элементы передаются через очередь ёмкостью maxsize: поток
+    ждёт, пока потребитель не заберёт элементы. Исключение итератора поднимается у потребителя;
+    если потребитель прекратил обход, поток останавливается на следующем элементе.
+    Поток свой у каждого обхода, а не из общего пула: ожидающий потребителя производитель
+    не занимает потоки, нужные run_blocking (иначе несколько медленных потоков ответа
+    заняли бы весь пул, и обработка, от которой зависят потребители, встала бы).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(max(1, maxsize))
+    stopped = threading.Event()
+    done = object()
+    errors = []
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            if not stopped.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    # Контекст (в т.ч. флаг трассировки запроса) переносится в поток, как в run_blocking
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(produce,), name="cyberref-iterate", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                if errors:
+                    raise errors[0]
+                break
+            yield item
+    finally:
+        stopped.set()
+        # Освобождаем место в очереди, чтобы ожидающий поток увидел остановку
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def shutdown_executors() -> None:
+    """Останавливает пулы исполнителей (при остановке приложения)."""
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -1,23 +1,14 @@
 # backend/field_extractor.py
 
-import openai
 import logging
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
+from backend.llm_client import chat_completion
+from backend.cache import make_key
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def extract_fields(reference: str, target_format: str = None, target_subformat: str = None) -> dict:
+async def extract_fields(reference: str, target_format: str = None, target_subformat: str = None) -> dict:
     """
     Извлекает поля библиографической записи с помощью нейросети DeepSeek.
     Возвращает словарь с полями, фильтрованными в зависимости от целевого формата и подтипа.
@@ -45,8 +36,8 @@ def extract_fields(reference: str, target_format: str = None, target_subformat:
         }
     }
 
-    # Промпт для нейросети
-    prompt = f"""Ты — эксперт по библиографии. Извлеки из библиографической записи все доступные поля и верни их в формате:
+    # Шаблон промпта для нейросети
+    prompt_template = """Ты — эксперт по библиографии. Извлеки из библиографической записи все доступные поля и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -105,17 +96,12 @@ note: в печати
 
 Запись: "{reference}"
 """
+    prompt = prompt_template.format(reference=reference)
 
-    # Инициализация клиента OpenAI
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            timeout=150
-        )
-        raw_response = response.choices[0].message.content.strip()
+        # Ответ не зависит от целевого формата — фильтрация полей выполняется ниже
+        raw_response = await chat_completion(prompt, timeout=150,
+                                             cache_key=make_key(prompt_template, reference))
         logger.info("Ответ нейросети для извлечения полей: %s", raw_response)
 
         # Парсинг ответа в словарь
@@ -1,18 +1,7 @@
 # backend/gost_ai_converter.py
-import os
-import openai
-from dotenv import load_dotenv
+from backend.llm_client import chat_completion
 
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
-
-def convert_to_gost(reference: str) -> str:
+async def convert_to_gost(reference: str) -> str:
     prompt = f"""
 Ты — эксперт по оформлению библиографических ссылок согласно стандарту ГОСТ Р 7.0.100-2018.
 Преобразуй данную библиографическую ссылку в корректное оформление по ГОСТ в одном предложении, используя следующий точный шаблон:
@@ -21,15 +10,8 @@ def convert_to_gost(reference: str) -> str:
 Ссылка пользователя:
 "{reference}"
 """
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model="deepseek-reasoner",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            timeout=150
-        )
-        return response.choices[0].message.content.strip()
+        return await chat_completion(prompt, timeout=150, model="deepseek-reasoner")
     except Exception as e:
         return f"Ошибка при вызове нейросетевого сервиса: {e}"
 
@@ -1,18 +1,9 @@
-import openai
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+from backend.llm_client import chat_completion
+from backend.cache import make_key
 
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
-
-def format_gost(text: str, subformat: str) -> str:
-    prompt_templates = {
-        "Статья в журнале": """
+# Шаблоны промптов по подтипам; общие для одиночного и пакетного режимов (backend.ai_batch)
+PROMPT_TEMPLATES = {
+    "Статья в журнале": """
 Ты — эксперт по ГОСТ Р 7.0.100-2018. Проверь ссылку и исправь её, предполагая, что это статья в журнале.
 
 **Задача:**
@@ -34,7 +25,7 @@ def format_gost(text: str, subformat: str) -> str:
 **Ссылка:**
 "{text}"
 """,
-        "Книга": """
+    "Книга": """
 Ты — эксперт по ГОСТ Р 7.0.100-2018. Проверь ссылку и исправь её, предполагая, что это книга.
 
 **Задача:**
@@ -56,7 +47,7 @@ def format_gost(text: str, subformat: str) -> str:
 **Ссылка:**
 "{text}"
 """,
-        "Материалы конференций": """
+    "Материалы конференций": """
 Ты — эксперт по ГОСТ Р 7.0.100-2018. Проверь ссылку и исправь её, предполагая, что это материалы конференций.
 
 **Задача:**
@@ -78,7 +69,7 @@ def format_gost(text: str, subformat: str) -> str:
 **Ссылка:**
 "{text}"
 """,
-        "Статья в печати": """
+    "Статья в печати": """
 Ты — эксперт по ГОСТ Р 7.0.100-2018. Проверь ссылку и исправь её, предполагая, что это статья в печати.
 
 **Задача:**
@@ -100,7 +91,7 @@ def format_gost(text: str, subformat: str) -> str:
 **Ссылка:**
 "{text}"
 """,
-        "Онлайн-статья": """
+    "Онлайн-статья": """
 Ты — эксперт по ГОСТ Р 7.0.100-2018. Проверь ссылку и исправь её, предполагая, что это онлайн-статья.
 
 **Задача:**
@@ -122,20 +113,15 @@ def format_gost(text: str, subformat: str) -> str:
 **Ссылка:**
 "{text}"
 """
-    }
+}
 
-    prompt = prompt_templates.get(subformat)
+async def format_gost(text: str, subformat: str) -> str:
+    prompt = PROMPT_TEMPLATES.get(subformat)
     if not prompt:
         return f"Ошибка: неверный подтип для ГОСТ: {subformat}"
 
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt.format(text=text)}],
-            temperature=0.1,
-            timeout=150
-        )
-        return response.choices[0].message.content.strip()
+        return await chat_completion(prompt.format(text=text), timeout=150,
+                                     cache_key=make_key(prompt, text, "GOST", subformat))
     except Exception as e:
         return f"Ошибка при вызове нейросетевого сервиса: {e}"
\ No newline at end of file
@@ -0,0 +1,280 @@
+# backend/html_parser.py
+import os
+import re
+import json
+import logging
+from bs4 import BeautifulSoup, Tag
+
+# Бэкенд разбора HTML: auto | selectolax | lxml | html.parser
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "auto").strip().lower()
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Быстрые парсеры необязательны: при их отсутствии используется html.parser
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+    etree = None
+
+AVAILABLE_BACKENDS = [name for name, available in (
+    ("selectolax", LexborHTMLParser is not None),
+    ("lxml", lxml is not None),
+    ("html.parser", True),
+) if available]
+
+# Содержимое этих тегов не входит в видимый текст страницы
+_NON_TEXT_TAGS = ("script", "style", "template")
+_XML_DECLARATION_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+def resolve_backend(name: str = None) -> str:
+    """Возвращает доступный бэкенд: запрошенный, если он установлен, иначе самый быстрый из доступных."""
+    name = (name or HTML_PARSER_BACKEND).strip().lower()
+    if name in AVAILABLE_BACKENDS:
+        return name
+    if name != "auto":
+        logger.warning("HTML-парсер '%s' недоступен, используется %s", name, AVAILABLE_BACKENDS[0])
+    return AVAILABLE_BACKENDS[0]
+
+
+BACKEND = resolve_backend()
+logger.info("HTML-парсер: %s (доступны: %s)", BACKEND, ", ".join(AVAILABLE_BACKENDS))
+
+
+class MetaIndex:
+    """
+    Индекс метаданных страницы: многозначный словарь name/property → content
+    (ключи в нижнем регистре, порядок значений как в документе), разобранные
+    блоки JSON-LD и заголовок документа (<title>).
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.json_ld = []
+        self.title = None
+
+    def add(self, key: str, content: str) -> None:
+        self.values.setdefault(key.strip().lower(), []).append(content)
+
+    def add_meta(self, name, prop, content) -> None:
+        """Добавляет метатег по его атрибутам name/property (пустые значения пропускаются)."""
+        content = (content or "").strip()
+        if not content:
+            return
+        if name:
+            self.add(name, content)
+        if prop:
+            self.add(prop, content)
+
+    def add_json_ld(self, text: str) -> None:
+        """Добавляет объекты из блока JSON-LD (включая @graph и списки)."""
+        try:
+            payload = json.loads(text)
+        except (TypeError, ValueError):
+            return
+        items = payload if isinstance(payload, list) else [payload]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            graph = item.get("@graph")
+            if isinstance(graph, list):
+                self.json_ld.extend(node for node in graph if isinstance(node, dict))
+            else:
+                self.json_ld.append(item)
+
+    def all(self, key: str) -> list:
+        """Все непустые значения метатега."""
+        return self.values.get(key, [])
+
+    def first(self, *keys: str) -> str:
+        """Первое непустое значение из перечисленных метатегов (в порядке приоритета)."""
+        for key in keys:
+            values = self.values.get(key)
+            if values:
+                return values[0]
+        return "Не указано"
+
+    def json_ld_value(self, *keys: str) -> str:
+        """Первое непустое значение поля из блоков JSON-LD (объекты сводятся к их name)."""
+        for block in self.json_ld:
+            for key in keys:
+                value = block.get(key)
+                if isinstance(value, list):
+                    value = value[0] if value else None
+                if isinstance(value, dict):
+                    value = value.get("name")
+                if isinstance(value, str) and value.strip():
+                    return value.strip()
+        return "Не указано"
+
+    def json_ld_authors(self) -> list:
+        """Имена авторов из JSON-LD."""
+        for block in self.json_ld:
+            authors = block.get("author")
+            if isinstance(authors, dict):
+                authors = [authors]
+            if isinstance(authors, list):
+                names = [a.get("name", "").strip() if isinstance(a, dict) else str(a).strip() for a in authors]
+                names = [name for name in names if name]
+                if names:
+                    return names
+        return []
+
+
+def _is_json_ld(script_type) -> bool:
+    return (script_type or "").strip().lower() == "application/ld+json"
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    """BeautifulSoup для кода, которому нужен полный DOM (select, find); при наличии lxml — на нём."""
+    return BeautifulSoup(html, "lxml" if lxml is not None else "html.parser")
+
+
+def build_meta_index(soup) -> MetaIndex:
+    """Строит MetaIndex по уже разобранному BeautifulSoup за один обход документа."""
+    index = MetaIndex()
+    # Прямой проход по descendants заметно дешевле find_all с фильтром по именам
+    for tag in soup.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        if tag.name == "meta":
+            index.add_meta(tag.get("name"), tag.get("property"), tag.get("content"))
+        elif tag.name == "script":
+            if _is_json_ld(tag.get("type")):
+                index.add_json_ld(tag.string or tag.get_text())
+        elif tag.name == "title" and index.title is None and tag.string:
+            index.title = tag.string.strip()
+    return index
+
+
+def _is_blank(html: str) -> bool:
+    # Пустая страница или одни пробелы: lxml на таком вводе падает с «Document is empty»,
+    # поэтому все бэкенды возвращают для неё пустой результат без разбора
+    return not html or not html.strip()
+
+
+def _lxml_root(html: str):
+    # lxml не принимает str с XML-декларацией кодировки
+    return lxml.html.document_fromstring(_XML_DECLARATION_RE.sub("", html, count=1))
+
+
+def _text_from_soup(html: str) -> str:
+    return _soup_text(BeautifulSoup(html, "html.parser"))
+
+
+def _soup_text(soup) -> str:
+    return soup.get_text(separator=" ", strip=True)
+
+
+def _text_from_selectolax(html: str) -> str:
+    return _selectolax_text(LexborHTMLParser(html))
+
+
+def _selectolax_text(tree) -> str:
+    # Изменяет дерево: теги без видимого текста удаляются
+    tree.strip_tags(list(_NON_TEXT_TAGS))
+    if tree.root is None:
+        return ""
+    # Разделитель \x00 позволяет отбросить пустые текстовые узлы, как это делает get_text(strip=True)
+    return " ".join(part for part in tree.root.text(separator="\x00", strip=True).split("\x00") if part)
+
+
+def _text_from_lxml(html: str) -> str:
+    return _lxml_text(_lxml_root(html))
+
+
+def _lxml_text(root) -> str:
+    # Изменяет дерево: теги без видимого текста, комментарии и инструкции удаляются
+    etree.strip_elements(root, *_NON_TEXT_TAGS, etree.Comment, etree.ProcessingInstruction, with_tail=False)
+    return " ".join(part.strip() for part in root.itertext() if part.strip())
+
+
+def _meta_from_selectolax(html: str) -> MetaIndex:
+    return _selectolax_meta(LexborHTMLParser(html))
+
+
+def _selectolax_meta(tree) -> MetaIndex:
+    index = MetaIndex()
+    for node in tree.css("meta, script, title"):
+        if node.tag == "meta":
+            attrs = node.attributes
+            index.add_meta(attrs.get("name"), attrs.get("property"), attrs.get("content"))
+        elif node.tag == "script":
+            if _is_json_ld(node.attributes.get("type")):
+                index.add_json_ld(node.text(deep=True))
+        elif index.title is None:
+            title = node.text(deep=True).strip()
+            index.title = title or None
+    return index
+
+
+def _meta_from_lxml(html: str) -> MetaIndex:
+    return _lxml_meta(_lxml_root(html))
+
+
+def _lxml_meta(root) -> MetaIndex:
+    index = MetaIndex()
+    for element in root.iter("meta", "script", "title"):
+        if element.tag == "meta":
+            index.add_meta(element.get("name"), element.get("property"), element.get("content"))
+        elif element.tag == "script":
+            if _is_json_ld(element.get("type")):
+                index.add_json_ld(element.text)
+        elif index.title is None:
+            title = (element.text or "").strip()
+            index.title = title or None
+    return index
+
+
+_TEXT_EXTRACTORS = {
+    "selectolax": _text_from_selectolax,
+    "lxml": _text_from_lxml,
+    "html.parser": _text_from_soup,
+}
+
+_META_EXTRACTORS = {
+    "selectolax": _meta_from_selectolax,
+    "lxml": _meta_from_lxml,
+    "html.parser": lambda html: build_meta_index(BeautifulSoup(html, "html.parser")),
+}
+
+# Разбор в дерево и сбор (метаданные, текст) по нему: метаданные собираются до того,
+# как извлечение текста удалит из дерева <script> с JSON-LD
+_PAGE_PARSERS = {
+    "selectolax": (LexborHTMLParser, _selectolax_meta, _selectolax_text),
+    "lxml": (_lxml_root, _lxml_meta, _lxml_text),
+    "html.parser": (lambda html: BeautifulSoup(html, "html.parser"), build_meta_index, _soup_text),
+}
+
+
+def html_to_text(html: str, backend: str = None) -> str:
+    """Видимый текст страницы одной строкой (аналог get_text(separator=" ", strip=True))."""
+    if _is_blank(html):
+        return ""
+    return _TEXT_EXTRACTORS[resolve_backend(backend) if backend else BACKEND](html)
+
+
+def extract_meta(html: str, backend: str = None) -> MetaIndex:
+    """MetaIndex страницы: метатеги, JSON-LD и <title>."""
+    if _is_blank(html):
+        return MetaIndex()
+    return _META_EXTRACTORS[resolve_backend(backend) if backend else BACKEND](html)
+
+
+def parse_page(html: str, backend: str = None) -> tuple:
+    """(MetaIndex, видимый текст) страницы за один разбор HTML — вместо extract_meta и html_to_text по отдельности."""
+    if _is_blank(html):
+        return MetaIndex(), ""
+    parse, meta_of, text_of = _PAGE_PARSERS[resolve_backend(backend) if backend else BACKEND]
+    tree = parse(html)
+    meta = meta_of(tree)
+    return meta, text_of(tree)
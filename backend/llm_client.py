@@ -0,0 +1,101 @@
+# backend/llm_client.py
+import os
+import logging
+import httpx
+import openai
+from dotenv import load_dotenv
+from backend.cache import llm_cache
+
+# Загрузка переменных окружения
+load_dotenv()
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+
+if not DEEPSEEK_API_KEY:
+    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
+
+MODEL = "deepseek-chat"
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+
+# Параметры пула соединений (общего для всего процесса)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_DEFAULT_TIMEOUT = float(os.getenv("LLM_DEFAULT_TIMEOUT", "150"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") != "0"
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_client() -> openai.AsyncOpenAI:
+    """
+    Возвращает общий для процесса AsyncOpenAI-клиент DeepSeek.
+    Клиент создаётся лениво и держит пул keep-alive соединений (HTTP/2),
+    поэтому запросы к нейросети переиспользуют уже открытые сокеты.
+    """
+    global _client
+    if _client is None or _client.is_closed():
+        http_client = httpx.AsyncClient(
+            http2=LLM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_DEFAULT_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        _client = openai.AsyncOpenAI(
+            api_key=DEEPSEEK_API_KEY,
+            base_url=DEEPSEEK_BASE_URL,
+            http_client=http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+        logger.info("Создан общий LLM-клиент: max_connections=%s, http2=%s",
+                    LLM_MAX_CONNECTIONS, LLM_HTTP2)
+    return _client
+
+
+async def chat_completion(prompt: str, timeout: float = LLM_DEFAULT_TIMEOUT,
+                          temperature: float = 0.1, model: str = MODEL,
+                          cache_key: str = None, response_format: dict = None,
+                          max_tokens: int = None) -> str:
+    """
+    Отправляет один пользовательский промпт в нейросеть через общий клиент
+    и возвращает текст ответа. Таймаут задаётся на каждый вызов отдельно.
+    Если передан cache_key (см. backend.cache.make_key), ответ берётся из кэша
+    и сохраняется в него; в кэш попадают только успешные ответы.
+    response_format (например, {"type": "json_object"}) передаётся API как есть;
+    max_tokens ограничивает длину ответа (по умолчанию — лимит провайдера).
+    Исключения не перехватываются — их обрабатывает вызывающий модуль.
+    """
+    if cache_key:
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    response = await get_client().chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        timeout=timeout,
+        **({"response_format": response_format} if response_format else {}),
+        **({"max_tokens": max_tokens} if max_tokens else {})
+    )
+    content = response.choices[0].message.content.strip()
+    if cache_key and content:
+        await llm_cache.aset(cache_key, content)
+    return content
+
+
+async def close_client() -> None:
+    """Закрывает общий клиент и его пул соединений (при остановке приложения)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Общий LLM-клиент закрыт")
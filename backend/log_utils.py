@@ -0,0 +1,47 @@
+# backend/log_utils.py
+import os
+import random
+import logging
+import contextvars
+
+# Доля пословных записей горячих путей, которые пишутся на уровне DEBUG (1 — все, 0 — ни одной)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# Заголовок запроса, включающий подробную трассировку (все пословные записи на уровне INFO)
+DEBUG_TRACE_HEADER = "X-Debug-Trace"
+
+_trace_enabled = contextvars.ContextVar("debug_trace", default=False)
+
+
+def set_trace(enabled: bool) -> contextvars.Token:
+    """Включает/выключает трассировку для текущего запроса (контекста); вернуть прежнее — reset_trace."""
+    return _trace_enabled.set(bool(enabled))
+
+
+def reset_trace(token: contextvars.Token) -> None:
+    _trace_enabled.reset(token)
+
+
+def trace_enabled() -> bool:
+    return _trace_enabled.get()
+
+
+def trace(logger: logging.Logger, msg: str, *args) -> None:
+    """
+    Пословная запись горячего пути (ссылка, поле, чанк ответа). При трассировке
+    запроса пишется на INFO; иначе — только на DEBUG и с семплированием LOG_SAMPLE_RATE.
+    Аргументы форматируются лишь для записей, которые действительно попадут в лог.
+    """
+    if _trace_enabled.get():
+        logger.info(msg, *args)
+    elif logger.isEnabledFor(logging.DEBUG) and (LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE):
+        logger.debug(msg, *args)
+
+
+def log_summary(logger: logging.Logger, event: str, **fields) -> None:
+    """
+    Итоговая запись по запросу: «event key=value ...» на INFO. Те же поля доступны
+    обработчикам логов структурно — в атрибуте записи summary.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s %s", event, " ".join(f"{key}={value}" for key, value in fields.items()),
+                    extra={"summary": dict(fields, event=event)})
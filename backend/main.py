@@ -1,44 +1,81 @@
 #backend/main.py
 import io
+import os
 import json
-import time
+from typing import Optional
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field, ValidationError, validator
-from backend.document_parser import (
-    extract_text, extract_bibliography_section, split_references_to_list
-)
-from backend.reference_validator import validate_references
-from backend.gost_formatter import format_references
-from backend.apa_formatter import format_apa
-from backend.mla_formatter import format_mla
-from backend.gost_ai_formatter import format_gost
-from backend.apa_ai_formatter import format_apa_ai
-from backend.mla_ai_formatter import format_mla_ai
+from backend.bulk_validator import BulkValidation, split_bulk_text
 from backend.text_parser import split_references_from_text
-from backend.converter import convert_reference
-from backend.web_scraper import extract_bibliographic_data, compose_reference
-from backend.tex_bibliography_formatter import format_reference_to_tex
-from backend.csv_bibliography_formatter import format_reference_to_csv
-from backend.reference_converter import convert_to_format
-from backend.tavily_search import search_reference  # Новый импорт
+from backend.reference_service import (DocumentNotFound, ReferenceCheck, cached_document, convert_references,
+                                       iterate_references, open_document, read_document, reference_to_bibtex,
+                                       reference_to_csv, references_to_bibtex, references_to_csv,
+                                       scrape_reference, shutdown_service)
+from backend.tavily_search import search_stats
+from backend.uploads import UploadTooLarge, content_length_exceeds, receive_upload, upload_headers
+from backend.log_utils import DEBUG_TRACE_HEADER, set_trace, reset_trace, trace, log_summary
+from backend.cache import llm_cache, document_cache
+from backend.browser_pool import browser_pool
 import logging
 
-import asyncio
-
 # Логирование
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # Без браузера сервис работает; запуск будет повторён при первом скрапинге
+        logger.error("Не удалось запустить браузер при старте: %s", e)
+    yield
+    # Браузер, пулы соединений и исполнителей, кэши — общий для API и бота порядок остановки
+    await shutdown_service()
+
 # FastAPI app
 app = FastAPI(
     title="🎓 Cyber-Referent API",
     description="Сервис автоматической проверки библиографии по ГОСТ, APA, MLA",
-    version="1.1"
+    version="1.1",
+    lifespan=lifespan
 )
 
+@app.middleware("http")
+async def debug_trace_middleware(request: Request, call_next):
+    # Заголовок X-Debug-Trace: 1 включает пословное логирование только для этого запроса
+    token = set_trace(request.headers.get(DEBUG_TRACE_HEADER, "").strip().lower() in ("1", "true", "yes", "on"))
+    try:
+        return await call_next(request)
+    finally:
+        reset_trace(token)
+
+@app.middleware("http")
+async def upload_limit_middleware(request: Request, call_next):
+    # Заведомо слишком большая загрузка отклоняется по Content-Length, до приёма и разбора тела
+    if request.method == "POST" and content_length_exceeds(request.headers):
+        return upload_error_response(UploadTooLarge(int(request.headers["content-length"])))
+    return await call_next(request)
+
+# Ошибки загрузки, на которые эндпоинты отвечают через upload_error_response
+UPLOAD_ERRORS = (UploadTooLarge, DocumentNotFound)
+
+def upload_error_response(error: Exception) -> JSONResponse:
+    if isinstance(error, UploadTooLarge):
+        logger.warning("Upload rejected: %s bytes", error.size)
+        return JSONResponse({"error": str(error)}, status_code=413)
+    logger.warning("Unknown document_id: %s", error.document_id)
+    return JSONResponse({"error": str(error)}, status_code=404)
+
+# Верхняя граница valid_batch_size — сколько валидных ссылок можно объединить в один чанк ответа
+CHECK_VALID_BATCH_MAX = int(os.getenv("CHECK_VALID_BATCH_MAX", "500"))
+# Форматы потокового ответа проверки: строки JSON (по умолчанию) или Server-Sent Events
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
 # Pydantic model
 class BibliographyInput(BaseModel):
     bibliography_text: str = Field(..., min_length=1)
@@ -49,89 +86,168 @@ class BibliographyInput(BaseModel):
             raise ValueError("Текст библиографии не может быть пустым.")
         return v
 
+def document_headers(upload, cached: bool) -> dict:
+    """Заголовки файловых ответов: document_id, попадание в кэш документов, метрики загрузки и памяти."""
+    return {"X-Document-Id": upload.sha256, "X-Document-Cache": "hit" if cached else "miss",
+            **upload_headers(upload)}
+
+async def read_uploaded_references(file: UploadFile):
+    """
+    Разбор загрузки на месте (файл, принятый Starlette, без копии, см. backend.uploads)
+    через сервис (reference_service.read_document, с кэшем документов).
+    Возвращает (ссылки или None, заголовки).
+    """
+    with await receive_upload(file) as upload:
+        references, cached = await read_document(upload)
+        return references, document_headers(upload, cached)
+
+async def load_document_references(file: Optional[UploadFile], document_id: Optional[str]):
+    """
+    Ссылки документа для файловых эндпоинтов: из загруженного файла или по document_id,
+    полученному ранее (/upload-document/ или заголовок X-Document-Id), без повторной загрузки.
+    Возвращает (ссылки или None, заголовки); неизвестный document_id — DocumentNotFound.
+    """
+    if file is not None:
+        return await read_uploaded_references(file)
+    return await cached_document(document_id), {"X-Document-Id": document_id, "X-Document-Cache": "hit"}
+
+def check_document_input(file: Optional[UploadFile], document_id: Optional[str]) -> Optional[JSONResponse]:
+    """Ответ 400 для файловых эндпоинтов, если не передан ни файл .pdf/.docx, ни document_id."""
+    if file is None:
+        if not document_id:
+            return JSONResponse({"error": "Передайте файл .pdf/.docx или document_id."}, status_code=400)
+        return None
+    if not file.filename.lower().endswith(('pdf', 'docx')):
+        return JSONResponse({"error": "Файл должен быть .pdf или .docx"}, status_code=400)
+    return None
+
+async def open_document_references(file: Optional[UploadFile], document_id: Optional[str]):
+    """
+    Источник ссылок для /check-file/: (async-итератор ссылок или None, заголовки).
+    None — список литературы не найден. Новый документ отдаёт ссылки по мере разбора.
+    """
+    if file is None:
+        references, headers = await load_document_references(None, document_id)
+        return (iterate_references(references) if references else None), headers
+    upload = await receive_upload(file)
+    # Метрики снимаются до разбора: open_document закрывает загрузку, когда ссылки кончаются
+    headers = document_headers(upload, False)
+    references, cached = await open_document(upload)
+    return references, {**headers, "X-Document-Cache": "hit" if cached else "miss"}
+
+def resolve_stream_options(stream_format: Optional[str], valid_batch_size: Optional[int]):
+    """Формат потока (ndjson/sse; неизвестный — ndjson) и размер пакета валидных ссылок (1 — без пакетов)."""
+    stream_format = (stream_format or "ndjson").lower()
+    if stream_format not in STREAM_MEDIA_TYPES:
+        stream_format = "ndjson"
+    return stream_format, max(1, min(valid_batch_size or 1, CHECK_VALID_BATCH_MAX))
+
+def encode_stream_event(payload: dict, stream_format: str) -> bytes:
+    """Чанк ответа: строка JSON (NDJSON) или событие SSE с типом чанка в поле event."""
+    data = json.dumps(payload, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {payload['type']}\ndata: {data}\n\n".encode("utf-8")
+    return (data + "\n").encode("utf-8")
+
+def check_stream_response(body, stream_format: str, headers: Optional[dict] = None) -> StreamingResponse:
+    media_type = STREAM_MEDIA_TYPES[stream_format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Cache-Control": "no-cache",
+            "Content-Type": f"{media_type}; charset=utf-8",
+            **(headers or {})
+        }
+    )
+
+async def stream_check_results(check: ReferenceCheck, stream_format: str = "ndjson", valid_batch_size: int = 1):
+    """
+    Тело ответа /check-file/ и /check-text/ поверх конвейера сервиса (ReferenceCheck).
+    Отправка чанка ждёт транспорт (сервер приостанавливает генератор, пока клиент
+    не примет данные), и конвейер вместе с ним. valid_batch_size > 1 — валидные ссылки
+    идут чанками valid_batch (items) по мере готовности: пакет отправляется,
+    когда заполнен или других готовых результатов нет.
+    """
+    results = check.stream()
+    pending_valid = []
+    try:
+        async for result in results:
+            if valid_batch_size > 1 and result["type"] == "valid":
+                pending_valid.append(result)
+                if len(pending_valid) < valid_batch_size and check.ready():
+                    continue
+            if pending_valid:
+                yield encode_stream_event({"type": "valid_batch", "items": pending_valid}, stream_format)
+                pending_valid = []
+            if result["type"] != "valid" or valid_batch_size == 1:
+                trace(logger, "Sending %s chunk: %s", result["type"], result)
+                yield encode_stream_event(result, stream_format)
+        if pending_valid:
+            yield encode_stream_event({"type": "valid_batch", "items": pending_valid}, stream_format)
+    finally:
+        # Клиент отключился — закрытие конвейера останавливает проверку и разбор документа
+        await results.aclose()
+
 @app.get("/")
 async def root():
     return {"message": "🎓 Cyber-Referent API успешно запущен!"}
 
+@app.get("/cache-stats/")
+async def cache_stats():
+    return {"llm": llm_cache.stats(), "search": search_stats(), "documents": document_cache.stats()}
+
+@app.post("/upload-document/")
+async def upload_document(file: UploadFile = File(...)):
+    """
+    Разбор документа без проверки: возвращает document_id (SHA-256 файла) и список ссылок.
+    document_id передаётся в /check-file/, /convert-references-*-file/ и /validate-bulk/
+    вместо повторной загрузки того же файла.
+    """
+    input_error = check_document_input(file, None)
+    if input_error is not None:
+        return input_error
+    try:
+        references, upload_metrics = await read_uploaded_references(file)
+        if references is None:
+            return JSONResponse({"error": "Список литературы не найден."}, status_code=400, headers=upload_metrics)
+        return JSONResponse({"document_id": upload_metrics["X-Document-Id"], "filename": file.filename,
+                             "references": references}, headers=upload_metrics)
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
+    except Exception as e:
+        logger.exception("Document upload error")
+        return JSONResponse({"error": f"Ошибка обработки файла: {e}"}, status_code=500)
+
 @app.post("/check-file/")
 async def check_references_from_file(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
     style: str = Form("GOST"),
-    subformat: str = Form(...)
+    subformat: str = Form(...),
+    concurrency: Optional[int] = Form(None),
+    document_id: Optional[str] = Form(None),
+    stream_format: Optional[str] = Form(None),
+    valid_batch_size: Optional[int] = Form(None)
 ):
     logger.info("Received file check request: style=%s, subformat=%s", style, subformat)
 
-    if not file.filename.lower().endswith(('pdf', 'docx')):
-        return JSONResponse({"error": "Файл должен быть .pdf или .docx"}, status_code=400)
+    input_error = check_document_input(file, document_id)
+    if input_error is not None:
+        return input_error
 
     try:
-        file_content = await file.read()
-        file_obj = io.BytesIO(file_content)
-        file_obj.seek(0)
-
-        text = extract_text(file_obj, file.filename)
-        bibliography_section = extract_bibliography_section(text)
-        if not bibliography_section:
-            return JSONResponse({"error": "Список литературы не найден."}, status_code=400)
-
-        references = split_references_to_list(bibliography_section)
-        style_upper = style.upper()
-        valid_refs, invalid_refs = validate_references(references, style_upper, subformat)
-
-        # Асинхронный генератор
-        async def stream_response():
-            for ref_tpl in valid_refs:
-                ref_text = ref_tpl[0]
-                chunk = json.dumps(
-                    {"type": "valid", "reference": ref_text},
-                    ensure_ascii=False
-                ) + "\n"
-                logger.info("Sending valid chunk: %s", chunk)
-                yield chunk.encode("utf-8")
-                await asyncio.sleep(0.05)  # Асинхронная задержка
-
-            for ref in invalid_refs:
-                logger.info("Processing invalid ref: %s", ref['original'])
-                if style_upper == "GOST":
-                    analysis = format_gost(ref['original'], subformat)
-                elif style_upper == "APA":
-                    analysis = format_apa_ai(ref['original'], subformat)
-                elif style_upper == "MLA":
-                    analysis = format_mla_ai(ref['original'], subformat)
-
-                # Асинхронные вызовы
-                search_query = ref['original']
-                url = await search_reference(search_query)
-                corrected_ref = None
-                if url:
-                    try:
-                        data = await extract_bibliographic_data(url)
-                        corrected_ref = compose_reference(data, style_upper, subformat)
-                        logger.info("Найден и отформатирован источник через Tavily: %s", corrected_ref)
-                    except Exception as e:
-                        logger.error("Ошибка веб-скрапинга для URL %s: %s", url, e)
-
-                chunk = json.dumps({
-                    "type": "invalid",
-                    "original": ref['original'],
-                    "errors_and_corrections": analysis,
-                    "detected_type": ref['type'],
-                    "initial_errors": ref['errors'],
-                    "corrected_reference": corrected_ref if corrected_ref else "Не удалось найти источник"
-                }, ensure_ascii=False) + "\n"
-                logger.info("Sending invalid chunk: %s", chunk)
-                yield chunk.encode("utf-8")
-                await asyncio.sleep(0.05)  # Асинхронная задержка
-
-        return StreamingResponse(
-            stream_response(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Content-Type": "text/event-stream; charset=utf-8"
-            }
-        )
-
+        # Первая ссылка ждётся до ответа: документ без списка литературы — ошибка 400, а не пустой поток
+        references, upload_metrics = await open_document_references(file, document_id)
+        if references is None:
+            return JSONResponse({"error": "Список литературы не найден."}, status_code=400, headers=upload_metrics)
+
+        stream_format, valid_batch_size = resolve_stream_options(stream_format, valid_batch_size)
+        check = ReferenceCheck(references, style, subformat, concurrency)
+        return check_stream_response(stream_check_results(check, stream_format, valid_batch_size),
+                                     stream_format, upload_metrics)
+
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
     except Exception as e:
         logger.exception("File processing error")
         return JSONResponse({"error": f"Ошибка обработки файла: {e}"}, status_code=500)
@@ -140,10 +256,13 @@ async def check_references_from_file(
 async def check_text_references(
     bibliography_text: str = Form(...),
     style: str = Form("GOST"),
-    subformat: str = Form(...)
+    subformat: str = Form(...),
+    concurrency: Optional[int] = Form(None),
+    stream_format: Optional[str] = Form(None),
+    valid_batch_size: Optional[int] = Form(None)
 ):
-    logger.info("Received text check request: style=%s, subformat=%s, text=%s",
-                style, subformat, bibliography_text)
+    logger.info("Received text check request: style=%s, subformat=%s, text_length=%s",
+                style, subformat, len(bibliography_text))
 
     try:
         bib_input = BibliographyInput(bibliography_text=bibliography_text)
@@ -153,66 +272,73 @@ async def check_text_references(
 
     try:
         references = split_references_from_text(bib_input.bibliography_text)
-        style_upper = style.upper()
-        valid_refs, invalid_refs = validate_references(references, style_upper, subformat)
-
-        # Асинхронный генератор
-        async def stream_response():
-            for ref_tpl in valid_refs:
-                ref_text = ref_tpl[0]
-                chunk = json.dumps(
-                    {"type": "valid", "reference": ref_text},
-                    ensure_ascii=False
-                ) + "\n"
-                logger.info("Sending valid chunk: %s", chunk)
-                yield chunk.encode("utf-8")
-                await asyncio.sleep(0.05)  # Асинхронная задержка
-
-            for ref in invalid_refs:
-                logger.info("Processing invalid ref: %s", ref['original'])
-                if style_upper == "GOST":
-                    analysis = format_gost(ref['original'], subformat)
-                elif style_upper == "APA":
-                    analysis = format_apa_ai(ref['original'], subformat)
-                elif style_upper == "MLA":
-                    analysis = format_mla_ai(ref['original'], subformat)
-
-                # Асинхронные вызовы
-                search_query = ref['original']
-                url = await search_reference(search_query)
-                corrected_ref = None
-                if url:
-                    try:
-                        data = await extract_bibliographic_data(url)
-                        corrected_ref = compose_reference(data, style_upper, subformat)
-                        logger.info("Найден и отформатирован источник через Tavily: %s", corrected_ref)
-                    except Exception as e:
-                        logger.error("Ошибка веб-скрапинга для URL %s: %s", url, e)
-
-                chunk = json.dumps({
-                    "type": "invalid",
-                    "original": ref['original'],
-                    "errors_and_corrections": analysis,
-                    "detected_type": ref['type'],
-                    "initial_errors": ref['errors'],
-                    "corrected_reference": corrected_ref if corrected_ref else "Не удалось найти источник"
-                }, ensure_ascii=False) + "\n"
-                logger.info("Sending invalid chunk: %s", chunk)
-                yield chunk.encode("utf-8")
-                await asyncio.sleep(0.05)  # Асинхронная задержка
+        stream_format, valid_batch_size = resolve_stream_options(stream_format, valid_batch_size)
+        check = ReferenceCheck(references, style, subformat, concurrency)
+        return check_stream_response(stream_check_results(check, stream_format, valid_batch_size), stream_format)
 
+    except Exception as e:
+        logger.exception("Text processing error")
+        return JSONResponse({"error": f"Ошибка обработки текста: {e}"}, status_code=500)
+
+async def stream_bulk_results(bulk: BulkValidation):
+    """NDJSON-ответ /validate-bulk/: результаты в исходном порядке, последней строкой — итоги."""
+    async for result in bulk.stream():
+        yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+    summary = bulk.summary()
+    log_summary(logger, "validate_bulk", **{key: value for key, value in summary.items() if key != "type"})
+    yield (json.dumps(summary, ensure_ascii=False) + "\n").encode("utf-8")
+
+@app.post("/validate-bulk/")
+async def validate_bulk(
+    style: str = Form("GOST"),
+    subformat: Optional[str] = Form(None),
+    bibliography_text: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None)
+):
+    """
+    Массовая проверка ссылок без нейросети (десятки тысяч записей): пул процессов,
+    потоковый NDJSON-ответ в исходном порядке и итоговая строка с пропускной способностью.
+    Вход — текст или .txt/.csv с одной ссылкой на строку, .pdf/.docx со списком литературы
+    либо document_id ранее загруженного документа.
+    """
+    try:
+        upload_metrics = {}
+        if file is not None:
+            if file.filename.lower().endswith(('pdf', 'docx')):
+                references, upload_metrics = await read_uploaded_references(file)
+                if references is None:
+                    return JSONResponse({"error": "Список литературы не найден."}, status_code=400,
+                                        headers=upload_metrics)
+            else:
+                with await receive_upload(file) as upload:
+                    # Строки читаются из загрузки по одной, без декодирования всего файла в одну строку
+                    with io.TextIOWrapper(upload.open(), encoding="utf-8-sig", errors="replace") as lines:
+                        references = [line.strip() for line in lines if line.strip()]
+                    upload_metrics = upload_headers(upload)
+        elif document_id:
+            references, upload_metrics = await load_document_references(None, document_id)
+        elif bibliography_text:
+            references = split_bulk_text(bibliography_text)
+        else:
+            return JSONResponse({"error": "Передайте bibliography_text, файл или document_id."}, status_code=400)
+        if not references:
+            return JSONResponse({"error": "Ссылки не найдены."}, status_code=400)
+
+        logger.info("Received bulk validation request: style=%s, subformat=%s, references=%s",
+                    style, subformat, len(references))
+        bulk = BulkValidation(references, style, subformat or None)
         return StreamingResponse(
-            stream_response(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Content-Type": "text/event-stream; charset=utf-8"
-            }
+            stream_bulk_results(bulk),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", **upload_metrics}
         )
 
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
     except Exception as e:
-        logger.exception("Text processing error")
-        return JSONResponse({"error": f"Ошибка обработки текста: {e}"}, status_code=500)
+        logger.exception("Bulk validation error")
+        return JSONResponse({"error": f"Ошибка массовой проверки: {e}"}, status_code=500)
 
 # Остальные эндпоинты остаются без изменений
 @app.post("/convert-reference/")
@@ -224,7 +350,10 @@ async def convert_reference_endpoint(
 ):
     logger.info("Received conversion request: reference=%s", reference)
     try:
-        converted = convert_to_format(reference, target_format, target_subformat)
+        [result] = await convert_references([reference], target_format, target_subformat)
+        if "error" in result:
+            return JSONResponse({"error": f"Ошибка конвертации: {result['error']}"}, status_code=500)
+        converted = result["converted"]
         return JSONResponse({
             "original": reference,
             "converted": converted,
@@ -248,14 +377,8 @@ async def convert_references_text(
         references = split_references_from_text(bibliography_text)
         if not references:
             return JSONResponse({"error": "Ссылки не найдены в тексте."}, status_code=400)
-        
-        converted_references = []
-        for ref in references:
-            try:
-                converted = convert_to_format(ref, target_format, target_subformat)
-                converted_references.append({"original": ref, "converted": converted})
-            except Exception as e:
-                converted_references.append({"original": ref, "error": str(e)})
+
+        converted_references = await convert_references(references, target_format, target_subformat)
         return JSONResponse({"converted_references": converted_references})
     except Exception as e:
         logger.exception("Multiple references conversion error")
@@ -263,47 +386,39 @@ async def convert_references_text(
 
 @app.post("/convert-references-file/")
 async def convert_references_file(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
     source_format: str = Form(...),
     target_format: str = Form(...),
-    target_subformat: str = Form(...)
+    target_subformat: str = Form(...),
+    document_id: Optional[str] = Form(None)
 ):
     logger.info("Received multiple references conversion request via file")
-    if not file.filename.lower().endswith(('pdf', 'docx')):
-        return JSONResponse({"error": "Файл должен быть .pdf или .docx"}, status_code=400)
+    input_error = check_document_input(file, document_id)
+    if input_error is not None:
+        return input_error
 
     try:
-        file_content = await file.read()
-        file_obj = io.BytesIO(file_content)
-        file_obj.seek(0)
-        text = extract_text(file_obj, file.filename)
-        bibliography_section = extract_bibliography_section(text)
-        if not bibliography_section:
-            return JSONResponse({"error": "Список литературы не найден."}, status_code=400)
-
-        references = split_references_to_list(bibliography_section)
-        converted_references = []
-        for ref in references:
-            try:
-                converted = convert_to_format(ref, target_format, target_subformat)
-                converted_references.append({"original": ref, "converted": converted})
-            except Exception as e:
-                converted_references.append({"original": ref, "error": str(e)})
-        return JSONResponse({"converted_references": converted_references})
+        references, upload_metrics = await load_document_references(file, document_id)
+        if references is None:
+            return JSONResponse({"error": "Список литературы не найден."}, status_code=400, headers=upload_metrics)
+
+        converted_references = await convert_references(references, target_format, target_subformat)
+        return JSONResponse({"converted_references": converted_references}, headers=upload_metrics)
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
     except Exception as e:
         logger.exception("File conversion error")
         return JSONResponse({"error": f"Ошибка обработки файла: {e}"}, status_code=500)
 
 @app.post("/scrape-reference/")
-async def scrape_reference(
+async def scrape_reference_endpoint(
     url: str = Form(...),
     style: str = Form("APA"),
     subformat: str = Form(...)):
     logger.info("Received scrape request: url=%s", url)
     try:
-        data = await extract_bibliographic_data(url)
-        reference = compose_reference(data, style, subformat)
-        return JSONResponse({"reference": reference})
+        reference, tier = await scrape_reference(url, style, subformat)
+        return JSONResponse({"reference": reference, "tier": tier})
     except Exception as e:
         logger.exception("Scrape error")
         return JSONResponse({"error": f"Ошибка: {e}"}, status_code=500)
@@ -314,7 +429,7 @@ async def convert_reference_tex(
     target_format: str = Form(...),
     subformat: str = Form(...)):
     logger.info("Received TeX conversion request")
-    formatted = format_reference_to_tex(reference, target_format, subformat)
+    formatted = await reference_to_bibtex(reference, target_format, subformat)
     return JSONResponse({"converted": formatted})
 
 @app.post("/convert-references-tex-text/")
@@ -329,14 +444,7 @@ async def convert_references_tex_text(
         if not references:
             return JSONResponse({"error": "Ссылки не найдены в тексте."}, status_code=400)
         
-        bibtex_entries = []
-        for ref in references:
-            try:
-                bibtex_entry = format_reference_to_tex(ref, target_format, subformat)
-                bibtex_entries.append(bibtex_entry)
-            except Exception as e:
-                bibtex_entries.append(f"% Error for reference '{ref}': {str(e)}")
-        combined_bibtex = "\n\n".join(bibtex_entries)
+        combined_bibtex = await references_to_bibtex(references, target_format, subformat)
         return JSONResponse({"bibtex": combined_bibtex})
     except Exception as e:
         logger.exception("Multiple TeX conversion error")
@@ -344,33 +452,25 @@ async def convert_references_tex_text(
 
 @app.post("/convert-references-tex-file/")
 async def convert_references_tex_file(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
     target_format: str = Form(...),
-    subformat: str = Form(...)
+    subformat: str = Form(...),
+    document_id: Optional[str] = Form(None)
 ):
     logger.info("Received multiple references TeX conversion request via file")
-    if not file.filename.lower().endswith(('pdf', 'docx')):
-        return JSONResponse({"error": "Файл должен быть .pdf или .docx"}, status_code=400)
+    input_error = check_document_input(file, document_id)
+    if input_error is not None:
+        return input_error
 
     try:
-        file_content = await file.read()
-        file_obj = io.BytesIO(file_content)
-        file_obj.seek(0)
-        text = extract_text(file_obj, file.filename)
-        bibliography_section = extract_bibliography_section(text)
-        if not bibliography_section:
-            return JSONResponse({"error": "Список литературы не найден."}, status_code=400)
-
-        references = split_references_to_list(bibliography_section)
-        bibtex_entries = []
-        for ref in references:
-            try:
-                bibtex_entry = format_reference_to_tex(ref, target_format, subformat)
-                bibtex_entries.append(bibtex_entry)
-            except Exception as e:
-                bibtex_entries.append(f"% Error for reference '{ref}': {str(e)}")
-        combined_bibtex = "\n\n".join(bibtex_entries)
-        return JSONResponse({"bibtex": combined_bibtex})
+        references, upload_metrics = await load_document_references(file, document_id)
+        if references is None:
+            return JSONResponse({"error": "Список литературы не найден."}, status_code=400, headers=upload_metrics)
+
+        combined_bibtex = await references_to_bibtex(references, target_format, subformat)
+        return JSONResponse({"bibtex": combined_bibtex}, headers=upload_metrics)
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
     except Exception as e:
         logger.exception("File TeX conversion error")
         return JSONResponse({"error": f"Ошибка обработки файла: {e}"}, status_code=500)
@@ -383,11 +483,46 @@ async def convert_reference_csv(
 ):
     logger.info("CSV‑convert request")
     try:
-        csv_str = format_reference_to_csv(reference)
+        csv_str = await reference_to_csv(reference)
         return JSONResponse({"csv": csv_str})
     except Exception as e:
         logger.exception("CSV convert error")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+@app.post("/convert-references-csv-text/")
+async def convert_references_csv_text(bibliography_text: str = Form(...)):
+    logger.info("Received multiple references CSV conversion request via text")
+    try:
+        references = split_references_from_text(bibliography_text)
+        if not references:
+            return JSONResponse({"error": "Ссылки не найдены в тексте."}, status_code=400)
+        csv_str = await references_to_csv(references)
+        return JSONResponse({"csv": csv_str})
+    except Exception as e:
+        logger.exception("Multiple CSV conversion error")
+        return JSONResponse({"error": f"Ошибка конвертации: {e}"}, status_code=500)
+
+@app.post("/convert-references-csv-file/")
+async def convert_references_csv_file(
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None)
+):
+    logger.info("Received multiple references CSV conversion request via file")
+    input_error = check_document_input(file, document_id)
+    if input_error is not None:
+        return input_error
+
+    try:
+        references, upload_metrics = await load_document_references(file, document_id)
+        if references is None:
+            return JSONResponse({"error": "Список литературы не найден."}, status_code=400, headers=upload_metrics)
+        csv_str = await references_to_csv(references)
+        return JSONResponse({"csv": csv_str}, headers=upload_metrics)
+    except UPLOAD_ERRORS as e:
+        return upload_error_response(e)
+    except Exception as e:
+        logger.exception("File CSV conversion error")
+        return JSONResponse({"error": f"Ошибка обработки файла: {e}"}, status_code=500)
+
 if __name__ == "__main__":
     uvicorn.run("backend.main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
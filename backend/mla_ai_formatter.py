@@ -1,18 +1,9 @@
-import openai
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+from backend.llm_client import chat_completion
+from backend.cache import make_key
 
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
-
-def format_mla_ai(reference: str, subformat: str) -> str:
-    prompt_templates = {
-        "Журнальная статья": """
+# Шаблоны промптов по подтипам; общие для одиночного и пакетного режимов (backend.ai_batch)
+PROMPT_TEMPLATES = {
+    "Журнальная статья": """
 Ты — эксперт по стандарту MLA. Проверь ссылку и исправь её, предполагая, что это журнальная статья.
 
 **Задача:**
@@ -34,7 +25,7 @@ MLA:
 **Ссылка:**
 "{reference}"
 """,
-        "Интернет-журнал": """
+    "Интернет-журнал": """
 Ты — эксперт по стандарту MLA. Проверь ссылку и исправь её, предполагая, что это интернет-журнал.
 
 **Задача:**
@@ -56,7 +47,7 @@ MLA:
 **Ссылка:**
 "{reference}"
 """,
-        "Статья в онлайн-СМИ": """
+    "Статья в онлайн-СМИ": """
 Ты — эксперт по стандарту MLA. Проверь ссылку и исправь её, предполагая, что это статья в онлайн-СМИ.
 
 **Задача:**
@@ -78,7 +69,7 @@ MLA:
 **Ссылка:**
 "{reference}"
 """,
-        "Монография": """
+    "Монография": """
 Ты — эксперт по стандарту MLA. Проверь ссылку и исправь её, предполагая, что это монография.
 
 **Задача:**
@@ -100,21 +91,15 @@ MLA:
 **Ссылка:**
 "{reference}"
 """
-    }
+}
 
-    prompt = prompt_templates.get(subformat)
+async def format_mla_ai(reference: str, subformat: str) -> str:
+    prompt = PROMPT_TEMPLATES.get(subformat)
     if not prompt:
         return f"Ошибка: неверный подтип для MLA: {subformat}"
 
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
-    
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt.format(reference=reference)}],
-            temperature=0.1,
-            timeout=150
-        )
-        return response.choices[0].message.content.strip()
+        return await chat_completion(prompt.format(reference=reference), timeout=150,
+                                     cache_key=make_key(prompt, reference, "MLA", subformat))
     except Exception as e:
         return f"Ошибка при вызове нейросетевого сервиса: {e}"
\ No newline at end of file
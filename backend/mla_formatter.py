@@ -1,11 +1,14 @@
 # backend/mla_formatter.py
+from backend.reference_renderer import parse_reference, guess_subformat, render_reference
 
-def format_mla(reference: str) -> str:
+
+def format_mla(reference: str, subformat: str = None) -> str:
     """
-    Форматирует библиографическую ссылку в стиле MLA.
+    Форматирует библиографическую ссылку в стиле MLA по шаблону, без нейросети.
     
     Аргументы:
         reference (str): Исходная библиографическая запись.
+        subformat (str): Подтип MLA; если не указан, определяется по найденным полям.
     
     Возвращает:
         str: Отформатированная запись по стандарту MLA или сообщение об ошибке.
@@ -13,27 +16,10 @@ def format_mla(reference: str) -> str:
     if not reference.strip():
         return "Ошибка: Пустая библиографическая запись."
 
-    # Простейшая логика разбора записи.
-    # Предполагается, что входная запись содержит основные элементы, разделённые запятыми:
-    # Автор, Название статьи, Название журнала/издательства, Год, Остальные данные (например, том, номер, страницы)
-    parts = [part.strip() for part in reference.split(',')]
-    if len(parts) < 4:
+    # Поля (авторы, заглавие, источник, том, номер, год, страницы, DOI/URL) разбираются
+    # backend.reference_renderer; оформление — по шаблону подтипа
+    record = parse_reference(reference)
+    formatted = render_reference(record, "MLA", subformat or guess_subformat(record, "MLA"))
+    if formatted is None:
         return "Ошибка: Недостаточно данных для формирования записи по MLA. Проверьте входную запись."
-
-    # Извлекаем основные элементы
-    author = parts[0]
-    title = parts[1]
-    source = parts[2]
-    year = parts[3]
-    rest = ', '.join(parts[4:]) if len(parts) > 4 else ""
-
-    # Простейший пример форматирования MLA:
-    # Автор. "Название статьи." Название журнала, Год, Остальные данные.
-    formatted = f"{author}. \"{title}.\" {source}, {year}"
-    if rest:
-        formatted += f", {rest}"
-    formatted += "."
-
-    # Добавляем пометку о формате
-    return f"MLA: {formatted}"
-
+    return formatted
@@ -1,24 +1,19 @@
 # backend/reference_converter.py
 import os
-import openai
 import logging
-from dotenv import load_dotenv
-
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
+from backend.llm_client import chat_completion
+from backend.cache import make_key
+from backend.reference_renderer import try_render
+from backend.log_utils import trace
 
+# Минимальная уверенность разбора, при которой ссылка оформляется правилами без нейросети (>1 — всегда нейросеть)
+RULE_RENDER_MIN_CONFIDENCE = float(os.getenv("RULE_RENDER_MIN_CONFIDENCE", "0.9"))
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def convert_to_format(reference: str, target_format: str, target_subformat: str) -> str:
+async def convert_to_format(reference: str, target_format: str, target_subformat: str) -> str:
     """
     Конвертирует библиографическую запись в указанный формат и подтип.
     Возвращает только отформатированную ссылку без объяснений.
@@ -94,16 +89,18 @@ def convert_to_format(reference: str, target_format: str, target_subformat: str)
         logger.error("Неверный подтип для %s: %s", target_format, target_subformat)
         return f"Ошибка: неверный подтип для {target_format}."
 
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
+    # Хорошо разобранные записи оформляются по шаблону, без запроса к нейросети
+    rendered, confidence = try_render(reference, target_format, target_subformat)
+    if rendered and confidence >= RULE_RENDER_MIN_CONFIDENCE:
+        trace(logger, "Ссылка оформлена по правилам (уверенность %.2f): %s", confidence, rendered)
+        return rendered
+
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt.format(reference=reference)}],
-            temperature=0.1,
-            timeout=150
+        converted = await chat_completion(
+            prompt.format(reference=reference), timeout=150,
+            cache_key=make_key(prompt, reference, target_format.upper(), target_subformat)
         )
-        converted = response.choices[0].message.content.strip()
-        logger.info("Конвертированная ссылка: %s", converted)
+        trace(logger, "Конвертированная ссылка: %s", converted)
         return converted
     except Exception as e:
         logger.error("Ошибка AI-сервиса: %s", str(e))
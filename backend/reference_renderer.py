@@ -0,0 +1,346 @@
+# backend/reference_renderer.py
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+from backend.reference_validator import CITY_ABBREVIATIONS, extract_gost_fields
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_SPACES_RE = re.compile(r"\s+")
+_NUMBERING_RE = re.compile(r"^\d+[.)]\s+")
+_AUTHOR_RE = re.compile(r"^([А-Яа-яA-Za-zЁё\-]+)\s*((?:[А-Яа-яA-Za-zЁё]\.\s*)+)$")
+_INITIAL_RE = re.compile(r"([А-Яа-яA-Za-zЁё])\.")
+_ET_AL_RE = re.compile(r"(?:,\s*)?(?:\.\.\.,\s*)?(?:и\s*др\.|et\s*al\.)")
+# Конец заглавия: «//» (источник), « / » (сведения об ответственности), «. Город:», «. Год», «. URL», «. DOI»
+_TITLE_END_RE = re.compile(
+    r"\s+//?\s|\.\s+(?:[А-Яа-яA-Za-zЁё.\-]+(?:\s+[А-Яа-яA-Za-zЁё\-]+)?\s*:|(?:1[5-9]|20)\d{2}\b|URL\b|DOI\b)"
+)
+_YEAR_RE = re.compile(r"\b(1[5-9]\d{2}|20\d{2})\b")
+_PAGE_RANGE_RE = re.compile(r"(?:\bС\.|\bс\.|\bpp?\.)\s*(\d+(?:\s*[–—-]\s*\d+)?)")
+_DOI_RE = re.compile(r"(?:DOI|doi):?\s*(10\.\d{4,9}/[^\s]+)|https?://(?:dx\.)?doi\.org/(10\.\d{4,9}/[^\s]+)")
+# Части записи, которые не содержат года издания
+_NON_YEAR_PARTS_RE = re.compile(r"https?://\S+|(?:DOI|doi):?\s*\S+|ISBN\s*[\d\-X]+|\(дата\s*обращения:[^)]*\)")
+_TOKEN_RE = re.compile(r"\w{2,}")
+_CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+_SERVICE_WORDS = {"URL", "DOI", "ISBN"}
+
+# Служебные слова описаний: их отсутствие в результате не считается потерей данных
+MARKER_TOKENS = {
+    "под", "ред", "ed", "eds", "др", "et", "al", "and", "url", "doi", "org", "https", "http", "www",
+    "retrieved", "from", "дата", "обращения", "печати", "in", "press", "isbn", "vol", "no", "pp", "pag",
+}
+
+# Поля, без которых запись подтипа не оформляется правилами (тогда ссылка уходит в нейросеть)
+RENDER_REQUIREMENTS = {
+    "GOST": {
+        "Статья в журнале": ["authors", "title", "journal", "year"],
+        "Книга": ["authors", "title", "publisher", "year"],
+        "Материалы конференций": ["title", "publisher", "year"],
+        "Статья в печати": ["authors", "title", "journal"],
+        "Онлайн-статья": ["authors", "title", "journal", "url"],
+    },
+    "APA": {
+        "Журнальная статья": ["authors", "title", "journal", "year"],
+        "Онлайн-журнал": ["authors", "title", "journal", "year", "url"],
+        "Сетевое издание": ["authors", "title", "year", "url"],
+        "Книга": ["authors", "title", "publisher", "year"],
+    },
+    "MLA": {
+        "Журнальная статья": ["authors", "title", "journal", "year"],
+        "Интернет-журнал": ["authors", "title", "journal", "year", "url"],
+        "Статья в онлайн-СМИ": ["authors", "title", "year", "url"],
+        "Монография": ["authors", "title", "publisher", "year"],
+    },
+}
+
+# Поля, которые стиль сознательно опускает (на оценку полноты не влияют)
+DROPPED_FIELDS = ("access_date", "isbn", "city_abbreviation", "page_count")
+
+
+def _clean(value: Optional[str]) -> str:
+    return (value or "").strip(" .,;")
+
+
+def _parse_authors(text: str) -> Tuple[List[Tuple[str, List[str]]], bool]:
+    """'Иванов И.И., Petrov P.' → ([('Иванов', ['И', 'И']), ('Petrov', ['P'])], et_al)."""
+    et_al = bool(_ET_AL_RE.search(text))
+    text = _ET_AL_RE.sub("", text)
+    authors = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = _AUTHOR_RE.match(part)
+        if not match:
+            return [], False
+        authors.append((match.group(1), _INITIAL_RE.findall(match.group(2))))
+    return authors, et_al
+
+
+def parse_reference(reference: str) -> Dict:
+    """
+    Структурированная запись для оформления по правилам. Основные поля берутся
+    из extract_gost_fields, заглавие, год и диапазон страниц уточняются здесь.
+    Авторы — список пар (фамилия, [инициалы]).
+    """
+    reference = _NUMBERING_RE.sub("", _SPACES_RE.sub(" ", reference.strip()))
+    fields = extract_gost_fields(reference, "Статья в печати")
+    record = {"reference": reference, "authors": [], "et_al": False}
+
+    # Автор засчитывается, только если у каждой фамилии есть инициалы:
+    # иначе регулярное выражение поймало первое слово заглавия
+    rest = reference
+    author_text = fields.get("author", "")
+    # Шаблон авторов жадный к необязательному второму инициалу («Brown B. S» из «Brown B. Soil»)
+    author_text = author_text[:author_text.rfind(".") + 1]
+    if author_text and reference.startswith(author_text):
+        authors, et_al = _parse_authors(author_text)
+        if authors:
+            record["authors"], record["et_al"] = authors, et_al
+            rest = reference[len(author_text):].lstrip(" .,")
+
+    end = _TITLE_END_RE.search(rest)
+    title = _clean(rest[:end.start()] if end else rest)
+    if title:
+        record["title"] = title
+
+    for field in ("journal", "volume", "issue", "publisher", "url", "doi", "access_date", "isbn", "editor"):
+        value = _clean(fields.get(field))
+        if value:
+            record[field] = value
+    if "journal" in record:
+        # Источник — до первой точки: дальше идут год, том и номер
+        record["journal"] = _clean(record["journal"].split(". ")[0])
+    city = _clean(fields.get("city"))
+    if city and city not in _SERVICE_WORDS and "publisher" in record:
+        record["city"] = city
+        # Сокращение из исходной записи (М., СПб.) развёрнуто в полное название
+        for abbreviation, name in CITY_ABBREVIATIONS.items():
+            if name == city and abbreviation in reference:
+                record["city_abbreviation"] = abbreviation
+
+    doi = _DOI_RE.search(reference)
+    if doi:
+        record["doi"] = (doi.group(1) or doi.group(2)).rstrip(".,;")
+    if "url" in record:
+        record["url"] = record["url"].rstrip(".,;)")
+        if "doi" in record and "doi.org/" in record["url"]:
+            del record["url"]
+
+    year = fields.get("year")
+    if not year:
+        found = _YEAR_RE.search(_NON_YEAR_PARTS_RE.sub(" ", reference))
+        year = found.group(1) if found else None
+    if year:
+        record["year"] = year
+
+    pages = _PAGE_RANGE_RE.search(reference)
+    if pages:
+        record["pages"] = re.sub(r"\s*[–—-]\s*", "–", pages.group(1))
+    count = re.match(r"\d+", fields.get("pages", ""))
+    if count and not pages:
+        record["page_count"] = count.group(0)
+    if "(в печати)" in reference or re.search(r"\bin\s+press\b", reference, re.IGNORECASE):
+        record["in_press"] = True
+    return record
+
+
+def guess_subformat(record: Dict, style: str) -> str:
+    """Подтип стиля по составу полей записи (для форматтеров без явного подтипа)."""
+    style = style.upper()
+    if style == "GOST":
+        if "journal" in record:
+            if record.get("in_press"):
+                return "Статья в печати"
+            return "Онлайн-статья" if "url" in record and "access_date" in record else "Статья в журнале"
+        return "Книга" if record["authors"] else "Материалы конференций"
+    if style == "APA":
+        if "journal" in record:
+            return "Онлайн-журнал" if "url" in record and "doi" not in record else "Журнальная статья"
+        return "Сетевое издание" if "url" in record and "publisher" not in record else "Книга"
+    if "journal" in record:
+        return "Интернет-журнал" if "url" in record and "doi" not in record else "Журнальная статья"
+    return "Статья в онлайн-СМИ" if "url" in record and "publisher" not in record else "Монография"
+
+
+def _gost_names(record: Dict) -> str:
+    names = ", ".join(f"{surname} {''.join(i + '.' for i in initials)}" for surname, initials in record["authors"])
+    return names + (" [и др.]" if record["et_al"] else "")
+
+
+def _apa_name(surname: str, initials: List[str]) -> str:
+    return f"{surname}, {' '.join(i + '.' for i in initials)}"
+
+
+def _apa_names(record: Dict) -> str:
+    names = [_apa_name(*author) for author in record["authors"]]
+    if record["et_al"]:
+        return ", ".join(names) + ", et al."
+    if len(names) == 1:
+        return names[0]
+    return ", ".join(names[:-1]) + ", & " + names[-1]
+
+
+def _mla_names(record: Dict, conjunction: str, others: str) -> str:
+    authors = record["authors"]
+    first = _apa_name(*authors[0])
+    if len(authors) > 2 or record["et_al"]:
+        return f"{first}, {others}"
+    if len(authors) == 2:
+        surname, initials = authors[1]
+        return f"{first}, {conjunction} {' '.join(i + '.' for i in initials)} {surname}"
+    return first
+
+
+def _sentence(text: str) -> str:
+    """Добавляет точку в конце, если предложение не заканчивается знаком препинания."""
+    return text if text.endswith((".", "?", "!")) else text + "."
+
+
+def _render_gost(record: Dict, subformat: str) -> str:
+    title = record["title"]
+    # Для иностранных источников обозначения тома, номера и страниц — латиницей
+    russian = bool(_CYRILLIC_RE.search(title))
+    volume, issue, pages = ("Т.", "№", "С.") if russian else ("Vol.", "No.", "P.")
+    if subformat == "Материалы конференций":
+        editor = f" / под ред. {record['editor']}" if "editor" in record else ""
+        head = f"{title}{editor}."
+    else:
+        head = f"{_gost_names(record)} {title}"
+    if subformat in ("Статья в журнале", "Статья в печати", "Онлайн-статья"):
+        parts = [f"{head} // {record['journal']}"]
+        if "year" in record:
+            parts.append(record["year"])
+        if subformat != "Онлайн-статья":
+            if "volume" in record:
+                parts.append(f"{volume} {record['volume']}")
+            if "issue" in record:
+                parts.append(f"{issue} {record['issue']}")
+        if subformat == "Статья в журнале" and "pages" in record:
+            parts.append(f"{pages} {record['pages']}")
+        text = ". ".join(parts)
+        if subformat == "Статья в печати":
+            return f"{text} (в печати)"
+        if subformat == "Онлайн-статья":
+            text += f". URL: {record['url']}"
+            if "access_date" in record:
+                text += f" (дата обращения: {record['access_date']})"
+            return text
+        if "doi" in record:
+            return f"{text}. DOI: {record['doi']}"
+        if "url" in record:
+            return f"{text}. URL: {record['url']}"
+        return text + "."
+    # Книга и материалы конференций
+    head = head if head.endswith(".") else head + "."
+    city = record.get("city_abbreviation") or record.get("city")
+    place = f"{city}: " if city else ""
+    text = f"{head} {place}{record['publisher']}, {record['year']}."
+    if "page_count" in record:
+        text += f" {record['page_count']} с."
+    return text
+
+
+def _render_apa(record: Dict, subformat: str) -> str:
+    head = f"{_apa_names(record)} ({record['year']}). {_sentence(record['title'])}"
+    if subformat == "Книга":
+        place = f"{record['city']}: " if "city" in record else ""
+        return _sentence(f"{head} {place}{record['publisher']}")
+    if subformat == "Сетевое издание":
+        site = f" {record['journal']}." if "journal" in record else ""
+        return f"{head}{site} Retrieved from {record['url']}"
+    source = record["journal"]
+    if subformat == "Журнальная статья":
+        if "volume" in record:
+            source += f", {record['volume']}"
+            if "issue" in record:
+                source += f"({record['issue']})"
+        elif "issue" in record:
+            source += f", ({record['issue']})"
+    elif "issue" in record:
+        source += f", ({record['issue']})"
+    if "pages" in record:
+        source += f", {record['pages']}"
+    text = f"{head} {source}."
+    if subformat == "Онлайн-журнал":
+        return f"{text} Retrieved from {record['url']}"
+    if "doi" in record:
+        return f"{text} https://doi.org/{record['doi']}"
+    if "url" in record:
+        return f"{text} {record['url']}"
+    return text
+
+
+def _render_mla(record: Dict, subformat: str) -> str:
+    # Подписи элементов — на языке записи, как в шаблонах промптов
+    russian = bool(_CYRILLIC_RE.search(record["title"]))
+    volume, issue, pages, no_pages = (("т.", "№", "с.", "б. с.") if russian else ("vol.", "no.", "pp.", "n. pag."))
+    names = _mla_names(record, "и" if russian else "and", "и др." if russian else "et al.")
+    head = _sentence(names)
+    if subformat == "Монография":
+        parts = [p for p in (record.get("city"), record["publisher"], record["year"]) if p]
+        return f"{head} {_sentence(record['title'])} {_sentence(', '.join(parts))}"
+    title = f'"{_sentence(record["title"])}"'
+    if subformat == "Статья в онлайн-СМИ":
+        site = f" {record['journal']}," if "journal" in record else ""
+        return f"{head} {title}{site} {record['year']}, {record['url']}"
+    parts = [record["journal"]]
+    if "volume" in record:
+        parts.append(f"{volume} {record['volume']}")
+    if subformat == "Журнальная статья" and "issue" in record:
+        parts.append(f"{issue} {record['issue']}")
+    parts.append(record["year"])
+    if "pages" in record:
+        parts.append(f"{pages} {record['pages']}")
+    elif subformat == "Интернет-журнал":
+        parts.append(no_pages)
+    text = f"{head} {title} {_sentence(', '.join(parts))}"
+    if subformat == "Интернет-журнал":
+        return f"{text} {record['url']}"
+    if "doi" in record:
+        return f"{text} https://doi.org/{record['doi']}"
+    if "url" in record:
+        return f"{text} {record['url']}"
+    return text
+
+
+_RENDERERS = {"GOST": _render_gost, "APA": _render_apa, "MLA": _render_mla}
+
+
+def render_reference(record: Dict, style: str, subformat: str) -> Optional[str]:
+    """
+    Оформляет запись в стиле style и подтипе subformat по шаблону.
+    Возвращает None, если подтип неизвестен или в записи нет обязательных для него полей.
+    """
+    style = style.upper()
+    required = RENDER_REQUIREMENTS.get(style, {}).get(subformat)
+    if required is None or any(not record.get(field) for field in required):
+        return None
+    return _RENDERERS[style](record, subformat)
+
+
+def render_confidence(record: Dict, rendered: Optional[str]) -> float:
+    """
+    Доля значимых слов и чисел исходной записи, вошедших в оформленную ссылку (0..1).
+    Служебные слова и поля, которые стиль опускает (дата обращения, ISBN), не учитываются,
+    поэтому неполный или ошибочный разбор даёт низкую оценку.
+    """
+    if not rendered:
+        return 0.0
+    ignored = set(MARKER_TOKENS)
+    for field in DROPPED_FIELDS:
+        ignored.update(token.lower() for token in _TOKEN_RE.findall(record.get(field) or ""))
+    source = {token.lower() for token in _TOKEN_RE.findall(record["reference"])} - ignored
+    if not source:
+        return 0.0
+    target = {token.lower() for token in _TOKEN_RE.findall(rendered)}
+    return len(source & target) / len(source)
+
+
+def try_render(reference: str, style: str, subformat: str) -> Tuple[Optional[str], float]:
+    """Оформление по правилам без нейросети: (ссылка или None, уверенность 0..1)."""
+    record = parse_reference(reference)
+    rendered = render_reference(record, style, subformat)
+    return rendered, render_confidence(record, rendered)
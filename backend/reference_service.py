@@ -0,0 +1,391 @@
+# backend/reference_service.py
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+from backend.document_parser import extract_references, iter_document_references
+from backend.reference_validator import validate_reference_by_style
+from backend.gost_ai_formatter import format_gost
+from backend.apa_ai_formatter import format_apa_ai
+from backend.mla_ai_formatter import format_mla_ai
+from backend.ai_batch import BatchFormatter
+from backend.web_scraper import extract_bibliographic_data, compose_reference
+from backend.tex_bibliography_formatter import format_reference_to_tex, format_references_to_tex
+from backend.csv_bibliography_formatter import format_reference_to_csv, format_references_to_csv
+from backend.reference_converter import convert_to_format
+from backend.tavily_search import search_reference, close_search_backend
+from backend.llm_client import close_client
+from backend.executor import run_blocking, iterate_blocking, shutdown_executors
+from backend.uploads import SpooledUpload
+from backend.log_utils import trace, log_summary
+from backend.cache import llm_cache, document_cache
+from backend.browser_pool import browser_pool
+
+# Ограничения параллельной обработки невалидных ссылок:
+# на один запрос (значение по умолчанию и верхняя граница) и на весь процесс
+CHECK_DEFAULT_CONCURRENCY = int(os.getenv("CHECK_DEFAULT_CONCURRENCY", "4"))
+CHECK_MAX_CONCURRENCY = int(os.getenv("CHECK_MAX_CONCURRENCY", "8"))
+CHECK_GLOBAL_CONCURRENCY = int(os.getenv("CHECK_GLOBAL_CONCURRENCY", "16"))
+global_check_semaphore = asyncio.Semaphore(CHECK_GLOBAL_CONCURRENCY)
+# Ёмкость очередей между стадиями конвейера проверки (ссылок): ограничивает память и задаёт обратное давление
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+
+AI_FORMATTERS = {
+    "GOST": format_gost,
+    "APA": format_apa_ai,
+    "MLA": format_mla_ai
+}
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DocumentNotFound(Exception):
+    """document_id неизвестен или уже вытеснен из кэша разобранных документов."""
+
+    def __init__(self, document_id: str):
+        super().__init__("Документ не найден, загрузите файл заново.")
+        self.document_id = document_id
+
+
+async def shutdown_service() -> None:
+    """
+    Освобождение общих ресурсов при остановке клиента (API, бот): браузер, пулы
+    соединений с нейросетью и поиском, пулы исполнителей, кэши на диске.
+    """
+    await browser_pool.stop()
+    await close_client()
+    await close_search_backend()
+    shutdown_executors()
+    llm_cache.close()
+    document_cache.close()
+
+
+def resolve_concurrency(requested: Optional[int]) -> int:
+    """Приводит запрошенный клиентом лимит параллельности к допустимому диапазону."""
+    if not requested:
+        requested = CHECK_DEFAULT_CONCURRENCY
+    return max(1, min(requested, CHECK_MAX_CONCURRENCY))
+
+
+# --- Документы: разбор загрузок и кэш разобранных списков ---
+
+async def iterate_references(references: list):
+    for reference in references:
+        yield reference
+
+
+async def prepend_reference(first: str, references):
+    try:
+        yield first
+        async for reference in references:
+            yield reference
+    finally:
+        await references.aclose()
+
+
+async def read_document(upload: SpooledUpload):
+    """
+    Список ссылок загруженного документа: (ссылки или None, попадание в кэш).
+    Уже разобранный файл (тот же SHA-256) берётся из кэша документов без повторного разбора.
+    """
+    started = time.perf_counter()
+    cached = await document_cache.aget(upload.sha256)
+    if cached is not None:
+        references = cached["references"]
+    else:
+        with upload.open() as file_obj:
+            references = await run_blocking(extract_references, file_obj, upload.filename)
+        await document_cache.aset(upload.sha256, {"filename": upload.filename, "references": references})
+    log_summary(logger, "upload", filename=upload.filename, references=len(references or ()),
+                cached=cached is not None, parse_ms=round((time.perf_counter() - started) * 1000, 1),
+                **upload.metrics())
+    return references, cached is not None
+
+
+async def cached_document(document_id: str):
+    """Ссылки ранее загруженного документа (или None — список не найден); неизвестный id — DocumentNotFound."""
+    cached = await document_cache.aget(document_id)
+    if cached is None:
+        raise DocumentNotFound(document_id)
+    return cached["references"]
+
+
+async def stream_uploaded_references(upload: SpooledUpload):
+    """
+    Ссылки загруженного файла по мере разбора (iter_document_references в пуле потоков).
+    Полностью разобранный список сохраняется в кэш документов; временный файл удаляется в конце.
+    """
+    started = time.perf_counter()
+    references = []
+    try:
+        with upload.open() as file_obj:
+            async for reference in iterate_blocking(iter_document_references(file_obj, upload.filename),
+                                                    PIPELINE_QUEUE_SIZE):
+                references.append(reference)
+                yield reference
+        await document_cache.aset(upload.sha256, {"filename": upload.filename, "references": references or None})
+        log_summary(logger, "upload", filename=upload.filename, references=len(references), cached=False,
+                    parse_ms=round((time.perf_counter() - started) * 1000, 1), **upload.metrics())
+    finally:
+        upload.close()
+
+
+async def open_document(upload: SpooledUpload):
+    """
+    Источник ссылок документа для конвейера проверки: (async-итератор или None, попадание в кэш).
+    Уже разобранный документ берётся из кэша, новый отдаёт ссылки по мере разбора,
+    не дожидаясь конца документа. Первая ссылка ожидается здесь: None — список
+    литературы не найден (загрузка к этому моменту уже закрыта).
+    """
+    cached = await document_cache.aget(upload.sha256)
+    if cached is not None:
+        upload.close()
+        references = iterate_references(cached["references"] or [])
+    else:
+        references = stream_uploaded_references(upload)
+    first = await anext(references, None)
+    if first is None:
+        await references.aclose()
+        return None, cached is not None
+    return prepend_reference(first, references), cached is not None
+
+
+# --- Проверка ссылок ---
+
+async def analyze_invalid_reference(ref: dict, style_upper: str, subformat: str,
+                                    batch: Optional[BatchFormatter] = None, position: int = 0,
+                                    search: bool = True) -> dict:
+    """
+    Полная обработка одной невалидной ссылки: анализ нейросетью,
+    поиск источника через Tavily и сбор исправленной записи со страницы.
+    Если передан batch, анализ берётся из пакетного запроса (ссылка под номером position).
+    search=False — только анализ нейросетью (corrected_reference = None).
+    """
+    trace(logger, "Processing invalid ref: %s", ref['original'])
+    formatter = AI_FORMATTERS.get(style_upper)
+    if formatter and batch is not None:
+        analysis = await batch.get(position)
+    elif formatter:
+        analysis = await formatter(ref['original'], subformat)
+    else:
+        analysis = f"Ошибка: неверный формат (допустимые: {', '.join(AI_FORMATTERS)})."
+
+    corrected_ref = None
+    if search:
+        url = await search_reference(ref['original'])
+        if url:
+            try:
+                data = await extract_bibliographic_data(url)
+                corrected_ref = await compose_reference(data, style_upper, subformat)
+                trace(logger, "Найден и отформатирован источник через Tavily: %s", corrected_ref)
+            except Exception as e:
+                logger.error("Ошибка веб-скрапинга для URL %s: %s", url, e)
+        corrected_ref = corrected_ref or "Не удалось найти источник"
+
+    return {
+        "type": "invalid",
+        "index": ref['index'],
+        "original": ref['original'],
+        "errors_and_corrections": analysis,
+        "detected_type": ref['type'],
+        "initial_errors": ref['errors'],
+        "corrected_reference": corrected_ref
+    }
+
+
+def failed_reference_result(ref: dict, error: Exception) -> dict:
+    """Результат для невалидной ссылки, обработка которой завершилась ошибкой."""
+    return {
+        "type": "invalid",
+        "index": ref['index'],
+        "original": ref['original'],
+        "errors_and_corrections": f"Ошибка обработки ссылки: {error}",
+        "detected_type": ref['type'],
+        "initial_errors": ref['errors'],
+        "corrected_reference": "Не удалось найти источник"
+    }
+
+
+class ReferenceCheck:
+    """
+    Конвейер проверки ссылок: разбор → проверка → анализ нейросетью и поиск источника.
+    references — список или async-итератор ссылок по мере разбора. Каждая ссылка
+    проверяется сразу: валидная отдаётся немедленно, невалидная через ограниченную
+    очередь уходит concurrency обработчикам (и не более CHECK_GLOBAL_CONCURRENCY на процесс).
+    Между стадиями — очереди ёмкостью PIPELINE_QUEUE_SIZE, следующий результат
+    готовится, только пока потребитель успевает их забирать: медленный клиент или
+    нейросеть притормаживают разбор, а не копят результаты в памяти.
+    Результаты — async for result in check.stream() в порядке готовности (поле index —
+    позиция во входе); ready() — есть ли уже готовый следующий результат.
+    """
+
+    def __init__(self, references, style: str, subformat: str,
+                 concurrency: Optional[int] = None, search: bool = True):
+        if isinstance(references, (list, tuple)):
+            references = iterate_references(references)
+        self.references = references
+        self.style = style.upper()
+        self.subformat = subformat
+        self.concurrency = resolve_concurrency(concurrency)
+        self.search = search
+        self.valid = 0
+        self.invalid = 0
+        self.failed = 0
+        self.delivered = 0
+        self._results = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+
+    def ready(self) -> bool:
+        return not self._results.empty()
+
+    async def stream(self):
+        started = time.perf_counter()
+        first_result_ms = None
+        done = object()
+        batch = BatchFormatter([], self.style, self.subformat, streaming=True)
+        # Очередь не меньше пакета нейросети: иначе обработчики ждали бы группу, которую проверка не может дополнить
+        invalid_queue = asyncio.Queue(max(PIPELINE_QUEUE_SIZE, batch.batch_size))
+        results = self._results
+
+        async def validate_stage():
+            index = 0
+            try:
+                async for reference in self.references:
+                    is_valid, errors, ref_type = validate_reference_by_style(reference, self.style, self.subformat)
+                    trace(logger, "Reference: %s, is_valid: %s, ref_type: %s, errors: %s",
+                          reference, is_valid, ref_type, errors)
+                    if is_valid:
+                        self.valid += 1
+                        await results.put({"type": "valid", "index": index, "reference": reference})
+                    else:
+                        self.invalid += 1
+                        ref = {"original": reference, "errors": errors, "type": ref_type, "index": index}
+                        await invalid_queue.put((ref, batch.add(reference)))
+                    index += 1
+            finally:
+                batch.close()
+            for _ in range(self.concurrency):
+                await invalid_queue.put(done)
+
+        async def enrich_stage():
+            while True:
+                item = await invalid_queue.get()
+                if item is done:
+                    return
+                ref, position = item
+                # Ожидание заполнения группы пакета — без слота общего лимита: иначе неполные
+                # группы медленных запросов занимали бы слоты, нужные остальным проверкам
+                await batch.wait_group(position)
+                async with global_check_semaphore:
+                    try:
+                        result = await analyze_invalid_reference(ref, self.style, self.subformat,
+                                                                 batch, position, self.search)
+                    except Exception as e:
+                        self.failed += 1
+                        logger.exception("Ошибка обработки ссылки %s", ref['original'])
+                        result = failed_reference_result(ref, e)
+                await results.put(result)
+
+        async def run_stages():
+            tasks = [asyncio.ensure_future(validate_stage())]
+            tasks += [asyncio.ensure_future(enrich_stage()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            except Exception:
+                # Ошибка одной стадии останавливает остальные; потребитель получает её через await stages
+                for task in tasks:
+                    task.cancel()
+                await results.put(done)
+                raise
+            await results.put(done)
+
+        stages = asyncio.create_task(run_stages())
+        try:
+            while True:
+                result = await results.get()
+                if result is done:
+                    break
+                if first_result_ms is None:
+                    first_result_ms = round((time.perf_counter() - started) * 1000, 1)
+                self.delivered += 1
+                yield result
+            # Ошибка разбора документа или проверки поднимается здесь
+            await stages
+        finally:
+            # Потребитель отключился или генератор закрыт — останавливаем все стадии и разбор документа
+            stages.cancel()
+            await asyncio.gather(stages, return_exceptions=True)
+            batch.cancel()
+            await self.references.aclose()
+            log_summary(logger, "check_references", style=self.style, subformat=self.subformat,
+                        valid=self.valid, invalid=self.invalid, delivered=self.delivered, failed=self.failed,
+                        complete=self.delivered == self.valid + self.invalid and not stages.cancelled(),
+                        first_result_ms=first_result_ms,
+                        elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+
+
+def check_references(references, style: str, subformat: str,
+                     concurrency: Optional[int] = None, search: bool = True):
+    """
+    Проверка ссылок для всех клиентов (API, бот): async-итератор результатов
+    type valid (index, reference) или invalid (index, original, errors_and_corrections,
+    detected_type, initial_errors, corrected_reference). См. ReferenceCheck.
+    """
+    return ReferenceCheck(references, style, subformat, concurrency, search).stream()
+
+
+# --- Конвертация и сбор ссылок ---
+
+async def convert_references(references: list, target_format: str, target_subformat: str,
+                             concurrency: Optional[int] = None) -> list:
+    """
+    Конвертация списка ссылок в целевой стиль: до concurrency ссылок одновременно
+    (и в общем лимите CHECK_GLOBAL_CONCURRENCY). Порядок результатов — исходный;
+    результат — {"original", "converted"} или {"original", "error"}.
+    """
+    limit = asyncio.Semaphore(resolve_concurrency(concurrency))
+
+    async def convert_one(reference: str) -> dict:
+        async with limit, global_check_semaphore:
+            try:
+                return {"original": reference,
+                        "converted": await convert_to_format(reference, target_format, target_subformat)}
+            except Exception as e:
+                logger.error("Ошибка конвертации ссылки %s: %s", reference, e)
+                return {"original": reference, "error": str(e)}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(convert_one(reference) for reference in references))
+    log_summary(logger, "convert_references", target_format=target_format, subformat=target_subformat,
+                references=len(references), failed=sum(1 for result in results if "error" in result),
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    return results
+
+
+async def scrape_reference(url: str, style: str, subformat: str):
+    """Сбор ссылки по URL страницы: (оформленная ссылка, уровень извлечения данных — tier)."""
+    data = await extract_bibliographic_data(url)
+    reference = await compose_reference(data, style, subformat)
+    return reference, data.get("tier")
+
+
+async def references_to_bibtex(references: list, target_format: str, subformat: str) -> str:
+    """Записи BibTeX для списка ссылок, разделённые пустой строкой."""
+    return "\n\n".join(await format_references_to_tex(references, target_format, subformat))
+
+
+async def reference_to_bibtex(reference: str, target_format: str, subformat: str) -> str:
+    """Запись BibTeX для одной ссылки."""
+    return await format_reference_to_tex(reference, target_format, subformat)
+
+
+async def reference_to_csv(reference: str) -> str:
+    """CSV (заголовок и строка) для одной ссылки."""
+    return await format_reference_to_csv(reference)
+
+
+async def references_to_csv(references: list) -> str:
+    """CSV для списка ссылок: одна строка на ссылку."""
+    return await format_references_to_csv(references)
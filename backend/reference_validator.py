@@ -1,11 +1,15 @@
 import re
+import time
 from typing import Tuple, List, Dict
 import logging
 import os
+from backend.log_utils import trace, log_summary
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+YEAR_RE = re.compile(r'\b\d{4}\b')
+
 def basic_validation(reference: str) -> Tuple[bool, List[str]]:
     """
     Базовая проверка ссылки: наличие текста и года.
@@ -15,7 +19,7 @@ def basic_validation(reference: str) -> Tuple[bool, List[str]]:
     if not reference.strip():
         errors.append("Ссылка пуста")
         return False, errors
-    if not re.search(r'\b\d{4}\b', reference):
+    if not YEAR_RE.search(reference):
         errors.append("Отсутствует год (ожидается 4-значное число, например, 2020)")
     return len(errors) == 0, errors
 
@@ -51,53 +55,130 @@ CITY_ABBREVIATIONS = {
     "К.": "Казань"
 }
 
-def extract_gost_fields(reference: str, ref_type: str) -> Dict[str, str]:
+# Шаблоны полей ГОСТ (компилируются один раз); значение поля — в первой группе.
+# Порядок определяет порядок полей в результате extract_gost_fields.
+GOST_FIELD_PATTERNS = {
+    "author": re.compile(r'^([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?(?:,\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)*(?:\s*,\s*\.\.\.,\s*(?:и\s*др\.|et\s*al\.))?)'),
+    "title": re.compile(r'(?:[А-Яа-яA-Za-zЁё]\.\s+)(.+?)(?=\.\s*(?:[А-Яа-яA-Za-zЁё]*:|\d{4}|//))'),
+    "city": re.compile(r'(?:\.|//)\s*([А-Яа-яA-Za-zЁё\.]+(?:\s+[А-Яа-яA-Za-zЁё]+)?)\s*:'),
+    "publisher": re.compile(r':\s*([А-Яа-яA-Za-zЁё\s\-]+)(?=,\s*\d{4})'),
+    "year": re.compile(r',\s*(\d{4})(?=\.|$)'),
+    "pages": re.compile(r'(\d+\s*с\.?\s*)'),
+    "journal": re.compile(r'//\s*(.+?)\.(?=\s*\d{4})'),
+    "volume": re.compile(r'(?<!\w)(?:Т\.|Vol\.)\s*(\d+)'),
+    "issue": re.compile(r'№\s*(\d+)'),
+    "doi": re.compile(r'(?:DOI|doi):\s*([^\s]+)'),
+    "url": re.compile(r'URL:\s*(https?://[^\s]+)'),
+    "access_date": re.compile(r'\(дата\s*обращения:\s*(\d{2}\.\d{2}\.\d{4})\)'),
+    "isbn": re.compile(r'ISBN\s*(\d{13}|\d{10})'),
+    "editor": re.compile(r'под\s*ред\.\s*([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)'),
+}
+
+# Пометки, по которым определяется тип записи (ищутся в том же проходе, значения не имеют)
+GOST_MARKER_PATTERNS = {
+    "in_press_marker": re.compile(r'\(в\s*печати\)'),
+    "online_marker": re.compile(r'URL:\s*https?://.+?\s*\(дата\s*обращения:'),
+    "editor_marker": re.compile(r'под\s*ред\.'),
+}
+
+# Литерал, без которого шаблон заведомо не совпадёт: дешёвая проверка `in` вместо
+# поиска по регулярному выражению, которое нельзя ускорить префиксом (город начинается с любой точки)
+_GOST_REQUIRED_LITERALS = {"city": ":", "publisher": ":", "year": ",", "journal": "//"}
+
+
+def scan_gost_fields(reference: str) -> Dict[str, Tuple[str, int]]:
+    """
+    Один проход по таблицам шаблонов для записи с уже схлопнутыми пробелами:
+    поле → (значение, позиция начала). Пометки «(в печати)», «URL ... (дата обращения:»
+    и «под ред.» возвращаются с пустым значением, чтобы определение типа записи
+    (detect_gost_type) и проверка полей пользовались одним и тем же разбором.
+    """
+    found = {}
+    for field, pattern in GOST_FIELD_PATTERNS.items():
+        literal = _GOST_REQUIRED_LITERALS.get(field)
+        if literal is not None and literal not in reference:
+            continue
+        match = pattern.search(reference)
+        if match:
+            found[field] = (match.group(1).strip(), match.start(1))
+    for marker, pattern in GOST_MARKER_PATTERNS.items():
+        match = pattern.search(reference)
+        if match:
+            found[marker] = ("", match.start())
+    return found
+
+
+def detect_gost_type(scan: Dict[str, Tuple[str, int]]) -> str:
+    """Тип записи ГОСТ по результату scan_gost_fields."""
+    # Поле journal находится тем же условием, что и признак статьи: «// Источник. Год»
+    if "journal" in scan:
+        if "in_press_marker" in scan:
+            return "Статья в печати"
+        if "online_marker" in scan:
+            return "Онлайн-статья"
+        return "Статья в журнале"
+    if "editor_marker" in scan:
+        return "Материалы конференций"
+    return "Книга"
+
+
+def extract_gost_fields(reference: str, ref_type: str, scan: Dict[str, Tuple[str, int]] = None) -> Dict[str, str]:
     """
     Извлечение полей из ссылки для ГОСТ в зависимости от типа записи.
-    Возвращает словарь с найденными полями.
+    Возвращает словарь с найденными полями. scan — готовый результат scan_gost_fields
+    для той же записи (чтобы не разбирать её повторно).
     """
     # Очистка ссылки от лишних пробелов
-    reference = re.sub(r'\s+', ' ', reference.strip())
-    fields = {}
-    patterns = {
-        "author": r'^([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?(?:,\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)*(?:\s*,\s*\.\.\.,\s*(?:и\s*др\.|et\s*al\.))?)',
-        "title": r'(?:[А-Яа-яA-Za-zЁё]\.\s+)(.+?)(?=\.\s*(?:[А-Яа-яA-Za-zЁё]*:|\d{4}|//))',
-        "city": r'(?:\.|//)\s*([А-Яа-яA-Za-zЁё\.]+(?:\s+[А-Яа-яA-Za-zЁё]+)?)\s*:',
-        "publisher": r':\s*([А-Яа-яA-Za-zЁё\s\-]+)(?=,\s*\d{4})',
-        "year": r',\s*(\d{4})(?=\.|$)',
-        "pages": r'(\d+\s*с\.?\s*)',
-        "journal": r'//\s*(.+?)\.(?=\s*\d{4})',
-        "volume": r'(?:Т\.|Vol\.)\s*(\d+)',
-        "issue": r'№\s*(\d+)',
-        "doi": r'(DOI|doi):\s*([^\s]+)',
-        "url": r'URL:\s*(https?://[^\s]+)',
-        "access_date": r'\(дата\s*обращения:\s*(\d{2}\.\d{2}\.\d{4})\)',
-        "isbn": r'ISBN\s*(\d{13}|\d{10})',
-        "editor": r'под\s*ред\.\s*([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)'
-    }
-
-    for field, pattern in patterns.items():
-        match = re.search(pattern, reference, re.UNICODE)
-        if match:
-            fields[field] = match.group(1).strip()
-            # Обработка сокращений городов
-            if field == "city" and fields[field] in CITY_ABBREVIATIONS:
-                fields[field] = CITY_ABBREVIATIONS[fields[field]]
+    # split()/join схлопывает пробельные символы как re.sub(r'\s+', ' ', ...), но без поиска по шаблону
+    reference = ' '.join(reference.split())
+    if scan is None:
+        scan = scan_gost_fields(reference)
+    fields = {field: value for field, (value, _) in scan.items() if not field.endswith("_marker")}
+    # Обработка сокращений городов
+    if fields.get("city") in CITY_ABBREVIATIONS:
+        fields["city"] = CITY_ABBREVIATIONS[fields["city"]]
 
     # Специфичные проверки
     if ref_type == "Статья в печати" and "(в печати)" in reference:
         fields["in_press"] = "(в печати)"
 
-    logger.info(f"Fields extracted for '{reference}': {fields}")
+    trace(logger, "Fields extracted for '%s': %s", reference, fields)
     return fields
 
+# Общая структура и признаки подтипов APA
+APA_REFERENCE_RE = re.compile(
+    r'^(?:\d+\.\s*)?'
+    r'[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?(?:\s*,\s*[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)*\s*(?:,\s*&\s*[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.)?'
+    r'\s*\(\d{4}(?:,\s*[A-Za-z]+\s*\d+)?\)'
+    r'\.\s*.+?\.'
+)
+APA_JOURNAL_RE = re.compile(r',\s*(?:\d+\(\d+\)|\(\d+\)),\s*\d+(?:–\d+)?')
+APA_RETRIEVED_RE = re.compile(r'Retrieved\s+from\s*https?://')
+APA_ONLINE_ISSUE_RE = re.compile(r',\s*\(\d+\),')
+APA_BOOK_RE = re.compile(r'[А-Яа-яA-Za-zЁё]+(?:\s*[А-Яа-яA-Za-zЁё]+)?(?::\s*[А-Яа-яA-Za-zЁё]+(?:\s*[А-Яа-яA-Za-zЁё]+)?)')
+
+# Общая структура и признаки подтипов MLA
+MLA_REFERENCE_RE = re.compile(
+    r'^(?:\d+\.\s*)?'
+    r'[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)?(?:\s+и\s+[А-Яа-яA-Za-zЁё]+\s+[А-Яа-яA-Za-zЁё]+)?(?:,\s*и\s*др\.)?'
+    r'\s*\.\s*"[^\."]+\."'
+    r'\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)*'
+)
+MLA_JOURNAL_RE = re.compile(r'(?:т\.|vol\.)\s*\d+,\s*№\s*\d+')
+MLA_ONLINE_JOURNAL_RE = re.compile(r'(?:vol\.|т\.)\s*\d+,\s*\d{4},\s*(?:pp\.|с\.)\s*\d+(?:–\d+)?\.\s*https?://')
+MLA_ONLINE_MEDIA_RE = re.compile(r',\s*\d{1,2}\s+[А-Яа-яA-Za-zЁё]+\s+\d{4},')
+MLA_MONOGRAPH_RE = re.compile(r',\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)*,\s*\d{4}$')
+
+GOST_YEAR_FORMAT_RE = re.compile(r'\d{4}')
+GOST_PAGES_FORMAT_RE = re.compile(r'\d+\s*с\.?')
+
 def validate_reference_by_style(reference: str, style: str, subformat: str = None) -> Tuple[bool, List[str], str]:
     """
     Проверка ссылки на соответствие заданному стилю и типу записи.
     Если subformat указан, проверяет строго на соответствие этому типу.
     Возвращает кортеж (валидность, список ошибок, предполагаемый тип записи).
     """
-    logger.info(f"Validating reference '{reference}' with style={style}, subformat={subformat}")
+    trace(logger, "Validating reference '%s' with style=%s, subformat=%s", reference, style, subformat)
     # Базовая проверка
     is_valid, errors = basic_validation(reference)
     if not is_valid:
@@ -107,23 +188,18 @@ def validate_reference_by_style(reference: str, style: str, subformat: str = Non
     ref_type = "Не определён"
 
     if style == "APA":
-        author_pattern = r'[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?(?:\s*,\s*[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)*\s*(?:,\s*&\s*[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.)?'
-        year_pattern = r'\(\d{4}(?:,\s*[A-Za-z]+\s*\d+)?\)'
-        title_pattern = r'.+?\.'
-
-        apa_pattern = rf'^(?:\d+\.\s*)?{author_pattern}\s*{year_pattern}\.\s*{title_pattern}'
-        if not re.match(apa_pattern, reference):
+        if not APA_REFERENCE_RE.match(reference):
             errors.append("Не соответствует общей структуре APA: ожидается 'Фамилия, И. О. (Год). Название...'")
             return False, errors, ref_type
 
-        if re.search(r',\s*(?:\d+\(\d+\)|\(\d+\)),\s*\d+(?:–\d+)?', reference):
+        if APA_JOURNAL_RE.search(reference):
             ref_type = "Журнальная статья"
-        elif re.search(r'Retrieved\s+from\s*https?://', reference):
-            if re.search(r',\s*\(\d+\),', reference):
+        elif APA_RETRIEVED_RE.search(reference):
+            if APA_ONLINE_ISSUE_RE.search(reference):
                 ref_type = "Онлайн-журнал"
             else:
                 ref_type = "Сетевое издание"
-        elif re.search(r'[А-Яа-яA-Za-zЁё]+(?:\s*[А-Яа-яA-Za-zЁё]+)?(?::\s*[А-Яа-яA-Za-zЁё]+(?:\s*[А-Яа-яA-Za-zЁё]+)?)', reference):
+        elif APA_BOOK_RE.search(reference):
             ref_type = "Книга"
 
         if subformat and subformat != ref_type:
@@ -133,22 +209,17 @@ def validate_reference_by_style(reference: str, style: str, subformat: str = Non
         return len(errors) == 0, errors, ref_type
 
     elif style == "MLA":
-        author_pattern = r'[А-Яа-яA-Za-zЁё]+,\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)?(?:\s+и\s+[А-Яа-яA-Za-zЁё]+\s+[А-Яа-яA-Za-zЁё]+)?(?:,\s*и\s*др\.)?'
-        title_pattern = r'"[^\."]+\."'
-        source_pattern = r'[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)*'
-
-        mla_pattern = rf'^(?:\d+\.\s*)?{author_pattern}\s*\.\s*{title_pattern}\s*{source_pattern}'
-        if not re.match(mla_pattern, reference):
+        if not MLA_REFERENCE_RE.match(reference):
             errors.append("Не соответствует общей структуре MLA: ожидается 'Фамилия, Имя. \"Название.\" Источник...'")
             return False, errors, ref_type
 
-        if re.search(r'(?:т\.|vol\.)\s*\d+,\s*№\s*\d+', reference):
+        if MLA_JOURNAL_RE.search(reference):
             ref_type = "Журнальная статья"
-        elif re.search(r'(?:vol\.|т\.)\s*\d+,\s*\d{4},\s*(?:pp\.|с\.)\s*\d+(?:–\d+)?\.\s*https?://', reference):
+        elif MLA_ONLINE_JOURNAL_RE.search(reference):
             ref_type = "Интернет-журнал"
-        elif re.search(r',\s*\d{1,2}\s+[А-Яа-яA-Za-zЁё]+\s+\d{4},', reference):
+        elif MLA_ONLINE_MEDIA_RE.search(reference):
             ref_type = "Статья в онлайн-СМИ"
-        elif re.search(r',\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]+)*,\s*\d{4}$', reference):
+        elif MLA_MONOGRAPH_RE.search(reference):
             ref_type = "Монография"
 
         if subformat and subformat != ref_type:
@@ -158,27 +229,17 @@ def validate_reference_by_style(reference: str, style: str, subformat: str = Non
         return len(errors) == 0, errors, ref_type
 
     elif style == "GOST":
-        # Обновлённая логика для ГОСТ
-        # Определяем тип записи
-        if re.search(r'//\s*.+?\.\s*\d{4}', reference):
-            if re.search(r'\(в\s*печати\)', reference):
-                ref_type = "Статья в печати"
-            elif re.search(r'URL:\s*https?://.+?\s*\(дата\s*обращения:', reference):
-                ref_type = "Онлайн-статья"
-            else:
-                ref_type = "Статья в журнале"
-        elif re.search(r'под\s*ред\.', reference):
-            ref_type = "Материалы конференций"
-        else:
-            ref_type = "Книга"
+        # Запись разбирается один раз: найденные поля и пометки определяют тип и проверяются
+        normalized = ' '.join(reference.split())
+        scan = scan_gost_fields(normalized)
+        ref_type = detect_gost_type(scan)
 
         if subformat and subformat != ref_type:
             errors.append(f"Ссылка не соответствует типу '{subformat}': определённый тип — '{ref_type}'")
             return False, errors, ref_type
 
         # Извлекаем поля
-        fields = extract_gost_fields(reference, ref_type)
-        logger.info(f"Validating reference '{reference}' with fields: {fields}")
+        fields = extract_gost_fields(normalized, ref_type, scan)
 
         # Проверяем обязательные поля
         if ref_type in GOST_REQUIREMENTS:
@@ -191,32 +252,35 @@ def validate_reference_by_style(reference: str, style: str, subformat: str = Non
                     errors.append(f"Отсутствует обязательное поле для '{ref_type}': {field}")
 
         # Дополнительные проверки формата
-        if "year" in fields and not re.match(r'\d{4}', fields["year"]):
+        if "year" in fields and not GOST_YEAR_FORMAT_RE.match(fields["year"]):
             errors.append("Год должен быть в формате четырёх цифр (например, '1980')")
-        if "pages" in fields and not re.match(r'\d+\s*с\.?', fields["pages"]):
+        if "pages" in fields and not GOST_PAGES_FORMAT_RE.match(fields["pages"]):
             errors.append("Страницы должны быть в формате '120 с.' или '120с.'")
 
-        logger.info(f"Validation result: is_valid={len(errors) == 0}, errors={errors}, ref_type={ref_type}")
+        trace(logger, "Validation result: is_valid=%s, errors=%s, ref_type=%s", len(errors) == 0, errors, ref_type)
         return len(errors) == 0, errors, ref_type
 
     else:
         return True, [], "Не определён"
 
-def validate_references(references: List[str], style: str, subformat: str = None) -> Tuple[List[Tuple[str, str, str]], List[Dict[str, str]]]:
+def validate_references(references: List[str], style: str, subformat: str = None) -> Tuple[List[Tuple[str, str, str, int]], List[Dict[str, str]]]:
     """
     Разделение ссылок на валидные и невалидные по заданному стилю и типу записи.
     Возвращает кортеж (валидные ссылки, невалидные ссылки).
+    Каждая запись хранит свой порядковый номер в исходном списке (index),
+    чтобы клиенты могли восстановить порядок при параллельной обработке.
     """
-    logger.info(f"Validating references with style={style}, subformat={subformat}")
+    started = time.perf_counter()
     valid = []
     invalid = []
-    for ref in references:
+    for index, ref in enumerate(references):
         is_valid, errors, ref_type = validate_reference_by_style(ref, style, subformat)
-        logger.info(f"Reference: {ref}, is_valid: {is_valid}, ref_type: {ref_type}, errors: {errors}")
+        trace(logger, "Reference: %s, is_valid: %s, ref_type: %s, errors: %s", ref, is_valid, ref_type, errors)
         if is_valid:
-            valid.append((ref, "", ref_type))
+            valid.append((ref, "", ref_type, index))
         else:
-            invalid.append({"original": ref, "errors": errors, "type": ref_type})
-    logger.info(f"Valid references: {valid}")
-    logger.info(f"Invalid references: {invalid}")
+            invalid.append({"original": ref, "errors": errors, "type": ref_type, "index": index})
+    # Вместо полных списков — одна итоговая запись со счётчиками и временем
+    log_summary(logger, "validate_references", style=style, subformat=subformat, total=len(references),
+                valid=len(valid), invalid=len(invalid), elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
     return valid, invalid
\ No newline at end of file
@@ -1,8 +1,11 @@
 #backend/tavily_search
 import os
-from tavily import TavilyClient
+import asyncio
 import logging
+import httpx
+from tavily import AsyncTavilyClient
 from dotenv import load_dotenv
+from backend.cache import LRUCache, normalize_reference
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -13,24 +16,128 @@ logger = logging.getLogger(__name__)
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not TAVILY_API_KEY:
+# Альтернативный поисковый сервер с API, совместимым с Tavily /search (например, локальный фейк для тестов)
+SEARCH_BACKEND_URL = os.getenv("SEARCH_BACKEND_URL")
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "30"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+
+if not TAVILY_API_KEY and not SEARCH_BACKEND_URL:
     raise ValueError("TAVILY_API_KEY не найден в переменных окружения.")
 
-client = TavilyClient(api_key=TAVILY_API_KEY)
+
+def _first_url(response: dict):
+    results = response.get("results") or []
+    return results[0].get("url") if results else None
+
+
+class TavilySearchBackend:
+    """Поиск через асинхронный клиент Tavily."""
+
+    def __init__(self, api_key: str):
+        self.client = AsyncTavilyClient(api_key=api_key)
+
+    async def search(self, query: str):
+        response = await self.client.search(query=query, search_depth="basic", max_results=1,
+                                            timeout=SEARCH_TIMEOUT)
+        return _first_url(response)
+
+    async def close(self) -> None:
+        pass
+
+
+class HTTPSearchBackend:
+    """Поиск через HTTP-сервер, принимающий POST {base_url}/search в формате Tavily."""
+
+    def __init__(self, base_url: str, api_key: str = None):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(base_url=base_url.rstrip("/"), headers=headers, timeout=SEARCH_TIMEOUT)
+
+    async def search(self, query: str):
+        response = await self.client.post("/search", json={
+            "query": query, "search_depth": "basic", "max_results": 1
+        })
+        response.raise_for_status()
+        return _first_url(response.json())
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+_backend = None
+# Кэш запрос → URL; пустая строка означает «ничего не найдено»
+_cache = LRUCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+# Выполняющиеся запросы: одинаковые запросы ждут один общий вызов
+_inflight = {}
+_stats = {"hits": 0, "coalesced": 0, "upstream_calls": 0, "errors": 0}
+
+
+def get_search_backend():
+    """Возвращает текущий поисковый бэкенд (создаётся лениво по настройкам окружения)."""
+    global _backend
+    if _backend is None:
+        if SEARCH_BACKEND_URL:
+            _backend = HTTPSearchBackend(SEARCH_BACKEND_URL, TAVILY_API_KEY)
+            logger.info("Поиск через HTTP-бэкенд: %s", SEARCH_BACKEND_URL)
+        else:
+            _backend = TavilySearchBackend(TAVILY_API_KEY)
+    return _backend
+
+
+def set_search_backend(backend) -> None:
+    """Подменяет поисковый бэкенд (объект с async search(query) и async close()) и сбрасывает кэш."""
+    global _backend
+    _backend = backend
+    _cache.clear()
+
+
+async def close_search_backend() -> None:
+    """Закрывает поисковый бэкенд (при остановке приложения)."""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def search_stats() -> dict:
+    return dict(_stats, entries=len(_cache), inflight=len(_inflight))
+
+
+async def _search_upstream(key: str, query: str):
+    _stats["upstream_calls"] += 1
+    try:
+        url = await get_search_backend().search(query)
+    except Exception as e:
+        # Ошибки не кэшируются: следующий такой же запрос снова пойдёт к поисковику
+        _stats["errors"] += 1
+        logger.error(f"Ошибка при поиске через Tavily: {e}")
+        return None
+    _cache.set(key, url or "")
+    if url:
+        logger.info(f"Найден URL через Tavily: {url}")
+    else:
+        logger.warning(f"Результаты поиска для '{query}' не найдены.")
+    return url
+
 
 async def search_reference(query: str) -> str:
     """
     Выполняет поиск через Tavily по заданному запросу и возвращает первый релевантный URL.
+    Результаты кэшируются (LRU + TTL), одновременные одинаковые запросы
+    объединяются в один вызов поисковика.
     """
-    try:
-        response = client.search(query=query, search_depth="basic", max_results=1)
-        if response.get("results") and len(response["results"]) > 0:
-            url = response["results"][0]["url"]
-            logger.info(f"Найден URL через Tavily: {url}")
-            return url
-        else:
-            logger.warning(f"Результаты поиска для '{query}' не найдены.")
-            return None
-    except Exception as e:
-        logger.error(f"Ошибка при поиске через Tavily: {e}")
-        return None
\ No newline at end of file
+    key = normalize_reference(query)
+    cached = _cache.get(key)
+    if cached is not None:
+        _stats["hits"] += 1
+        return cached or None
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_search_upstream(key, query))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+    # shield: отмена одного из ожидающих не отменяет общий запрос
+    return await asyncio.shield(task)
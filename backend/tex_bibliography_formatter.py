@@ -1,18 +1,11 @@
 # backend/tex_bibliography_formatter.py
 
-import openai
 import logging
 import re
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
+from collections import Counter
+from backend.llm_client import chat_completion
+from backend.cache import make_key
+from backend.bulk_extractor import extract_fields_bulk
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -37,39 +30,33 @@ note: ...
 Если какого-то поля нет, пропусти его.
 Запись: "{reference}" """
 
-def format_reference_to_bibtex_with_ai(reference: str, target_format: str, subformat: str) -> str:
-    """
-    Формирует библиографическую запись в BibTeX-формате с помощью нейросети.
-    Извлекает любые доступные данные и строит запись динамически, даже если данные неполные.
-    """
-
-    # Ожидаемые структуры для подсказок
-    expected_structures = {
-        "APA": {
-            "Журнальная статья": "Фамилия, И. О., & Фамилия, И. О. (Год). Название статьи. Название журнала, том(номер), страницы. DOI",
-            "Онлайн-журнал": "Фамилия, И. О. (Год). Название статьи. Название журнала, (номер), страницы. Retrieved from URL",
-            "Сетевое издание": "Фамилия, И. О. (Год, Month Day). Название статьи. Название сайта. Retrieved from URL",
-            "Книга": "Фамилия, И. О. (Год). Название книги. Город: Издательство"
-        },
-        "GOST": {
-            "Статья в журнале": "Фамилия И.О. Название статьи // Журнал. Год. Т. X. № Y. С. Z–Z. DOI/URL",
-            "Книга": "Фамилия И.О. Название. Место: Издательство, Год. Кол-во страниц",
-            "Материалы конференций": "Название / под ред. Фамилия И.О. Место: Издательство, Год. Кол-во страниц",
-            "Статья в печати": "Фамилия И.О. Название // Журнал. Год. Т. X. № Y (в печати)",
-            "Онлайн-статья": "Фамилия И.О. Название // Журнал. Год. URL: ... (дата обращения: ДД.ММ.ГГГГ)"
-        },
-        "MLA": {
-            "Журнальная статья": 'Фамилия, Имя и Имя Фамилия. "Название статьи." Название журнала, т. X, № Y, Год, с. Z–Z. DOI/URL',
-            "Интернет-журнал": 'Фамилия, Имя. "Название статьи." Название журнала, т. X, Год, с. Z–Z. URL',
-            "Статья в онлайн-СМИ": 'Фамилия, Имя. "Название статьи." Название сайта, День Месяц Год, URL',
-            "Монография": "Фамилия, Имя. Название книги. Место, Издательство, Год"
-        }
+# Ожидаемые структуры для подсказок
+EXPECTED_STRUCTURES = {
+    "APA": {
+        "Журнальная статья": "Фамилия, И. О., & Фамилия, И. О. (Год). Название статьи. Название журнала, том(номер), страницы. DOI",
+        "Онлайн-журнал": "Фамилия, И. О. (Год). Название статьи. Название журнала, (номер), страницы. Retrieved from URL",
+        "Сетевое издание": "Фамилия, И. О. (Год, Month Day). Название статьи. Название сайта. Retrieved from URL",
+        "Книга": "Фамилия, И. О. (Год). Название книги. Город: Издательство"
+    },
+    "GOST": {
+        "Статья в журнале": "Фамилия И.О. Название статьи // Журнал. Год. Т. X. № Y. С. Z–Z. DOI/URL",
+        "Книга": "Фамилия И.О. Название. Место: Издательство, Год. Кол-во страниц",
+        "Материалы конференций": "Название / под ред. Фамилия И.О. Место: Издательство, Год. Кол-во страниц",
+        "Статья в печати": "Фамилия И.О. Название // Журнал. Год. Т. X. № Y (в печати)",
+        "Онлайн-статья": "Фамилия И.О. Название // Журнал. Год. URL: ... (дата обращения: ДД.ММ.ГГГГ)"
+    },
+    "MLA": {
+        "Журнальная статья": 'Фамилия, Имя и Имя Фамилия. "Название статьи." Название журнала, т. X, № Y, Год, с. Z–Z. DOI/URL',
+        "Интернет-журнал": 'Фамилия, Имя. "Название статьи." Название журнала, т. X, Год, с. Z–Z. URL',
+        "Статья в онлайн-СМИ": 'Фамилия, Имя. "Название статьи." Название сайта, День Месяц Год, URL',
+        "Монография": "Фамилия, Имя. Название книги. Место, Издательство, Год"
     }
+}
 
-    # Промпты для извлечения данных
-    prompt_templates = {
-        "APA": {
-            "Журнальная статья": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из библиографической записи и верни их в формате:
+# Промпты для извлечения данных
+PROMPT_TEMPLATES = {
+    "APA": {
+        "Журнальная статья": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из библиографической записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -89,7 +76,7 @@ publisher: Просвещение
 address: М.
 pages: 400
 Запись: "{reference}" """,
-            "Онлайн-журнал": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Онлайн-журнал": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -99,7 +86,7 @@ pages: ...
 url: ...
 Если какого-то поля нет, пропусти его.
 Запись: "{reference}" """,
-            "Сетевое издание": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Сетевое издание": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 year: ...
@@ -110,7 +97,7 @@ url: ...
 note: ...
 Если какого-то поля нет, пропусти его.
 Запись: "{reference}" """,
-            "Книга": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Книга": """Ты — эксперт по APA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ... (или editor: ..., если есть "Под ред.")
 title: ...
 year: ...
@@ -119,9 +106,9 @@ address: ...
 pages: ...
 Если какого-то поля нет, пропусти его.
 Запись: "{reference}" """
-        },
-        "GOST": {
-            "Статья в журнале": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+    },
+    "GOST": {
+        "Статья в журнале": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -143,7 +130,7 @@ number: 3
 year: 1980
 pages: 45–50
 Запись: "{reference}" """,
-            "Книга": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Книга": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 year: ...
@@ -161,7 +148,7 @@ publisher: Наука
 address: М.
 pages: 120
 Запись: "{reference}" """,
-            "Материалы конференций": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Материалы конференций": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 editor: ...
 title: ...
 year: ...
@@ -179,7 +166,7 @@ publisher: Наука
 address: М.
 pages: 200
 Запись: "{reference}" """,
-            "Статья в печати": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Статья в печати": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -199,7 +186,7 @@ number: 3
 year: 1980
 note: в печати
 Запись: "{reference}" """,
-            "Онлайн-статья": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Онлайн-статья": """Ты — эксперт по ГОСТ и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -217,9 +204,9 @@ year: 1980
 url: http://example.com
 note: дата обращения: 01.01.2025
 Запись: "{reference}" """,
-        },
-        "MLA": {
-            "Журнальная статья": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+    },
+    "MLA": {
+        "Журнальная статья": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -241,7 +228,7 @@ number: 3
 year: 1980
 pages: 45–50
 Запись: "{reference}" """,
-            "Интернет-журнал": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Интернет-журнал": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 journal: ...
@@ -261,7 +248,7 @@ year: 1980
 pages: 45–50
 url: http://example.com
 Запись: "{reference}" """,
-            "Статья в онлайн-СМИ": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Статья в онлайн-СМИ": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 publisher: ...
@@ -281,7 +268,7 @@ month: января
 day: 1
 url: http://example.com
 Запись: "{reference}" """,
-            "Монография": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
+        "Монография": """Ты — эксперт по MLA и BibTeX. Извлеки любые доступные данные из записи и верни их в формате:
 author: ...
 title: ...
 publisher: ...
@@ -297,75 +284,99 @@ publisher: Наука
 address: Москва
 year: 1980
 Запись: "{reference}" """,
-        }
     }
+}
 
-    # BibTeX-типы для каждого подформата
-    bibtex_types = {
-        "APA": {
-            "Журнальная статья": "article",
-            "Онлайн-журнал": "article",
-            "Сетевое издание": "misc",
-            "Книга": "book"
-        },
-        "GOST": {
-            "Статья в журнале": "article",
-            "Книга": "book",
-            "Материалы конференций": "inproceedings",
-            "Статья в печати": "article",
-            "Онлайн-статья": "article"
-        },
-        "MLA": {
-            "Журнальная статья": "article",
-            "Интернет-журнал": "article",
-            "Статья в онлайн-СМИ": "misc",
-            "Монография": "book"
-        }
+# BibTeX-типы для каждого подформата
+BIBTEX_TYPES = {
+    "APA": {
+        "Журнальная статья": "article",
+        "Онлайн-журнал": "article",
+        "Сетевое издание": "misc",
+        "Книга": "book"
+    },
+    "GOST": {
+        "Статья в журнале": "article",
+        "Книга": "book",
+        "Материалы конференций": "inproceedings",
+        "Статья в печати": "article",
+        "Онлайн-статья": "article"
+    },
+    "MLA": {
+        "Журнальная статья": "article",
+        "Интернет-журнал": "article",
+        "Статья в онлайн-СМИ": "misc",
+        "Монография": "book"
     }
+}
 
-    # Поля для каждого типа BibTeX-записи
-    # Полностью покрывает все подформаты APA, GOST, MLA согласно спецификации
-    bibtex_fields = {
-        "article": [
-            "author", "title", "journal", "volume", "number", "year", "pages", "doi", "url", "note"
-        ],  # Для APA: Журнальная статья, Онлайн-журнал; GOST: Статья в журнале, Статья в печати, Онлайн-статья; MLA: Журнальная статья, Интернет-журнал
-        "book": [
-            "author", "editor", "title", "year", "publisher", "address", "pages"
-        ],  # Для APA: Книга; GOST: Книга; MLA: Монография
-        "misc": [
-            "author", "title", "year", "month", "day", "publisher", "url", "note"
-        ],  # Для APA: Сетевое издание; MLA: Статья в онлайн-СМИ
-        "inproceedings": [
-            "editor", "title", "year", "publisher", "address", "pages"
-        ]  # Для GOST: Материалы конференций
-    }
+# Поля для каждого типа BibTeX-записи
+# Полностью покрывает все подформаты APA, GOST, MLA согласно спецификации
+BIBTEX_FIELDS = {
+    "article": [
+        "author", "title", "journal", "volume", "number", "year", "pages", "doi", "url", "note"
+    ],  # Для APA: Журнальная статья, Онлайн-журнал; GOST: Статья в журнале, Статья в печати, Онлайн-статья; MLA: Журнальная статья, Интернет-журнал
+    "book": [
+        "author", "editor", "title", "year", "publisher", "address", "pages"
+    ],  # Для APA: Книга; GOST: Книга; MLA: Монография
+    "misc": [
+        "author", "title", "year", "month", "day", "publisher", "url", "note"
+    ],  # Для APA: Сетевое издание; MLA: Статья в онлайн-СМИ
+    "inproceedings": [
+        "editor", "title", "year", "publisher", "address", "pages"
+    ]  # Для GOST: Материалы конференций
+}
+
+def build_bibtex_entry(data: dict, target_format: str, subformat: str, key: str = None) -> str:
+    """
+    Строит BibTeX-запись из словаря полей: тип по подформату, только заполненные поля
+    этого типа, предупреждение-комментарий о недостающих обязательных полях.
+    """
+    bibtex_type = BIBTEX_TYPES.get(target_format, {}).get(subformat)
+    if not bibtex_type:
+        return f"Ошибка: тип BibTeX для {target_format} {subformat} не найден."
+    possible_fields = BIBTEX_FIELDS.get(bibtex_type, [])
+
+    # Динамическое построение BibTeX
+    bibtex_lines = [f"@{bibtex_type}{{{key or generate_bibtex_key(data)},"]
+    for field in possible_fields:
+        if field in data and data[field]:
+            bibtex_lines.append(f"  {field} = \"{{{data[field]}}}\",")
+    bibtex_lines[-1] = bibtex_lines[-1].rstrip(",")  # Убираем последнюю запятую
+    bibtex_lines.append("}")
 
+    bibtex_entry = "\n".join(bibtex_lines)
+
+    # Проверка полноты данных
+    required_fields = [f for f in possible_fields if f not in {"doi", "url", "note", "month", "day"}]
+    missing_fields = [f for f in required_fields if f not in data or not data[f]]
+    if missing_fields:
+        warning = (
+            f"Предупреждение: неполные данные. Отсутствуют поля: {', '.join(missing_fields)}.\n"
+            f"Ожидаемая структура для {target_format} ({subformat}):\n{EXPECTED_STRUCTURES[target_format][subformat]}"
+        )
+        bibtex_entry += f"\n% {warning}"
+    return bibtex_entry
+
+async def format_reference_to_bibtex_with_ai(reference: str, target_format: str, subformat: str) -> str:
+    """
+    Формирует библиографическую запись в BibTeX-формате с помощью нейросети.
+    Извлекает любые доступные данные и строит запись динамически, даже если данные неполные.
+    """
     target_format = target_format.upper()
 
     # Подготовка промпта
-    if target_format not in prompt_templates:
-        prompt_templates[target_format] = {}
-    if subformat not in prompt_templates[target_format]:
-        prompt_templates[target_format][subformat] = GENERIC_PROMPT
+    prompt_template = PROMPT_TEMPLATES.get(target_format, {}).get(subformat, GENERIC_PROMPT)
+    prompt = prompt_template.format(reference=reference)
 
-    prompt = prompt_templates[target_format][subformat].format(reference=reference)
-
-    bibtex_type = bibtex_types.get(target_format, {}).get(subformat)
-    if not bibtex_type:
+    if not BIBTEX_TYPES.get(target_format, {}).get(subformat):
         return f"Ошибка: тип BibTeX для {target_format} {subformat} не найден."
 
-    possible_fields = bibtex_fields.get(bibtex_type, [])
-
-    # Инициализация клиента OpenAI
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            timeout=300
+        raw_response = await chat_completion(
+            prompt, timeout=300,
+            cache_key=make_key(prompt_template, reference, target_format, subformat)
         )
-        raw_response = response.choices[0].message.content.strip()
         logger.info("Полный ответ нейросети: %s", raw_response)
 
         # Парсинг ответа в словарь
@@ -376,37 +387,15 @@ year: 1980
                 data[key.strip()] = value.strip()
 
         if not data:
-            return f"Ошибка: не удалось извлечь данные из записи.\nОжидаемая структура для {target_format} ({subformat}):\n{expected_structures[target_format][subformat]}"
-
-        # Генерация ключа
-        key = generate_bibtex_key(data)
-
-        # Динамическое построение BibTeX
-        bibtex_lines = [f"@{bibtex_type}{{{key},"]
-        for field in possible_fields:
-            if field in data and data[field]:
-                bibtex_lines.append(f"  {field} = \"{{{data[field]}}}\",")
-        bibtex_lines[-1] = bibtex_lines[-1].rstrip(",")  # Убираем последнюю запятую
-        bibtex_lines.append("}")
-
-        bibtex_entry = "\n".join(bibtex_lines)
-
-        # Проверка полноты данных
-        required_fields = [f for f in possible_fields if f not in {"doi", "url", "note", "month", "day"}]
-        missing_fields = [f for f in required_fields if f not in data or not data[f]]
-        if missing_fields:
-            warning = (
-                f"Предупреждение: неполные данные. Отсутствуют поля: {', '.join(missing_fields)}.\n"
-                f"Ожидаемая структура для {target_format} ({subformat}):\n{expected_structures[target_format][subformat]}"
-            )
-            bibtex_entry += f"\n% {warning}"
+            return f"Ошибка: не удалось извлечь данные из записи.\nОжидаемая структура для {target_format} ({subformat}):\n{EXPECTED_STRUCTURES[target_format][subformat]}"
 
+        bibtex_entry = build_bibtex_entry(data, target_format, subformat)
         logger.info("Сформированная BibTeX-запись: %s", bibtex_entry)
         return bibtex_entry
 
     except Exception as e:
         logger.error("Ошибка при работе с нейросетью: %s", str(e))
-        return f"Ошибка AI-сервиса: {str(e)}\nОжидаемая структура для {target_format} ({subformat}):\n{expected_structures[target_format][subformat]}"
+        return f"Ошибка AI-сервиса: {str(e)}\nОжидаемая структура для {target_format} ({subformat}):\n{EXPECTED_STRUCTURES[target_format][subformat]}"
 
 def generate_bibtex_key(data: dict) -> str:
     if "author" in data:
@@ -422,5 +411,38 @@ def generate_bibtex_key(data: dict) -> str:
         year = data.get("year", "nodate")
         return f"{'_'.join(title_words).lower()}{year}" if title_words else f"unknown{year}"
 
-def format_reference_to_tex(reference: str, target_format: str, subformat: str) -> str:
-    return format_reference_to_bibtex_with_ai(reference, target_format, subformat)
\ No newline at end of file
+async def format_reference_to_tex(reference: str, target_format: str, subformat: str) -> str:
+    return await format_reference_to_bibtex_with_ai(reference, target_format, subformat)
+
+def unique_bibtex_keys(records: list) -> list:
+    """Ключи для набора записей; совпадающие ключи различаются суффиксами a, b, c… (ivanov2022a)."""
+    keys = [generate_bibtex_key(data) for data in records]
+    totals = Counter(keys)
+    seen = Counter()
+    unique = []
+    for key in keys:
+        if totals[key] > 1:
+            number = seen[key]
+            seen[key] += 1
+            key += chr(ord("a") + number) if number < 26 else str(number + 1)
+        unique.append(key)
+    return unique
+
+async def format_references_to_tex(references: list, target_format: str, subformat: str) -> list:
+    """
+    BibTeX-записи для списка ссылок (в исходном порядке) с уникальными ключами.
+    Поля извлекаются пакетно (backend.bulk_extractor), а не отдельным запросом на каждую ссылку.
+    """
+    target_format = target_format.upper()
+    if not BIBTEX_TYPES.get(target_format, {}).get(subformat):
+        return [f"Ошибка: тип BibTeX для {target_format} {subformat} не найден."] * len(references)
+
+    records = await extract_fields_bulk(references)
+    keys = unique_bibtex_keys(records)
+    entries = []
+    for reference, data, key in zip(references, records, keys):
+        if not data:
+            entries.append(f"% Error for reference '{reference}': не удалось извлечь данные из записи")
+        else:
+            entries.append(build_bibtex_entry(data, target_format, subformat, key))
+    return entries
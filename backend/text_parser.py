@@ -1,24 +1,79 @@
 # backend/text_parser.py
 import re
 
+# Граница нумерованной записи: «\n12. ». Не больше трёх цифр — год в начале перенесённой строки («\n2020. Т. 5») не граница
+REFERENCE_BOUNDARY_RE = re.compile(r'\n\d{1,3}\.\s')
+# Сколько символов конца буфера просматривается повторно: граница может прийти разрезанной между фрагментами
+_BOUNDARY_LOOKBACK = 6
+# Записи короче — обрывки, а не ссылки
+MIN_REFERENCE_LENGTH = 5
+
+_HYPHENATION_RE = re.compile(r'-\n\s*')
+_GLUED_WORDS_RE = re.compile(r'(?<=[a-zа-яё])(?=[A-ZА-ЯЁ])')
+
+
 def clean_multiline_refs(ref):
+    """
+    Нормализация записи из текста документа: склейка переносов («почв-\\nвенных»),
+    пробел между склеенными словами («ПетровП.») и схлопывание пробелов и переводов строк.
+    """
+    if '-\n' in ref:
+        ref = _HYPHENATION_RE.sub('', ref)
+    return ' '.join(_GLUED_WORDS_RE.sub(' ', ref).split())
+
+
+class ReferenceTokenizer:
+    """
+    Инкрементальное разбиение списка литературы на ссылки по нумерации «N. ».
+    feed(фрагмент) возвращает ссылки, завершённые этим фрагментом (следующая граница
+    уже пришла), finish() — последнюю. Граница, разрезанная между фрагментами
+    (страницами), распознаётся; номер отбрасывается, запись нормализуется.
+    """
+
+    def __init__(self):
+        # Начало текста считается началом строки: номер первой записи тоже отделяется
+        self._buffer = "\n"
+        self._scanned = 0
+
+    def _emit(self, piece: str) -> list:
+        reference = clean_multiline_refs(piece)
+        return [reference] if len(reference) > MIN_REFERENCE_LENGTH else []
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        references = []
+        start = 0
+        for match in REFERENCE_BOUNDARY_RE.finditer(self._buffer, max(0, self._scanned - _BOUNDARY_LOOKBACK)):
+            references += self._emit(self._buffer[start:match.start()])
+            start = match.end()
+        # В буфере остаётся только незавершённая запись
+        self._buffer = self._buffer[start:]
+        self._scanned = len(self._buffer)
+        return references
+
+    def finish(self) -> list:
+        references = self._emit(self._buffer)
+        self._buffer, self._scanned = "", 0
+        return references
+
+
+def iter_references(chunks):
+    """Ссылки из последовательности фрагментов текста (например, страниц PDF) по мере их поступления."""
+    tokenizer = ReferenceTokenizer()
+    for chunk in chunks:
+        yield from tokenizer.feed(chunk)
+    yield from tokenizer.finish()
 
-    ref = re.sub(r'-\n\s*', '', ref)
-    ref = re.sub(r'(?<=[a-zа-яё])(?=[A-ZА-ЯЁ])', ' ', ref)
-    ref = re.sub(r'\n+', ' ', ref)
-    ref = re.sub(r'\s+', ' ', ref)
-    return ref.strip()
 
 def split_references_from_text(bibliography_text):
 
     # Попытка разделить текст по шаблону "Пример оформления..."
     references = re.split(r'Пример оформления.*?:\s*\d+\s*', bibliography_text)
-    
-    # Если разделение по шаблону "Пример оформления" не дало результата, пробуем по нумерации
+
+    # Если разделение по шаблону "Пример оформления" не дало результата, разбиваем по нумерации
     if len(references) <= 1:
-        references = re.split(r'\n\d+\.\s', bibliography_text)
-    
+        return list(iter_references([bibliography_text]))
+
     # Фильтрация пустых элементов и очистка каждой записи
-    references = [clean_multiline_refs(ref) for ref in references if len(ref.strip()) > 5]
+    references = [clean_multiline_refs(ref) for ref in references if len(ref.strip()) > MIN_REFERENCE_LENGTH]
     return references
-
@@ -0,0 +1,213 @@
+# backend/uploads.py
+import io
+import os
+import sys
+import hashlib
+import tempfile
+import logging
+from typing import Optional
+from backend.executor import run_blocking
+
+try:
+    import resource
+except ImportError:  # Windows: модуля resource нет, пиковая память процесса не измеряется
+    resource = None
+
+# Максимальный размер загружаемого файла (байт): больше — ответ 413 до разбора
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Файлы больше порога (байт) сбрасываются во временный файл на диске, меньше — остаются в памяти
+# (для файлов, полученных ботом; загрузки HTTP во временный файл сбрасывает Starlette)
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(2 * 1024 * 1024)))
+# Размер порции чтения загрузки (байт) и каталог временных файлов (по умолчанию системный)
+UPLOAD_READ_CHUNK = int(os.getenv("UPLOAD_READ_CHUNK", str(1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    """Загрузка превышает UPLOAD_MAX_BYTES."""
+
+    def __init__(self, size: int):
+        super().__init__(f"Файл больше допустимых {round(UPLOAD_MAX_BYTES / (1024 * 1024), 1):g} МБ")
+        self.size = size
+
+
+def content_length_exceeds(headers) -> bool:
+    """Проверка по заголовку Content-Length — до чтения и разбора тела запроса."""
+    try:
+        return int(headers.get("content-length", "0")) > UPLOAD_MAX_BYTES
+    except ValueError:
+        return False
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Пиковый объём памяти процесса (КБ) или None, если измерить нельзя (Windows)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss в macOS — в байтах, в Linux — в килобайтах
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class SpooledUpload:
+    """
+    Загруженный файл: в памяти, пока меньше UPLOAD_SPOOL_THRESHOLD, затем — во временном
+    файле на диске. Файл на диске открывается по пути (open() возвращает файловый объект
+    с name = путь), поэтому разбор PDF в пуле процессов читает страницы прямо из файла,
+    а не получает копию байтов. Временный файл удаляется при close() / выходе из with.
+    По мере приёма считается SHA-256 содержимого — ключ кэша разобранных документов.
+    Если передан source (файл загрузки, уже принятый Starlette), содержимое не копируется:
+    open() возвращает сам source, а размер и SHA-256 считаются при его чтении (read_source).
+    """
+
+    def __init__(self, filename: str, source=None):
+        self.filename = filename
+        self.size = 0
+        self.path = None
+        self._buffer = None if source is not None else io.BytesIO()
+        self._file = None
+        self._source = source
+        self._digest = hashlib.sha256()
+        self._peak_rss_start = peak_rss_kb()
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def storage(self) -> str:
+        if self._source is not None:
+            # SpooledTemporaryFile Starlette: _rolled — содержимое уже сброшено на диск
+            return "disk" if getattr(self._source, "_rolled", False) else "memory"
+        return "disk" if self.path else "memory"
+
+    @property
+    def memory_bytes(self) -> int:
+        """Байт загрузки, удерживаемых в памяти процесса."""
+        return 0 if self.storage == "disk" else self.size
+
+    @property
+    def peak_rss_growth_kb(self) -> Optional[int]:
+        """Насколько вырос пиковый объём памяти процесса (КБ) с начала приёма загрузки."""
+        peak = peak_rss_kb()
+        if peak is None or self._peak_rss_start is None:
+            return None
+        return peak - self._peak_rss_start
+
+    def read_source(self) -> None:
+        """Один последовательный проход по source: размер (с проверкой UPLOAD_MAX_BYTES) и SHA-256."""
+        self._source.seek(0)
+        while True:
+            chunk = self._source.read(UPLOAD_READ_CHUNK)
+            if not chunk:
+                break
+            self.size += len(chunk)
+            if self.size > UPLOAD_MAX_BYTES:
+                raise UploadTooLarge(self.size)
+            self._digest.update(chunk)
+        self._source.seek(0)
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise UploadTooLarge(self.size)
+        self._digest.update(chunk)
+        if self._file is None and self.size > UPLOAD_SPOOL_THRESHOLD:
+            suffix = os.path.splitext(self.filename)[-1].lower()
+            self._file = tempfile.NamedTemporaryFile(prefix="cyberref-upload-", suffix=suffix,
+                                                     dir=UPLOAD_SPOOL_DIR, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def open(self):
+        """Файловый объект для разбора (с начала файла)."""
+        if self._source is not None:
+            self._source.seek(0)
+            return self._source
+        if self.path:
+            return open(self.path, "rb")
+        self._buffer.seek(0)
+        return self._buffer
+
+    def close(self) -> None:
+        self.finish()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                logger.warning("Не удалось удалить временный файл загрузки %s", self.path)
+            self.path = None
+        self._buffer = None
+        # Файл загрузки Starlette закрывает сам по окончании запроса
+        self._source = None
+
+    def metrics(self) -> dict:
+        metrics = {"upload_bytes": self.size, "upload_storage": self.storage,
+                   "upload_memory_bytes": self.memory_bytes}
+        growth = self.peak_rss_growth_kb
+        if growth is not None:
+            metrics["peak_rss_growth_kb"] = growth
+        return metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def receive_upload(file) -> SpooledUpload:
+    """
+    SpooledUpload поверх UploadFile без копирования: Starlette уже принял файл в свой
+    SpooledTemporaryFile (большие — на диск), разбор читает его же. Один проход порциями
+    по UPLOAD_READ_CHUNK в пуле потоков считает размер и SHA-256; превышение
+    UPLOAD_MAX_BYTES прерывает чтение (UploadTooLarge).
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(size)
+    upload = SpooledUpload(file.filename or "", file.file)
+    try:
+        await run_blocking(upload.read_source)
+    except BaseException:
+        upload.close()
+        raise
+    return upload
+
+
+def spool_bytes(data: bytes, filename: str) -> SpooledUpload:
+    """SpooledUpload из уже полученных байтов (например, файла, скачанного ботом)."""
+    upload = SpooledUpload(filename)
+    try:
+        upload.write(bytes(data))
+        upload.finish()
+    except BaseException:
+        upload.close()
+        raise
+    return upload
+
+
+def upload_headers(upload: SpooledUpload) -> dict:
+    """Метрики загрузки и памяти в заголовках ответа."""
+    headers = {
+        "X-Upload-Bytes": str(upload.size),
+        "X-Upload-Storage": upload.storage,
+        "X-Upload-Memory-Bytes": str(upload.memory_bytes),
+    }
+    growth = upload.peak_rss_growth_kb
+    if growth is not None:
+        headers["X-Peak-RSS-Growth-KB"] = str(growth)
+    return headers
@@ -1,29 +1,54 @@
 # backend/web_scraper.py
 
 import re
+import os
+import asyncio
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs, unquote
 import pyparsing as pp
-from playwright.async_api import async_playwright
-import openai
 import logging
-from dotenv import load_dotenv
-import os
-# Загрузка переменных окружения
-load_dotenv()
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY не найден в переменных окружения.")
-
-MODEL = "deepseek-chat"
+from backend.llm_client import chat_completion
+from backend.executor import run_blocking
+from backend.browser_pool import browser_pool
+from backend.html_parser import MetaIndex, html_to_text, make_soup, parse_page
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Максимальное ожидание готовности страницы, если метаданных нет в исходном HTML
+SCRAPER_READY_TIMEOUT_MS = int(os.getenv("SCRAPER_READY_TIMEOUT_MS", "5000"))
+
+# Страница готова к извлечению, когда в DOM есть метатеги Highwire/Dublin Core/OG или JSON-LD
+CITATION_READY_JS = """() => !!document.querySelector(
+    'meta[name^="citation_"], meta[name^="dc."], meta[name^="DC."], meta[name^="dcterms."], ' +
+    'meta[property="og:title"], script[type="application/ld+json"]'
+)"""
+
+async def wait_for_citation_ready(page) -> bool:
+    """
+    Ждёт готовности страницы к извлечению данных.
+    Если метатеги уже есть после domcontentloaded — возвращается сразу, иначе ждёт
+    их появления или состояния networkidle, но не дольше SCRAPER_READY_TIMEOUT_MS.
+    Возвращает True, если метаданные найдены.
+    """
+    if await page.evaluate(CITATION_READY_JS):
+        return True
+    waiters = [
+        asyncio.ensure_future(page.wait_for_function(CITATION_READY_JS, timeout=SCRAPER_READY_TIMEOUT_MS)),
+        asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=SCRAPER_READY_TIMEOUT_MS)),
+    ]
+    try:
+        await asyncio.wait(waiters, timeout=SCRAPER_READY_TIMEOUT_MS / 1000,
+                           return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+        # Забираем исключения (таймауты) отменённых ожиданий
+        await asyncio.gather(*waiters, return_exceptions=True)
+    return await page.evaluate(CITATION_READY_JS)
+
 def extract_year_with_pyparsing(text: str) -> str:
     """Извлекает год из текста с помощью pyparsing."""
     year_expr = pp.Word(pp.nums, exact=4)
@@ -35,7 +60,7 @@ def extract_year_with_pyparsing(text: str) -> str:
         pass
     return "Не указано"
 
-def extract_with_neural_network(full_text: str, url: str) -> dict:
+async def extract_with_neural_network(full_text: str, url: str) -> dict:
     """Извлекает библиографические данные с помощью нейросети DeepSeek."""
     logger.info("Передача текста в нейросеть для обработки (первые 6000 символов)")
     prompt = f"""Ты — эксперт по извлечению библиографических данных из текста веб-страниц.
@@ -79,15 +104,8 @@ def extract_with_neural_network(full_text: str, url: str) -> dict:
     Текст страницы:
     "{full_text[:20000]}" """
     
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            timeout=150
-        )
-        result = response.choices[0].message.content.strip()
+        result = await chat_completion(prompt, timeout=150)
         logger.info("Нейросеть вернула результат: %s", result)
 
         # Парсим результат нейросети
@@ -117,14 +135,60 @@ def extract_with_neural_network(full_text: str, url: str) -> dict:
         logger.error("Ошибка при работе с нейросетью: %s", str(e))
         raise ValueError(f"Ошибка нейросети: {e}")
 
-async def extract_bibliographic_data(url: str) -> dict:
-    """Извлекает библиографические данные из веб-страницы асинхронно."""
-    headers = {
-        "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                       "AppleWebKit/537.36 (KHTML, like Gecko) "
-                       "Chrome/108.0.0.0 Safari/537.36")
-    }
+# Поля, без которых результат разбора метатегов считается неполным и требует следующего уровня
+REQUIRED_FIELDS = ("title", "author", "year")
+# Поля, по которым результат вообще считается полезным
+KEY_FIELDS = ("title", "author", "year", "journal", "publisher")
+
+SCRAPER_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                   "AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/108.0.0.0 Safari/537.36")
+}
+
+def has_required_fields(data: dict) -> bool:
+    """Проверяет, что все обязательные поля найдены."""
+    return all(data.get(key, "Не указано") != "Не указано" for key in REQUIRED_FIELDS)
+
+def has_key_fields(data: dict) -> bool:
+    """Проверяет, что найдено хотя бы одно ключевое поле."""
+    return any(data.get(key, "Не указано") != "Не указано" for key in KEY_FIELDS)
+
+def fetch_static_html(url: str) -> str:
+    """Загружает HTML страницы обычным HTTP-запросом (синхронно)."""
+    response = requests.get(url, timeout=10, headers=SCRAPER_HEADERS)
+    response.raise_for_status()
+    return response.text
+
+async def fetch_browser_html(url: str) -> tuple:
+    """Загружает страницу через пул Playwright и возвращает (HTML, итоговый URL)."""
+    async with browser_pool.page() as page:
+        # Следим за редиректами
+        response = await page.goto(url, timeout=40000, wait_until="domcontentloaded")
+        final_url = response.url if response else url
+        await wait_for_citation_ready(page)  # Ожидание метаданных вместо фиксированной паузы
+        html = await page.content()
+    logger.info("Страница успешно загружена через Playwright, final URL: %s", final_url)
+    return html, final_url
+
+def merge_scraped_data(primary: dict, fallback: dict) -> dict:
+    """Дополняет неуказанные поля primary значениями из fallback."""
+    merged = dict(primary)
+    for key, value in fallback.items():
+        if merged.get(key, "Не указано") == "Не указано" and value != "Не указано":
+            merged[key] = value
+    return merged
 
+async def extract_bibliographic_data(url: str) -> dict:
+    """
+    Извлекает библиографические данные из веб-страницы асинхронно.
+    Уровни извлечения, от дешёвого к дорогому:
+    1) "static" — обычный HTTP-запрос и разбор метатегов (citation_*, og:*);
+    2) "browser" — тот же разбор по HTML, отрисованному headless-браузером;
+    3) "llm" — извлечение нейросетью из текста страницы.
+    Следующий уровень используется, только если на предыдущем не найдены обязательные поля.
+    Уровень, давший результат, записывается в поле "tier".
+    """
     # Проверяем, является ли URL страницей авторизации с redirect_uri
     parsed_url = urlparse(url)
     if "idp.springer.com/authorize" in url:
@@ -137,43 +201,71 @@ async def extract_bibliographic_data(url: str) -> dict:
             logger.error("redirect_uri не найден в URL: %s", url)
             raise ValueError("Ошибка: redirect_uri не найден в URL авторизации")
 
-    # Сначала пытаемся через Playwright + нейросеть
-    logger.info("Попытка извлечения данных с помощью Playwright и нейросети для URL: %s", url)
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            # Следим за редиректами
-            response = await page.goto(url, timeout=40000, wait_until="domcontentloaded")
-            final_url = response.url if response else url
-            await page.wait_for_timeout(2000)  # Ожидание загрузки динамического контента
-            full_text = await page.content()
-            await browser.close()
-            logger.info("Страница успешно загружена через Playwright, final URL: %s", final_url)
-
-        neural_data = extract_with_neural_network(BeautifulSoup(full_text, "html.parser").get_text(separator=" ", strip=True), url)
-        if any(neural_data[key] != "Не указано" for key in ["title", "author", "year", "journal", "publisher"]):
-            logger.info("Нейросеть успешно извлекла данные: %s", neural_data)
-            return neural_data
-        else:
-            logger.warning("Нейросеть вернула пустые данные, переход к классическому парсеру")
-    except Exception as e:
-        logger.error("Ошибка в блоке Playwright/нейросети: %s", str(e))
+    partial = None  # лучший неполный результат разбора метатегов
+    page_html = None  # HTML для нейросети, если до неё дойдёт дело
+    errors = []
 
-    # Fallback: классический парсер
-    logger.info("Переход к классическому парсеру для URL: %s", url)
+    # Уровень 1: обычный HTTP-запрос и разбор метатегов
+    logger.info("Извлечение метаданных без браузера для URL: %s", url)
     try:
-        response = requests.get(url, timeout=10, headers=headers)
-        response.raise_for_status()
+        page_html = await run_blocking(fetch_static_html, url)
+        data = await run_blocking(parse_static_html, page_html, url)
+        if has_required_fields(data):
+            data["tier"] = "static"
+            return data
+        partial = dict(data, tier="static")
+        logger.info("В статическом HTML не хватает обязательных полей, переход к браузеру")
     except Exception as e:
+        errors.append(e)
         logger.error("Ошибка при загрузке страницы через requests: %s", str(e))
-        raise ValueError(f"Ошибка при получении страницы: {e}")
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    full_text = soup.get_text(separator=" ", strip=True)
+    # Уровень 2: HTML, отрисованный браузером
+    try:
+        browser_html, final_url = await fetch_browser_html(url)
+        page_html = browser_html
+        data = await run_blocking(parse_static_html, browser_html, url)
+        if has_required_fields(data):
+            data["tier"] = "browser"
+            return data
+        if partial is None or has_key_fields(data):
+            partial = dict(data, tier="browser")
+        logger.info("В HTML браузера не хватает обязательных полей, переход к нейросети")
+    except Exception as e:
+        errors.append(e)
+        logger.error("Ошибка в блоке Playwright: %s", str(e))
 
+    # Уровень 3: нейросеть по тексту страницы
+    if page_html:
+        try:
+            page_text = await run_blocking(html_to_text, page_html)
+            neural_data = await extract_with_neural_network(page_text, url)
+            if has_key_fields(neural_data):
+                logger.info("Нейросеть успешно извлекла данные: %s", neural_data)
+                if partial is not None:
+                    neural_data = merge_scraped_data(neural_data, partial)
+                neural_data["tier"] = "llm"
+                return neural_data
+            logger.warning("Нейросеть вернула пустые данные")
+        except Exception as e:
+            errors.append(e)
+            logger.error("Ошибка в блоке нейросети: %s", str(e))
+
+    if partial is not None and has_key_fields(partial):
+        logger.info("Возвращается неполный результат уровня %s", partial["tier"])
+        return partial
+    last_error = errors[-1] if errors else "данные не найдены"
+    raise ValueError(f"Ошибка при получении страницы: {last_error}")
+
+def parse_static_html(html: str, url: str) -> dict:
+    """
+    Классический парсер: извлекает данные из метатегов и разметки HTML (синхронно).
+    Разбор идёт через backend.html_parser (selectolax/lxml, если установлены);
+    полный DOM BeautifulSoup строится только там, где нужны CSS-селекторы.
+    """
     # Специфичная обработка для eLibrary
     if "elibrary.ru" in url:
+        soup = make_soup(html)
+        full_text = soup.get_text(separator=" ", strip=True)
         logger.info("Обработка данных для eLibrary")
         title_tag = soup.select_one("h1[itemprop='name']") or soup.find("h1") or soup.select_one("div#thepage > h1")
         title = title_tag.text.strip() if title_tag else "Не указано"
@@ -234,161 +326,88 @@ async def extract_bibliographic_data(url: str) -> dict:
             "publisher": publisher, "address": address, "month": month, "day": day, "note": note
         }
 
+    # Метатеги, JSON-LD, <title> и видимый текст — из одного разобранного дерева
+    meta, full_text = parse_page(html)
+
     # Специфичная обработка для Springer
     if "springer.com" in url:
         logger.info("Обработка данных для Springer")
-        title = (soup.find("meta", attrs={"name": "citation_title"})["content"].strip() if soup.find("meta", attrs={"name": "citation_title"}) and soup.find("meta", attrs={"name": "citation_title"}).get("content") else
-                 soup.find("meta", property="og:title")["content"].strip() if soup.find("meta", property="og:title") and soup.find("meta", property="og:title").get("content") else
-                 soup.title.string.strip() if soup.title and soup.title.string else "Не указано")
-        logger.info("Название статьи: %s", title)
-
-        author_tags = soup.find_all("meta", attrs={"name": "citation_author"})
-        author = (", ".join([tag["content"].strip() for tag in author_tags if tag.get("content")]) if author_tags else
-                  soup.find("meta", attrs={"name": "author"})["content"].strip() if soup.find("meta", attrs={"name": "author"}) and soup.find("meta", attrs={"name": "author"}).get("content") else
-                  "Не указано")
-        logger.info("Авторы: %s", author)
-
-        editor = "Не указано"
-        logger.info("Редактор: %s", editor)
-
-        year = "Не указано"
-        date_tag = soup.find("meta", attrs={"name": "citation_publication_date"})
-        if date_tag and date_tag.get("content"):
-            date_content = date_tag["content"].strip()
-            year = date_content[:4] if re.match(r'\d{4}', date_content) else date_content
-        else:
-            date_tag = soup.find("meta", property="article:published_time")
-            if date_tag and date_tag.get("content"):
-                try:
-                    pub_date = datetime.fromisoformat(date_tag["content"].strip())
-                    year = str(pub_date.year)
-                except Exception:
-                    year = extract_year_with_pyparsing(full_text)
-        logger.info("Год: %s", year)
-
-        journal = (soup.find("meta", attrs={"name": "citation_journal_title"})["content"].strip() if soup.find("meta", attrs={"name": "citation_journal_title"}) and soup.find("meta", attrs={"name": "citation_journal_title"}).get("content") else
-                   "Не указано")
-        logger.info("Журнал: %s", journal)
-
-        volume = (soup.find("meta", attrs={"name": "citation_volume"})["content"].strip() if soup.find("meta", attrs={"name": "citation_volume"}) and soup.find("meta", attrs={"name": "citation_volume"}).get("content") else
-                  "Не указано")
-        logger.info("Том: %s", volume)
-
-        number = (soup.find("meta", attrs={"name": "citation_issue"})["content"].strip() if soup.find("meta", attrs={"name": "citation_issue"}) and soup.find("meta", attrs={"name": "citation_issue"}).get("content") else
-                  "Не указано")
-        logger.info("Номер: %s", number)
-
-        # Поиск страниц в тексте страницы
-        pages = "Не указано"
-        pages_tag = soup.find("meta", attrs={"name": "citation_pages"})
-        if pages_tag and pages_tag.get("content"):
-            pages = pages_tag["content"].strip()
-        else:
+        pages = meta.first("citation_pages")
+        if pages == "Не указано":
             # Поиск в тексте (например, в <div class="c-bibliographic-information__value">)
-            pages_elem = soup.select_one("div.c-bibliographic-information__value")
+            pages_elem = make_soup(html).select_one("div.c-bibliographic-information__value")
             if pages_elem:
-                pages_text = pages_elem.text.strip()
-                pages_match = re.search(r"(\d+\s*[-–]\s*\d+)", pages_text)
-                pages = pages_match.group(1) if pages_match else "Не указано"
+                pages_match = re.search(r"(\d+\s*[-–]\s*\d+)", pages_elem.text.strip())
             else:
                 # Поиск через регулярное выражение в полном тексте
                 pages_match = re.search(r"Pages\s*(\d+\s*[-–]\s*\d+)", full_text, re.IGNORECASE)
-                pages = pages_match.group(1) if pages_match else "Не указано"
-        logger.info("Страницы: %s", pages)
-
-        doi = (soup.find("meta", attrs={"name": "citation_doi"})["content"].strip() if soup.find("meta", attrs={"name": "citation_doi"}) and soup.find("meta", attrs={"name": "citation_doi"}).get("content") else
-               "Не указано")
-        logger.info("DOI: %s", doi)
-
-        publisher = (soup.find("meta", attrs={"name": "citation_publisher"})["content"].strip() if soup.find("meta", attrs={"name": "citation_publisher"}) and soup.find("meta", attrs={"name": "citation_publisher"}).get("content") else
-                     soup.find("meta", property="og:site_name")["content"].strip() if soup.find("meta", property="og:site_name") and soup.find("meta", property="og:site_name").get("content") else
-                     urlparse(url).netloc)
-        logger.info("Издатель: %s", publisher)
-
-        address = "Не указано"
-        month = "Не указано"
-        day = "Не указано"
-        try:
-            if date_tag and date_tag.get("content"):
-                pub_date = datetime.fromisoformat(date_tag["content"].strip())
-                month = pub_date.strftime("%B")
-                day = str(pub_date.day)
-        except Exception:
-            pass
-        logger.info("Месяц: %s, День: %s", month, day)
-
-        note = "Не указано"
-        logger.info("Примечание: %s", note)
-
-        return {
-            "title": title, "author": author, "editor": editor, "year": year, "journal": journal,
-            "volume": volume, "number": number, "pages": pages, "doi": doi, "url": url,
-            "publisher": publisher, "address": address, "month": month, "day": day, "note": note
-        }
+            pages = pages_match.group(1) if pages_match else "Не указано"
+        return resolve_meta_fields(meta, full_text, url, pages=pages)
 
     # Общий парсер для других сайтов
     logger.info("Обработка данных через общий парсер")
-    citation_title = soup.find("meta", attrs={"name": "citation_title"})
-    title = (citation_title["content"].strip() if citation_title and citation_title.get("content") else
-             soup.find("meta", property="og:title")["content"].strip() if soup.find("meta", property="og:title") and soup.find("meta", property="og:title").get("content") else
-             soup.title.string.strip() if soup.title and soup.title.string else "Не указано")
+    return resolve_meta_fields(meta, full_text, url)
+
+def resolve_meta_fields(meta: MetaIndex, full_text: str, url: str, pages: str = None) -> dict:
+    """Заполняет библиографические поля из индекса метатегов, затем из JSON-LD и <title>."""
+    title = meta.first("citation_title", "og:title")
+    if title == "Не указано":
+        title = meta.json_ld_value("headline", "name")
+    if title == "Не указано" and meta.title:
+        title = meta.title
     logger.info("Название статьи: %s", title)
 
-    author_tags = soup.find_all("meta", attrs={"name": "citation_author"})
-    author = (", ".join([tag["content"].strip() for tag in author_tags if tag.get("content")]) if author_tags else
-              soup.find("meta", attrs={"name": "author"})["content"].strip() if soup.find("meta", attrs={"name": "author"}) and soup.find("meta", attrs={"name": "author"}).get("content") else
-              "Не указано")
+    authors = meta.all("citation_author") or meta.all("author") or meta.json_ld_authors()
+    author = ", ".join(authors) if authors else "Не указано"
     logger.info("Авторы: %s", author)
 
     editor = "Не указано"
     logger.info("Редактор: %s", editor)
 
     year = "Не указано"
-    date_tag = soup.find("meta", attrs={"name": "citation_publication_date"})
-    if date_tag and date_tag.get("content"):
-        date_content = date_tag["content"].strip()
+    pub_date = None
+    date_content = meta.first("citation_publication_date")
+    if date_content != "Не указано":
         year = date_content[:4] if re.match(r'\d{4}', date_content) else date_content
     else:
-        date_tag = soup.find("meta", property="article:published_time")
-        if date_tag and date_tag.get("content"):
+        date_content = meta.first("article:published_time")
+        if date_content == "Не указано":
+            date_content = meta.json_ld_value("datePublished")
+        if date_content != "Не указано":
             try:
-                pub_date = datetime.fromisoformat(date_tag["content"].strip())
+                pub_date = datetime.fromisoformat(date_content)
                 year = str(pub_date.year)
             except Exception:
                 year = extract_year_with_pyparsing(full_text)
     logger.info("Год: %s", year)
 
-    journal = (soup.find("meta", attrs={"name": "citation_journal_title"})["content"].strip() if soup.find("meta", attrs={"name": "citation_journal_title"}) and soup.find("meta", attrs={"name": "citation_journal_title"}).get("content") else
-               "Не указано")
+    journal = meta.first("citation_journal_title")
     logger.info("Журнал: %s", journal)
 
-    volume = (soup.find("meta", attrs={"name": "citation_volume"})["content"].strip() if soup.find("meta", attrs={"name": "citation_volume"}) and soup.find("meta", attrs={"name": "citation_volume"}).get("content") else
-              "Не указано")
+    volume = meta.first("citation_volume")
     logger.info("Том: %s", volume)
 
-    number = (soup.find("meta", attrs={"name": "citation_issue"})["content"].strip() if soup.find("meta", attrs={"name": "citation_issue"}) and soup.find("meta", attrs={"name": "citation_issue"}).get("content") else
-              "Не указано")
+    number = meta.first("citation_issue")
     logger.info("Номер: %s", number)
 
-    pages = (soup.find("meta", attrs={"name": "citation_pages"})["content"].strip() if soup.find("meta", attrs={"name": "citation_pages"}) and soup.find("meta", attrs={"name": "citation_pages"}).get("content") else
-             "Не указано")
+    if pages is None:
+        pages = meta.first("citation_pages")
     logger.info("Страницы: %s", pages)
 
-    doi = (soup.find("meta", attrs={"name": "citation_doi"})["content"].strip() if soup.find("meta", attrs={"name": "citation_doi"}) and soup.find("meta", attrs={"name": "citation_doi"}).get("content") else
-           "Не указано")
+    doi = meta.first("citation_doi")
     logger.info("DOI: %s", doi)
 
-    publisher = (soup.find("meta", attrs={"name": "citation_publisher"})["content"].strip() if soup.find("meta", attrs={"name": "citation_publisher"}) and soup.find("meta", attrs={"name": "citation_publisher"}).get("content") else
-                 soup.find("meta", property="og:site_name")["content"].strip() if soup.find("meta", property="og:site_name") and soup.find("meta", property="og:site_name").get("content") else
-                 urlparse(url).netloc)
+    publisher = meta.first("citation_publisher", "og:site_name")
+    if publisher == "Не указано":
+        publisher = urlparse(url).netloc
     logger.info("Издатель: %s", publisher)
 
     address = "Не указано"
     month = "Не указано"
     day = "Не указано"
     try:
-        if date_tag and date_tag.get("content"):
-            pub_date = datetime.fromisoformat(date_tag["content"].strip())
+        if date_content != "Не указано":
+            pub_date = pub_date or datetime.fromisoformat(date_content)
             month = pub_date.strftime("%B")
             day = str(pub_date.day)
     except Exception:
@@ -404,7 +423,7 @@ async def extract_bibliographic_data(url: str) -> dict:
         "publisher": publisher, "address": address, "month": month, "day": day, "note": note
     }
 
-def format_reference_with_ai(data: dict, style: str, subformat: str) -> str:
+async def format_reference_with_ai(data: dict, style: str, subformat: str) -> str:
     """Формирует библиографическую запись с помощью нейросети в указанном стиле и подтипе, возвращая только чистую ссылку."""
     prompt_templates = {
         "APA": {
@@ -465,25 +484,20 @@ def format_reference_with_ai(data: dict, style: str, subformat: str) -> str:
         logger.error("Неверный подтип для стиля %s: %s", style, subformat)
         return f"Ошибка: неверный подтип для {style}."
 
-    client = openai.OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt.format(data=data)}],
-            temperature=0.1,
-            timeout=150
-        )
-        formatted_reference = response.choices[0].message.content.strip()
+        # Служебное поле уровня извлечения не передаётся нейросети
+        data = {key: value for key, value in data.items() if key != "tier"}
+        formatted_reference = await chat_completion(prompt.format(data=data), timeout=150)
         logger.info("Сформированная запись в стиле %s, подтип %s: %s", style, subformat, formatted_reference)
         return formatted_reference
     except Exception as e:
         logger.error("Ошибка при работе с нейросетью: %s", str(e))
         return f"Ошибка AI-сервиса: {e}"
 
-def compose_reference(data: dict, style: str = "APA", subformat: str = None) -> str:
+async def compose_reference(data: dict, style: str = "APA", subformat: str = None) -> str:
     """Формирует библиографическую запись в указанном стиле и подтипе."""
     if not subformat:
         logger.error("Подтип не указан, требуется выбор подформата")
         return "Ошибка: подтип не указан (например, Журнальная статья, Книга и т.д.)."
     
-    return format_reference_with_ai(data, style, subformat)
\ No newline at end of file
+    return await format_reference_with_ai(data, style, subformat)
\ No newline at end of file
@@ -0,0 +1,62 @@
+# benchmarks/bench_bulk_validator.py
+"""
+Масштабирование массовой проверки (backend.bulk_validator) по числу процессов:
+последовательная проверка в одном процессе против BulkValidation с пулом
+из 1, 2, 4, … процессов (до числа ядер) на корпусе синтетических ссылок.
+Проверяется, что результаты совпадают с последовательной проверкой и идут по порядку.
+
+Запуск: python -m benchmarks.bench_bulk_validator
+"""
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from backend import reference_validator
+from backend.bulk_validator import BULK_CHUNK_SIZE, BulkValidation, validate_chunk, _validate_chunk_in_worker
+from benchmarks.bench_validator import synthetic_corpus
+
+CORPUS_SIZE = int(os.getenv("BENCH_CORPUS_SIZE", "50000"))
+MAX_WORKERS = int(os.getenv("BENCH_MAX_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def worker_counts() -> list:
+    counts, workers = [], 1
+    while workers < MAX_WORKERS:
+        counts.append(workers)
+        workers *= 2
+    return counts + [MAX_WORKERS]
+
+
+def run() -> bool:
+    reference_validator.logger.setLevel(logging.WARNING)  # логирование полей не должно влиять на замер
+    corpus = synthetic_corpus(CORPUS_SIZE)
+    references = corpus["GOST"] + corpus["APA"] + corpus["MLA"]
+
+    started = time.perf_counter()
+    expected = validate_chunk(references, "GOST")
+    serial = len(references) / (time.perf_counter() - started)
+    print(f"{len(references)} ссылок, пакеты по {BULK_CHUNK_SIZE}, ядер {os.cpu_count()}")
+    print(f"  последовательно     {serial:10,.0f} ссылок/с")
+
+    ok = True
+    for workers in worker_counts():
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Прогрев: запуск процессов и импорт модулей не входят в замер
+            list(pool.map(_validate_chunk_in_worker, [references[:10]] * workers, ["GOST"] * workers,
+                          [None] * workers, [0] * workers))
+            bulk = BulkValidation(references, "GOST", executor=pool, workers=workers)
+            results = list(bulk)
+        rate = bulk.summary()["refs_per_sec"]
+        same = results == expected
+        ok = ok and same
+        print(f"  процессов {workers:<3}       {rate:10,.0f} ссылок/с, x{rate / serial:.2f} "
+              f"(эффективность {rate / serial / workers:.0%}){'' if same else '  РАСХОЖДЕНИЕ'}")
+    print("OK" if ok else "MISMATCH")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
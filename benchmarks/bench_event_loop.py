@@ -0,0 +1,89 @@
+# benchmarks/bench_event_loop.py
+"""
+Регрессионный бенчмарк: медленный ответ нейросети не должен задерживать
+посторонний запрос GET / к тому же воркеру.
+
+Нейросеть эмулируется httpx.MockTransport с задержкой ответа, поэтому
+проверяется реальный путь /convert-reference/ → convert_to_format → общий LLM-клиент.
+
+Запуск: python -m benchmarks.bench_event_loop
+"""
+import os
+import sys
+import time
+import asyncio
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+os.environ["LLM_CACHE_ENABLED"] = "0"  # каждый прогон должен доходить до «нейросети»
+
+import httpx
+import openai
+
+import backend.llm_client as llm_client
+from backend.main import app
+
+LLM_DELAY = float(os.getenv("BENCH_LLM_DELAY", "3"))
+MAX_ROOT_LATENCY = float(os.getenv("BENCH_MAX_ROOT_LATENCY", "0.25"))
+ROOT_PROBES = 10
+
+# Ссылка без распознаваемой структуры — конвертация обязательно идёт через нейросеть
+REFERENCE = "заметки без автора и года о чём-то важном"
+
+
+async def slow_llm_handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(LLM_DELAY)
+    return httpx.Response(200, json={
+        "id": "bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": llm_client.MODEL,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "Фамилия И.О. Название. Место: Издательство, 2024."},
+            "finish_reason": "stop"
+        }]
+    })
+
+
+async def run() -> bool:
+    llm_client._client = openai.AsyncOpenAI(
+        api_key="bench",
+        base_url="http://llm.bench/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(slow_llm_handler)),
+        max_retries=0,
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        slow_started = time.perf_counter()
+        slow_request = asyncio.create_task(client.post("/convert-reference/", data={
+            "reference": REFERENCE,
+            "source_format": "GOST",
+            "target_format": "GOST",
+            "target_subformat": "Книга"
+        }))
+        await asyncio.sleep(0.1)  # даём медленному запросу дойти до нейросети
+
+        latencies = []
+        for _ in range(ROOT_PROBES):
+            started = time.perf_counter()
+            response = await client.get("/")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(LLM_DELAY / (ROOT_PROBES * 2))
+
+        slow_response = await slow_request
+        slow_elapsed = time.perf_counter() - slow_started
+
+    worst = max(latencies)
+    print(f"POST /convert-reference/: {slow_elapsed:.2f} s (status {slow_response.status_code}, LLM delay {LLM_DELAY:.1f} s)")
+    print(f"GET / во время вызова нейросети: max {worst * 1000:.1f} ms, "
+          f"avg {sum(latencies) / len(latencies) * 1000:.1f} ms ({ROOT_PROBES} запросов)")
+    ok = worst < MAX_ROOT_LATENCY
+    print("OK" if ok else f"REGRESSION: GET / ждал дольше {MAX_ROOT_LATENCY * 1000:.0f} ms")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run()) else 1)
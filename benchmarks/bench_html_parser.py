@@ -0,0 +1,65 @@
+# benchmarks/bench_html_parser.py
+"""
+Сравнение бэкендов backend.html_parser (selectolax, lxml, html.parser) на больших
+страницах: извлечение видимого текста (html_to_text) и метаданных (extract_meta)
+по отдельности и за один разбор (parse_page). Проверяется, что все бэкенды дают
+тот же текст и те же метатеги, что и html.parser.
+
+По умолчанию — синтетическая страница журнала на несколько мегабайт;
+сохранённые страницы можно подложить через BENCH_HTML_DIR (все *.html из каталога).
+
+Запуск: python -m benchmarks.bench_html_parser
+"""
+import os
+import sys
+import glob
+import time
+
+from backend.html_parser import AVAILABLE_BACKENDS, extract_meta, html_to_text, parse_page
+from benchmarks.bench_meta_index import synthetic_page
+
+HTML_DIR = os.getenv("BENCH_HTML_DIR")
+REPEAT = int(os.getenv("BENCH_REPEAT", "3"))
+
+
+def timed(func, html: str, backend: str) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        func(html, backend)
+    return (time.perf_counter() - started) / REPEAT
+
+
+def run() -> bool:
+    if HTML_DIR:
+        pages = {os.path.basename(path): open(path, encoding="utf-8", errors="replace").read()
+                 for path in sorted(glob.glob(os.path.join(HTML_DIR, "*.html")))}
+    else:
+        pages = {"synthetic-journal": synthetic_page(references=2000, paragraphs=30000)}
+
+    ok = True
+    for name, html in pages.items():
+        print(f"{name}: {len(html) / 1024 / 1024:.1f} MiB")
+        reference_text = html_to_text(html, "html.parser")
+        reference_meta = extract_meta(html, "html.parser")
+        baseline = None
+        for backend in AVAILABLE_BACKENDS[::-1]:  # html.parser первым — он база для сравнения
+            text_time = timed(html_to_text, html, backend)
+            meta_time = timed(extract_meta, html, backend)
+            page_time = timed(parse_page, html, backend)
+            total = text_time + meta_time
+            baseline = baseline or total
+            meta = extract_meta(html, backend)
+            page_meta, page_text = parse_page(html, backend)
+            same = all(text == reference_text and meta.values == reference_meta.values
+                       and meta.json_ld == reference_meta.json_ld and meta.title == reference_meta.title
+                       for text, meta in ((html_to_text(html, backend), meta), (page_text, page_meta)))
+            ok = ok and same
+            print(f"  {backend:<12} текст {text_time * 1000:8.1f} ms, метаданные {meta_time * 1000:8.1f} ms, "
+                  f"один разбор {page_time * 1000:8.1f} ms, "
+                  f"ускорение x{baseline / total:.1f}{'' if same else '  РАСХОЖДЕНИЕ с html.parser'}")
+    print("OK" if ok else "MISMATCH")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,129 @@
+# benchmarks/bench_meta_index.py
+"""
+Микробенчмарк классического парсера: поиск полей повторными soup.find("meta", ...)
+(как было раньше) против однократного обхода build_meta_index + resolve_meta_fields.
+
+Время разбора HTML в BeautifulSoup одинаково для обоих вариантов и не учитывается.
+По умолчанию используется синтетическая страница издательства (метатеги citation_*,
+сотни citation_reference, JSON-LD, длинный текст); сохранённые страницы можно
+подложить через BENCH_HTML_DIR (все *.html из каталога).
+
+Запуск: python -m benchmarks.bench_meta_index
+"""
+import os
+import re
+import sys
+import glob
+import time
+import logging
+from urllib.parse import urlparse
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from bs4 import BeautifulSoup
+
+from backend.html_parser import build_meta_index
+from backend.web_scraper import resolve_meta_fields, logger as scraper_logger
+
+HTML_DIR = os.getenv("BENCH_HTML_DIR")
+REPEAT = int(os.getenv("BENCH_REPEAT", "50"))
+URL = "https://link.springer.com/article/10.1134/S0012266115080108"
+
+
+def synthetic_page(references: int = 300, paragraphs: int = 1500, sparse: bool = False) -> str:
+    """Страница издательства; sparse=True — сайт без citation_* (типичный случай общего парсера)."""
+    if sparse:
+        head = [
+            '<meta property="og:title" content="On an integral representation">',
+            '<meta name="author" content="Moiseev, E. I.">',
+        ]
+    else:
+        head = [
+            '<meta name="citation_title" content="On an integral representation of the Neumann—Tricomi problem">',
+            '<meta name="citation_author" content="Moiseev, E. I.">',
+            '<meta name="citation_author" content="Moiseev, T. E.">',
+            '<meta name="citation_author" content="Vafodorova, G. O.">',
+            '<meta name="citation_publication_date" content="2015-08-01">',
+            '<meta name="citation_journal_title" content="Differential Equations">',
+            '<meta name="citation_volume" content="51">',
+            '<meta name="citation_issue" content="8">',
+            '<meta name="citation_pages" content="1086-1091">',
+            '<meta name="citation_doi" content="10.1134/S0012266115080108">',
+            '<meta name="citation_publisher" content="Pleiades Publishing">',
+            '<meta property="og:title" content="On an integral representation">',
+            '<meta property="og:site_name" content="SpringerLink">',
+            '<script type="application/ld+json">{"@type": "ScholarlyArticle", "headline": "On an integral representation"}</script>',
+        ]
+        head += [f'<meta name="citation_reference" content="Author {i}. Title {i}. Journal, {1990 + i % 30}.">'
+                 for i in range(references)]
+    body = [f'<div class="section"><p>Paragraph {i} with <a href="#ref{i}">link</a> and <em>text</em>.</p></div>'
+            for i in range(paragraphs)]
+    return f"<html><head><title>Page</title>{''.join(head)}</head><body>{''.join(body)}</body></html>"
+
+
+def legacy_fields(soup) -> dict:
+    """Прежняя логика общего парсера: каждый атрибут ищется отдельным обходом дерева."""
+    def meta_content(**attrs):
+        tag = soup.find("meta", **attrs)
+        return tag["content"].strip() if tag and tag.get("content") else None
+
+    title = (meta_content(attrs={"name": "citation_title"}) or meta_content(property="og:title")
+             or (soup.title.string.strip() if soup.title and soup.title.string else "Не указано"))
+    author_tags = soup.find_all("meta", attrs={"name": "citation_author"})
+    author = (", ".join(tag["content"].strip() for tag in author_tags if tag.get("content")) if author_tags
+              else meta_content(attrs={"name": "author"}) or "Не указано")
+    date = meta_content(attrs={"name": "citation_publication_date"})
+    year = (date[:4] if re.match(r"\d{4}", date) else date) if date else "Не указано"
+    return {
+        "title": title,
+        "author": author,
+        "year": year,
+        "journal": meta_content(attrs={"name": "citation_journal_title"}) or "Не указано",
+        "volume": meta_content(attrs={"name": "citation_volume"}) or "Не указано",
+        "number": meta_content(attrs={"name": "citation_issue"}) or "Не указано",
+        "pages": meta_content(attrs={"name": "citation_pages"}) or "Не указано",
+        "doi": meta_content(attrs={"name": "citation_doi"}) or "Не указано",
+        "publisher": (meta_content(attrs={"name": "citation_publisher"})
+                      or meta_content(property="og:site_name") or urlparse(URL).netloc),
+    }
+
+
+def indexed_fields(soup) -> dict:
+    data = resolve_meta_fields(build_meta_index(soup), "", URL)
+    return {key: data[key] for key in ("title", "author", "year", "journal", "volume",
+                                       "number", "pages", "doi", "publisher")}
+
+
+def timed(func, soup) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        func(soup)
+    return (time.perf_counter() - started) / REPEAT
+
+
+def run() -> bool:
+    scraper_logger.setLevel(logging.WARNING)  # логирование полей не должно влиять на замер
+    if HTML_DIR:
+        pages = {os.path.basename(path): open(path, encoding="utf-8", errors="replace").read()
+                 for path in sorted(glob.glob(os.path.join(HTML_DIR, "*.html")))}
+    else:
+        pages = {"synthetic-publisher": synthetic_page(), "synthetic-sparse": synthetic_page(sparse=True)}
+
+    ok = True
+    for name, html in pages.items():
+        soup = BeautifulSoup(html, "html.parser")
+        legacy, indexed = legacy_fields(soup), indexed_fields(soup)
+        mismatched = [key for key in legacy if legacy[key] != indexed[key]]
+        legacy_time, indexed_time = timed(legacy_fields, soup), timed(indexed_fields, soup)
+        print(f"{name}: {len(html) / 1024:.0f} KiB, повторные find {legacy_time * 1000:.2f} ms, "
+              f"индекс {indexed_time * 1000:.2f} ms, ускорение x{legacy_time / indexed_time:.1f}")
+        if mismatched:
+            ok = False
+            print(f"  РАСХОЖДЕНИЕ полей: {', '.join(mismatched)}")
+    print("OK" if ok else "MISMATCH")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
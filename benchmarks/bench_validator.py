@@ -0,0 +1,164 @@
+# benchmarks/bench_validator.py
+"""
+Пропускная способность reference_validator на корпусе синтетических ссылок
+(по умолчанию 10 000: статьи, книги, сборники, онлайн-статьи по ГОСТ; APA; MLA).
+
+Для ГОСТ сравнивается прежний разбор (отдельный re.search на каждое поле со
+строковыми шаблонами и отдельные поиски для определения типа) с одним проходом
+scan_gost_fields; найденные поля и тип записи должны совпадать.
+Результат — ссылок в секунду.
+
+Запуск: python -m benchmarks.bench_validator
+"""
+import os
+import re
+import sys
+import time
+import random
+import logging
+
+from backend import reference_validator
+from backend.reference_validator import (CITY_ABBREVIATIONS, detect_gost_type, extract_gost_fields,
+                                         scan_gost_fields, validate_references)
+
+CORPUS_SIZE = int(os.getenv("BENCH_CORPUS_SIZE", "10000"))
+SEED = 7
+
+SURNAMES = ["Иванов", "Петрова", "Сидоров", "Кузнецов", "Smith", "Brown", "Орлов", "Пакшина"]
+WORDS = ["почва", "соли", "модель", "анализ", "данных", "метод", "влияние", "climate", "soil", "system"]
+JOURNALS = ["Почвоведение", "Вестник МГУ", "Geoderma", "Вопросы экономики", "Nature"]
+PUBLISHERS = ["Наука", "Юрайт", "Springer", "Питер"]
+CITIES = ["М.", "СПб.", "Казань", "Berlin"]
+
+
+def _author(rng) -> str:
+    return f"{rng.choice(SURNAMES)} {rng.choice('АБВГДЕ')}.{rng.choice('АБВГДЕ')}."
+
+
+def _title(rng) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 7))).capitalize()
+
+
+def synthetic_corpus(size: int = CORPUS_SIZE, seed: int = SEED) -> dict:
+    """Корпус ссылок по стилям: {"GOST": [...], "APA": [...], "MLA": [...]}."""
+    rng = random.Random(seed)
+    gost, apa, mla = [], [], []
+    for i in range(size):
+        year = rng.randint(1960, 2024)
+        authors = ", ".join(_author(rng) for _ in range(rng.randint(1, 3)))
+        kind = i % 10
+        if kind < 3:
+            gost.append(f"{authors} {_title(rng)} // {rng.choice(JOURNALS)}. {year}. Т. {rng.randint(1, 60)}. "
+                        f"№ {rng.randint(1, 12)}. С. {rng.randint(1, 100)}–{rng.randint(101, 300)}."
+                        + (f" DOI: 10.{rng.randint(1000, 9999)}/x{i}" if rng.random() < 0.5 else ""))
+        elif kind == 3:
+            gost.append(f"{authors} {_title(rng)}. {rng.choice(CITIES)}: {rng.choice(PUBLISHERS)}, {year}. "
+                        f"{rng.randint(100, 700)} с." + (f" ISBN 978{rng.randint(10**9, 10**10 - 1)}" if i % 3 else ""))
+        elif kind == 4:
+            gost.append(f"{_title(rng)} / под ред. {_author(rng)} {rng.choice(CITIES)}: {rng.choice(PUBLISHERS)}, "
+                        f"{year}. {rng.randint(100, 500)} с.")
+        elif kind == 5:
+            gost.append(f"{authors} {_title(rng)} // {rng.choice(JOURNALS)}. {year}. Т. {rng.randint(1, 60)}. "
+                        f"№ {rng.randint(1, 12)} (в печати)")
+        elif kind == 6:
+            gost.append(f"{authors} {_title(rng)} // {rng.choice(JOURNALS)}. {year}. URL: https://example.org/a{i} "
+                        f"(дата обращения: {rng.randint(10, 28)}.0{rng.randint(1, 9)}.{year + 1})")
+        elif kind < 9:
+            surname, initial = rng.choice(SURNAMES), rng.choice("ABCDE")
+            apa.append(f"{surname}, {initial}. ({year}). {_title(rng)}. {rng.choice(JOURNALS)}, "
+                       f"{rng.randint(1, 60)}({rng.randint(1, 12)}), {rng.randint(1, 100)}–{rng.randint(101, 300)}.")
+        else:
+            surname = rng.choice(SURNAMES)
+            mla.append(f'{surname}, Иван. "{_title(rng)}." {rng.choice(JOURNALS)}, т. {rng.randint(1, 60)}, '
+                       f'№ {rng.randint(1, 12)}, {year}, с. {rng.randint(1, 100)}–{rng.randint(101, 300)}.')
+    return {"GOST": gost, "APA": apa, "MLA": mla}
+
+
+# Прежняя реализация: шаблоны собираются и компилируются (через кэш re) при каждом вызове
+def legacy_extract_gost_fields(reference: str, ref_type: str) -> dict:
+    reference = re.sub(r'\s+', ' ', reference.strip())
+    fields = {}
+    patterns = {
+        "author": r'^([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?(?:,\s*[А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)*(?:\s*,\s*\.\.\.,\s*(?:и\s*др\.|et\s*al\.))?)',
+        "title": r'(?:[А-Яа-яA-Za-zЁё]\.\s+)(.+?)(?=\.\s*(?:[А-Яа-яA-Za-zЁё]*:|\d{4}|//))',
+        "city": r'(?:\.|//)\s*([А-Яа-яA-Za-zЁё\.]+(?:\s+[А-Яа-яA-Za-zЁё]+)?)\s*:',
+        "publisher": r':\s*([А-Яа-яA-Za-zЁё\s\-]+)(?=,\s*\d{4})',
+        "year": r',\s*(\d{4})(?=\.|$)',
+        "pages": r'(\d+\s*с\.?\s*)',
+        "journal": r'//\s*(.+?)\.(?=\s*\d{4})',
+        "volume": r'(?<!\w)(?:Т\.|Vol\.)\s*(\d+)',
+        "issue": r'№\s*(\d+)',
+        "doi": r'(?:DOI|doi):\s*([^\s]+)',
+        "url": r'URL:\s*(https?://[^\s]+)',
+        "access_date": r'\(дата\s*обращения:\s*(\d{2}\.\d{2}\.\d{4})\)',
+        "isbn": r'ISBN\s*(\d{13}|\d{10})',
+        "editor": r'под\s*ред\.\s*([А-Яа-яA-Za-zЁё]+(?:\s+[А-Яа-яA-Za-zЁё]\.\s*[А-Яа-яA-Za-zЁё]?\.?)?)'
+    }
+    for field, pattern in patterns.items():
+        match = re.search(pattern, reference, re.UNICODE)
+        if match:
+            fields[field] = match.group(1).strip()
+            if field == "city" and fields[field] in CITY_ABBREVIATIONS:
+                fields[field] = CITY_ABBREVIATIONS[fields[field]]
+    if ref_type == "Статья в печати" and "(в печати)" in reference:
+        fields["in_press"] = "(в печати)"
+    # Сообщение f-строкой форматировалось даже при выключенном уровне INFO
+    reference_validator.logger.info(f"Fields extracted for '{reference}': {fields}")
+    return fields
+
+
+def legacy_gost_type(reference: str) -> str:
+    if re.search(r'//\s*.+?\.\s*\d{4}', reference):
+        if re.search(r'\(в\s*печати\)', reference):
+            return "Статья в печати"
+        if re.search(r'URL:\s*https?://.+?\s*\(дата\s*обращения:', reference):
+            return "Онлайн-статья"
+        return "Статья в журнале"
+    if re.search(r'под\s*ред\.', reference):
+        return "Материалы конференций"
+    return "Книга"
+
+
+def legacy_parse(reference: str):
+    ref_type = legacy_gost_type(reference)
+    return ref_type, legacy_extract_gost_fields(reference, ref_type)
+
+
+def scanned_parse(reference: str):
+    scan = scan_gost_fields(reference)
+    ref_type = detect_gost_type(scan)
+    return ref_type, extract_gost_fields(reference, ref_type, scan)
+
+
+def throughput(func, items: list) -> float:
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def run() -> bool:
+    reference_validator.logger.setLevel(logging.WARNING)  # логирование полей не должно влиять на замер
+    corpus = synthetic_corpus()
+    gost = corpus["GOST"]
+
+    mismatched = [ref for ref in gost if legacy_parse(ref) != scanned_parse(ref)]
+    legacy_rate, scanned_rate = throughput(legacy_parse, gost), throughput(scanned_parse, gost)
+    print(f"ГОСТ, разбор полей и типа ({len(gost)} ссылок): прежний {legacy_rate:,.0f} ссылок/с, "
+          f"один проход {scanned_rate:,.0f} ссылок/с, ускорение x{scanned_rate / legacy_rate:.1f}")
+
+    for style, references in corpus.items():
+        started = time.perf_counter()
+        valid, invalid = validate_references(references, style)
+        elapsed = time.perf_counter() - started
+        print(f"validate_references {style}: {len(references)} ссылок, {len(references) / elapsed:,.0f} ссылок/с "
+              f"(валидных {len(valid)}, невалидных {len(invalid)})")
+
+    for ref in mismatched[:5]:
+        print(f"  РАСХОЖДЕНИЕ: {ref}\n    прежний: {legacy_parse(ref)}\n    новый:   {scanned_parse(ref)}")
+    print("OK" if not mismatched else f"MISMATCH ({len(mismatched)})")
+    return not mismatched
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
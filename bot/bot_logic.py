@@ -10,18 +10,11 @@ from dotenv import load_dotenv
 # Загружаем переменные из .env
 load_dotenv()
 
-# Импорт всех необходимых модулей из backend (согласно backend/main.py)
-from backend.document_parser import extract_text, extract_bibliography_section, split_references_to_list
-from backend.reference_validator import validate_references
-from backend.gost_ai_formatter import format_gost
-from backend.apa_ai_formatter import format_apa_ai
-from backend.mla_ai_formatter import format_mla_ai
+# Общий сервис обработки ссылок (тот же, что у backend/main.py): кэши, лимиты и метрики одни на все клиенты
+from backend.reference_service import (check_references, convert_references, open_document, reference_to_bibtex,
+                                       reference_to_csv, scrape_reference)
 from backend.text_parser import split_references_from_text
-from backend.converter import convert_reference
-from backend.web_scraper import extract_bibliographic_data, compose_reference
-from backend.tex_bibliography_formatter import format_reference_to_tex
-from backend.csv_bibliography_formatter import format_reference_to_csv
-from backend.reference_converter import convert_to_format
+from backend.uploads import spool_bytes
 
 # Настройка логирования
 logging.basicConfig(
@@ -118,12 +111,61 @@ async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(stop_message, reply_markup=get_main_menu_keyboard())
 
+def compiled_citation(result: dict, style: str) -> str:
+    """Ссылка для итогового списка: валидная — как есть, невалидная — исправление из анализа нейросети."""
+    if result["type"] == "valid":
+        return result["reference"]
+    analysis = result["errors_and_corrections"]
+    return analysis.split('\n')[-1] if style != "GOST" else analysis.split("ГОСТ:")[-1].strip()
+
+async def send_check_results(update: Update, chat_id, references, style: str, subformat: str):
+    """
+    Проверка ссылок через общий сервис (backend.reference_service): результаты отправляются
+    по мере готовности, итоговый список — в исходном порядке. Бот показывает только
+    анализ нейросети, без поиска источника (search=False).
+    """
+    compiled_citations = {}
+    current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
+    results = check_references(references, style, subformat, search=False)
+    try:
+        async for result in results:
+            if not current_processing.get(chat_id, False):
+                break
+            if result["type"] == "valid":
+                message_text = (
+                    f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
+                    f"✅ Валидная ссылка:\n```\n{result['reference']}\n```"
+                )
+            else:
+                message_text = (
+                    f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
+                    f"⚠️ Невалидная ссылка:\n"
+                    f"Оригинал: {result['original']}\n\n"
+                    f"Исправление:\n```\n{result['errors_and_corrections']}\n```"
+                )
+            await update.message.reply_text(message_text, reply_markup=get_main_menu_keyboard())
+            compiled_citations[result["index"]] = compiled_citation(result, style)
+    finally:
+        # /stop или ошибка отправки — конвейер проверки останавливается сразу
+        await results.aclose()
+
+    if compiled_citations:
+        numbered_citations = "\n\n".join(
+            f"{i+1}. {compiled_citations[index]}" for i, index in enumerate(sorted(compiled_citations)))
+        compiled_message = (
+            f"📝 Полный список исправленных ссылок:\n"
+            f"```\n{numbered_citations}\n```"
+        )
+        await update.message.reply_text(compiled_message, reply_markup=get_main_menu_keyboard())
+
+    await update.message.reply_text("🎉 Обработка завершена!", reply_markup=get_main_menu_keyboard())
+    user_settings[chat_id]["mode"] = "select_function"
+
 # Обработка проверки ссылок из файла
 async def process_check_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     style = user_settings[chat_id]["style"]
     subformat = user_settings[chat_id]["subformat"]
-    compiled_citations = []
 
     try:
         document = update.message.document
@@ -134,54 +176,12 @@ async def process_check_file(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.info("Получен файл: %s", filename)
         file = await document.get_file()
         file_bytes = await file.download_as_bytearray()
-        file_obj = io.BytesIO(file_bytes)
-        text = await asyncio.to_thread(extract_text, file_obj, filename)
-        bibliography_section = extract_bibliography_section(text)
-        if not bibliography_section:
+        # Тот же разбор и кэш документов, что у API: повторно присланный файл не разбирается заново
+        references, _ = await open_document(spool_bytes(file_bytes, filename))
+        if references is None:
             await update.message.reply_text("Список литературы не найден.", reply_markup=get_main_menu_keyboard())
             return
-        references = split_references_to_list(bibliography_section)
-        valid_refs, invalid_refs = validate_references(references, style, subformat)
-        current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
-
-        for ref_tuple in valid_refs:
-            if not current_processing.get(chat_id, False):
-                break
-            ref_text = ref_tuple[0]
-            message_text = (
-                f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
-                f"✅ Валидная ссылка:\n```\n{ref_text}\n```"
-            )
-            await update.message.reply_text(message_text, reply_markup=get_main_menu_keyboard())
-            compiled_citations.append(ref_text)
-
-        for ref in invalid_refs:
-            if not current_processing.get(chat_id, False):
-                break
-            analysis = (
-                format_gost(ref['original'], subformat) if style == "GOST" else
-                format_apa_ai(ref['original'], subformat) if style == "APA" else
-                format_mla_ai(ref['original'], subformat)
-            )
-            message_text = (
-                f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
-                f"⚠️ Невалидная ссылка:\n"
-                f"Оригинал: {ref['original']}\n\n"
-                f"Исправление:\n```\n{analysis}\n```"
-            )
-            await update.message.reply_text(message_text, reply_markup=get_main_menu_keyboard())
-            compiled_citations.append(analysis.split('\n')[-1] if style != "GOST" else analysis.split("ГОСТ:")[-1].strip())
-
-        if compiled_citations:
-            numbered_citations = "\n\n".join(f"{i+1}. {cit}" for i, cit in enumerate(compiled_citations))
-            compiled_message = (
-                f"📝 Полный список исправленных ссылок:\n"
-                f"```\n{numbered_citations}\n```"
-            )
-            await update.message.reply_text(compiled_message, reply_markup=get_main_menu_keyboard())
-
-        await update.message.reply_text("🎉 Обработка завершена!", reply_markup=get_main_menu_keyboard())
-        user_settings[chat_id]["mode"] = "select_function"
+        await send_check_results(update, chat_id, references, style, subformat)
 
     except Exception as e:
         logger.exception("Ошибка обработки файла:")
@@ -193,51 +193,10 @@ async def process_check_text(update: Update, context: ContextTypes.DEFAULT_TYPE)
     style = user_settings[chat_id]["style"]
     subformat = user_settings[chat_id]["subformat"]
     text = update.message.text.strip()
-    compiled_citations = []
 
     try:
         references = split_references_from_text(text)
-        valid_refs, invalid_refs = validate_references(references, style, subformat)
-        current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
-
-        for ref_tuple in valid_refs:
-            if not current_processing.get(chat_id, False):
-                break
-            ref_text = ref_tuple[0]
-            message_text = (
-                f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
-                f"✅ Валидная ссылка:\n```\n{ref_text}\n```"
-            )
-            await update.message.reply_text(message_text, reply_markup=get_main_menu_keyboard())
-            compiled_citations.append(ref_text)
-
-        for ref in invalid_refs:
-            if not current_processing.get(chat_id, False):
-                break
-            analysis = (
-                format_gost(ref['original'], subformat) if style == "GOST" else
-                format_apa_ai(ref['original'], subformat) if style == "APA" else
-                format_mla_ai(ref['original'], subformat)
-            )
-            message_text = (
-                f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
-                f"⚠️ Невалидная ссылка:\n"
-                f"Оригинал: {ref['original']}\n\n"
-                f"Исправление:\n```\n{analysis}\n```"
-            )
-            await update.message.reply_text(message_text, reply_markup=get_main_menu_keyboard())
-            compiled_citations.append(analysis.split('\n')[-1] if style != "GOST" else analysis.split("ГОСТ:")[-1].strip())
-
-        if compiled_citations:
-            numbered_citations = "\n\n".join(f"{i+1}. {cit}" for i, cit in enumerate(compiled_citations))
-            compiled_message = (
-                f"📝 Полный список исправленных ссылок:\n"
-                f"```\n{numbered_citations}\n```"
-            )
-            await update.message.reply_text(compiled_message, reply_markup=get_main_menu_keyboard())
-
-        await update.message.reply_text("🎉 Обработка завершена!", reply_markup=get_main_menu_keyboard())
-        user_settings[chat_id]["mode"] = "select_function"
+        await send_check_results(update, chat_id, references, style, subformat)
 
     except Exception as e:
         logger.exception("Ошибка обработки текста:")
@@ -253,7 +212,11 @@ async def process_convert(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
 
     try:
-        converted = convert_to_format(reference, target_format, subformat)
+        [result] = await convert_references([reference], target_format, subformat)
+        if "error" in result:
+            await update.message.reply_text(f"Ошибка: {result['error']}", reply_markup=get_main_menu_keyboard())
+            return
+        converted = result["converted"]
         message_text = (
             f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
             f"Оригинал: {reference}\n"
@@ -274,8 +237,7 @@ async def process_scrape(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
 
     try:
-        data = await extract_bibliographic_data(url)
-        reference = compose_reference(data, style, subformat)
+        reference, _ = await scrape_reference(url, style, subformat)
         message_text = (
             f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
             f"Собранная ссылка ({style} - {subformat}):\n```\n{reference}\n```"
@@ -293,7 +255,7 @@ async def process_to_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
 
     try:
-        csv_str = format_reference_to_csv(reference)
+        csv_str = await reference_to_csv(reference)
         message_text = (
             f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
             f"CSV:\n```\n{csv_str}\n```"
@@ -316,7 +278,7 @@ async def process_to_bibtex(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_time = datetime.now().strftime("%d.%m.%Y %H:%M")
 
     try:
-        bibtex = format_reference_to_tex(reference, target_format, subformat)
+        bibtex = await reference_to_bibtex(reference, target_format, subformat)
         message_text = (
             f"👩🏻‍💻Cyber-Referent, [{current_time}]\n"
             f"BibTeX ({target_format} - {subformat}):\n```\n{bibtex}\n```"
@@ -7,6 +7,7 @@ from bot.bot_logic import (
     handle_file_message,
     handle_text_message
 )
+from backend.reference_service import shutdown_service
 from dotenv import load_dotenv
 import os
 
@@ -18,12 +19,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def on_shutdown(application: Application):
+    # Те же ресурсы, что закрывает API: браузер, пулы соединений и исполнителей, кэши
+    await shutdown_service()
+
 def main():
     if not TELEGRAM_BOT_TOKEN:
         logger.error("Токен не найден! Проверьте файл .env")
         return
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_shutdown(on_shutdown).build()
 
     # Регистрируем обработчики команд и сообщений
     application.add_handler(CommandHandler("start", start))
@@ -1,8 +1,5 @@
 #frontend/app.py
 import os
-import sys
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
 import streamlit as st
 import requests
 import json
@@ -13,10 +10,9 @@ import logging
 from typing import List
 import openpyxl
 from openpyxl.styles import Font, Alignment
-from backend.field_extractor import extract_fields
 
 # Базовые константы
-BACKEND_URL = "http://127.0.0.1:8000"
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -193,6 +189,9 @@ if mode == "Проверка ссылок":
                     except requests.RequestException as e:
                         st.error(f"Ошибка соединения: {e}. Попробуйте снова или проверьте подключение к серверу.")
 
+                # Невалидные ссылки приходят по мере готовности — восстанавливаем исходный порядок
+                invalid_results.sort(key=lambda item: item.get("index", 0))
+
                 if valid_results:
                     st.markdown("### ✅ Валидные ссылки:")
                     for ref in valid_results:
@@ -236,6 +235,9 @@ if mode == "Проверка ссылок":
                     except requests.RequestException as e:
                         st.error(f"Ошибка соединения: {e}. Попробуйте снова или проверьте подключение к серверу.")
 
+                # Невалидные ссылки приходят по мере готовности — восстанавливаем исходный порядок
+                invalid_results.sort(key=lambda item: item.get("index", 0))
+
                 if valid_results:
                     st.markdown("### ✅ Валидные ссылки:")
                     for ref in valid_results:
@@ -0,0 +1,23 @@
+# tests/test_reference_renderer.py
+import pytest
+
+from backend.reference_renderer import parse_reference, render_reference
+
+BOOKS = [
+    "Иванов И. И. Основы программирования. М.: Наука, 2020. 300 с.",
+    "Smith J. Deep Work. New York: Grand Central, 2016. 296 p.",
+]
+
+
+@pytest.mark.parametrize("reference", BOOKS)
+@pytest.mark.parametrize("style, subformat", [("APA", "Книга"), ("MLA", "Монография")])
+def test_book_entries_end_with_period(reference, style, subformat):
+    rendered = render_reference(parse_reference(reference), style, subformat)
+    assert rendered is not None
+    assert rendered.endswith(".") and not rendered.endswith("..")
+
+
+def test_book_entries_match_templates():
+    record = parse_reference(BOOKS[1])
+    assert render_reference(record, "APA", "Книга") == "Smith, J. (2016). Deep Work. New York: Grand Central."
+    assert render_reference(record, "MLA", "Монография") == "Smith, J. Deep Work. New York, Grand Central, 2016."
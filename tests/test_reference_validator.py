@@ -0,0 +1,17 @@
+# tests/test_reference_validator.py
+from backend.reference_validator import extract_gost_fields
+
+ARTICLE = "Петров П. П. Методы анализа // Вестник ИТ. 2021. Т. 5. № 2. С. 10–20. DOI: 10.1234/vit.2021.5"
+
+
+def test_doi_field_holds_identifier():
+    fields = extract_gost_fields(ARTICLE, "Статья в журнале")
+    assert fields["doi"] == "10.1234/vit.2021.5"
+
+
+def test_volume_not_taken_from_word_ending():
+    # «Т.» в «ИТ.» — окончание слова, а не том
+    fields = extract_gost_fields(ARTICLE, "Статья в журнале")
+    assert fields["volume"] == "5"
+    fields = extract_gost_fields("Сидоров С. С. Обзор // Вестник ИТ. 2021. № 2. С. 1–9.", "Статья в журнале")
+    assert "volume" not in fields